@@ -11,11 +11,23 @@ classes that allow easy control of random numbers.
 * Bernoulli
 * Normal
 * Uniform
+
+**Arrival processes included:**
+* NSPPThinning - non-stationary poisson process sampled by thinning
+* NSPPInversion - non-stationary poisson process sampled by inversion of
+  the cumulative arrival rate
+
+Any of the distributions can be wrapped in a `BufferedSampler` that draws its
+samples in blocks, or an `IndexedSampler` that hands out the k-th sample of
+its stream on request.
 '''
 
 import numpy as np
 import math
 
+# default number of samples drawn at a time by a BufferedSampler
+DEFAULT_BLOCK_SIZE = 1024
+
 class Exponential:
     '''
     Convenience class for the exponential distribution.
@@ -128,11 +140,17 @@ class Lognormal:
         sigma = math.sqrt(math.log(phi**2/m**2))
         return mu, sigma
         
-    def sample(self):
+    def sample(self, size=None):
         """
         Sample from the normal distribution
+
+        Params:
+        -------
+        size: int, optional (default=None)
+            the number of samples to return.  If size=None then a single
+            sample is returned.
         """
-        return self.rng.lognormal(self.mu, self.sigma)
+        return self.rng.lognormal(self.mu, self.sigma, size=size)
 
 
 class Normal:
@@ -209,3 +227,306 @@ class Uniform():
             sample is returned.
         '''
         return self.rand.uniform(low=self.low, high=self.high, size=size)
+
+
+
+class NSPPThinning:
+    '''
+    Non-stationary poisson process (NSPP) with a piecewise constant arrival
+    rate that repeats in a cycle (e.g. hourly rates over a day).
+
+    Arrivals are sampled using the thinning acceptance-rejection algorithm.
+    Rather than sampling one arrival at a time, all arrival times up to a
+    time horizon are generated in a single call: candidate arrivals are
+    drawn in blocks at the maximum arrival rate and then accepted with
+    probability arrival_rate(t) / max arrival rate.
+    '''
+    def __init__(self, arrival_rates, interval=60.0, random_seed=None):
+        '''
+        Constructor
+
+        Params:
+        ------
+        arrival_rates: array-like
+            The mean number of arrivals in each interval of the cycle.
+
+        interval: float, optional (default=60.0)
+            The length of time each arrival rate applies for
+            e.g. 60 minutes for hourly arrival rates.
+
+        random_seed: int, optional (default=None)
+            A random seed to reproduce samples.  If set to none then a unique
+            sample is created.
+        '''
+        self.rng = np.random.default_rng(seed=random_seed)
+        self.arrival_rates = np.asarray(arrival_rates, dtype=float)
+        self.interval = interval
+        self.lambda_max = self.arrival_rates.max()
+
+    def sample(self, horizon):
+        '''
+        Generate the arrival times of the process between time 0 and
+        horizon.
+
+        Params:
+        -------
+        horizon: float
+            The end of the period to generate arrivals for.
+
+        Returns:
+        -------
+        np.ndarray of sorted arrival times
+        '''
+        mean_iat = self.interval / self.lambda_max
+        acceptance_p = self.arrival_rates / self.lambda_max
+        n_intervals = len(self.arrival_rates)
+
+        # size blocks so that one block usually covers the whole horizon
+        block_size = int(horizon / mean_iat * 1.1) + 16
+
+        arrivals = []
+        block_start = 0.0
+        while block_start < horizon:
+            candidates = block_start + np.cumsum(
+                self.rng.exponential(mean_iat, size=block_size))
+            u = self.rng.uniform(size=block_size)
+
+            interval_idx = (candidates // self.interval).astype(np.int64) % n_intervals
+            accepted = candidates[(u < acceptance_p[interval_idx]) &
+                                  (candidates < horizon)]
+            arrivals.append(accepted)
+            block_start = candidates[-1]
+
+        return np.concatenate(arrivals)
+
+class NSPPInversion:
+    '''
+    Non-stationary poisson process (NSPP) with a piecewise constant arrival
+    rate that repeats in a cycle (e.g. hourly rates over a day).
+
+    Arrivals are sampled by inversion: the arrival times of a poisson
+    process with rate 1 are mapped through the inverse of the cumulative
+    arrival rate function.  Unlike thinning, every random number drawn
+    gives an arrival, however low the arrival rate is in part of the cycle.
+    All arrival times up to a time horizon are generated in a single call.
+    '''
+    def __init__(self, arrival_rates, interval=60.0, random_seed=None):
+        '''
+        Constructor
+
+        Params:
+        ------
+        arrival_rates: array-like
+            The mean number of arrivals in each interval of the cycle.
+
+        interval: float, optional (default=60.0)
+            The length of time each arrival rate applies for
+            e.g. 60 minutes for hourly arrival rates.
+
+        random_seed: int, optional (default=None)
+            A random seed to reproduce samples.  If set to none then a unique
+            sample is created.
+        '''
+        self.rng = np.random.default_rng(seed=random_seed)
+        self.arrival_rates = np.asarray(arrival_rates, dtype=float)
+        self.interval = interval
+
+        # cumulative arrival rate at the start of each interval of the cycle
+        self.cumulative_rate = np.concatenate([[0.0],
+                                               np.cumsum(self.arrival_rates)])
+        self.cycle_rate = self.cumulative_rate[-1]
+        self.cycle_length = interval * len(self.arrival_rates)
+
+    def cumulative(self, t):
+        '''
+        The expected number of arrivals between time 0 and t
+
+        Params:
+        -------
+        t: float or np.ndarray
+            time(s) to evaluate
+
+        Returns:
+        -------
+        float or np.ndarray
+        '''
+        cycles, within_cycle = np.divmod(t, self.cycle_length)
+        idx, within_interval = np.divmod(within_cycle, self.interval)
+        idx = idx.astype(np.int64)
+        return (cycles * self.cycle_rate + self.cumulative_rate[idx]
+                + self.arrival_rates[idx] * within_interval / self.interval)
+
+    def invert(self, expected_arrivals):
+        '''
+        The time by which a given number of arrivals is expected
+        (the inverse of cumulative)
+
+        Params:
+        -------
+        expected_arrivals: np.ndarray
+            expected number of arrivals (>= 0)
+
+        Returns:
+        -------
+        np.ndarray of times
+        '''
+        cycles, within_cycle = np.divmod(expected_arrivals, self.cycle_rate)
+
+        # the interval each falls in (intervals with a rate of 0 are skipped)
+        idx = np.searchsorted(self.cumulative_rate, within_cycle,
+                              side='right') - 1
+        idx = np.minimum(idx, len(self.arrival_rates) - 1)
+
+        return (cycles * self.cycle_length + idx * self.interval
+                + (within_cycle - self.cumulative_rate[idx])
+                / self.arrival_rates[idx] * self.interval)
+
+    def sample(self, horizon):
+        '''
+        Generate the arrival times of the process between time 0 and
+        horizon.
+
+        Params:
+        -------
+        horizon: float
+            The end of the period to generate arrivals for.
+
+        Returns:
+        -------
+        np.ndarray of sorted arrival times
+        '''
+        if self.cycle_rate <= 0:
+            return np.empty(0)
+
+        expected = float(self.cumulative(horizon))
+
+        # size blocks so that one block usually covers the whole horizon
+        block_size = int(expected * 1.1 + 4 * math.sqrt(expected)) + 16
+
+        arrivals = []
+        block_start = 0.0
+        while block_start < expected:
+            # arrival times of a unit rate poisson process
+            unit_arrivals = block_start + np.cumsum(
+                self.rng.exponential(1.0, size=block_size))
+            arrivals.append(unit_arrivals[unit_arrivals < expected])
+            block_start = unit_arrivals[-1]
+
+        return self.invert(np.concatenate(arrivals))
+
+
+class BufferedSampler:
+    '''
+    Wraps one of the distribution classes above so that samples are drawn
+    from numpy in large blocks and then handed out one at a time.
+
+    numpy returns the same values whether n samples are drawn in one call
+    or in n separate calls, so a buffered distribution produces exactly the
+    same sequence of samples for a given seed as the distribution it wraps.
+    It just avoids the overhead of calling numpy for every single sample.
+    '''
+    def __init__(self, distribution, block_size=DEFAULT_BLOCK_SIZE):
+        '''
+        Constructor
+
+        Params:
+        ------
+        distribution: object
+            Any distribution with a sample(size=None) method
+            e.g. Exponential, Lognormal, Bernoulli, Normal or Uniform
+
+        block_size: int, optional (default=DEFAULT_BLOCK_SIZE)
+            The number of samples to draw each time the buffer is refilled
+        '''
+        self.distribution = distribution
+        self.block_size = block_size
+        # samples not yet handed out, stored in reverse so list.pop()
+        # returns the next one
+        self.buffer = []
+
+    def __getattr__(self, name):
+        # expose the parameters of the wrapped distribution (e.g. .mean)
+        if name == 'distribution':
+            raise AttributeError(name)
+        return getattr(self.distribution, name)
+
+    def refill(self):
+        '''
+        Draw the next block of samples into the buffer.
+        '''
+        block = self.distribution.sample(size=self.block_size).tolist()
+        block.reverse()
+        self.buffer = block
+
+    def sample(self, size=None):
+        '''
+        Generate a sample from the wrapped distribution
+
+        Params:
+        -------
+        size: int, optional (default=None)
+            the number of samples to return.  If size=None then a single
+            sample is returned.
+        '''
+        if size is None:
+            if not self.buffer:
+                self.refill()
+            return self.buffer.pop()
+
+        # hand out what is left in the buffer first to preserve the order
+        # of samples, then draw the remainder directly
+        n = int(np.prod(size))
+        from_buffer = self.buffer[:-n - 1:-1] if n > 0 else []
+        del self.buffer[len(self.buffer) - len(from_buffer):]
+
+        remainder = self.distribution.sample(size=n - len(from_buffer))
+        samples = np.concatenate([np.asarray(from_buffer, dtype=remainder.dtype),
+                                  remainder])
+        return samples.reshape(size)
+
+
+class IndexedSampler:
+    '''
+    Wraps one of the distribution classes above so that samples are
+    addressed by index: sample_at(k) always returns the k-th sample drawn
+    from the distribution's stream, whatever order indexes are requested
+    in.  Samples are drawn from numpy in blocks as they are needed.
+
+    Used to give each patient their own variates (common random numbers).
+    '''
+    def __init__(self, distribution, block_size=DEFAULT_BLOCK_SIZE):
+        '''
+        Constructor
+
+        Params:
+        ------
+        distribution: object
+            Any distribution with a sample(size=None) method
+            e.g. Exponential, Lognormal, Bernoulli, Normal or Uniform
+
+        block_size: int, optional (default=DEFAULT_BLOCK_SIZE)
+            The minimum number of samples to draw at a time
+        '''
+        self.distribution = distribution
+        self.block_size = block_size
+        self.samples = []
+
+    def __getattr__(self, name):
+        # expose the parameters of the wrapped distribution (e.g. .mean)
+        if name == 'distribution':
+            raise AttributeError(name)
+        return getattr(self.distribution, name)
+
+    def sample_at(self, index):
+        '''
+        Returns the sample at position index in the distribution's stream.
+
+        Params:
+        -------
+        index: int
+            position of the sample (>= 0)
+        '''
+        if index >= len(self.samples):
+            n = max(index + 1 - len(self.samples), self.block_size)
+            self.samples.extend(self.distribution.sample(size=n).tolist())
+        return self.samples[index]
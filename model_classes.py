@@ -27,13 +27,23 @@ in a cubicle before being dicharged.
 In this model treatment of trauma and non-trauma patients is modelled seperately 
 '''
 
-import itertools
+import hashlib
+import json
+import os
+import time
+from collections import deque
+from heapq import heappop, heappush
+from itertools import count
+from operator import attrgetter
+from statistics import NormalDist
+
 import numpy as np
 import pandas as pd
 import simpy
 
 from distribution_classes import (
-    Exponential, Normal, Uniform, Bernoulli, Lognormal)
+    Exponential, Normal, Uniform, Bernoulli, Lognormal, BufferedSampler,
+    IndexedSampler, NSPPThinning, NSPPInversion, DEFAULT_BLOCK_SIZE)
 
 # Constants and defaults for modelling **as-is**
 
@@ -77,6 +87,25 @@ NSPP_PATH = 'resources/ed_arrivals.csv'
 OVERRIDE_ARRIVAL_RATE = False
 MANUAL_ARRIVAL_RATE_VALUE = 1
 
+# How arrival times are sampled.
+# "thinning" samples each arrival as the simulation runs.
+# "thinning_vectorised" generates every arrival time for the run up front
+# with numpy and then feeds them to the simulation.
+# "inversion" also generates every arrival time up front, but exactly, by
+# inverting the cumulative arrival rate (no samples are rejected).
+ARRIVAL_SAMPLING_METHODS = ["thinning", "thinning_vectorised", "inversion"]
+DEFAULT_ARRIVAL_SAMPLING = "thinning"
+
+# Simulation engine.
+# "simpy" runs the models on simpy.Environment.
+# "heap" runs the same models on a lightweight event-heap kernel
+# (HeapEnvironment), which gives identical results faster.  Measured on
+# 30 day runs: about 2.2-2.6x faster for the full and simple_with_branch
+# models, but only 1.3-1.9x for the simplest model, where fewer events
+# are simulated so setting up and summarising the run take a larger share.
+ENGINES = ["simpy", "heap"]
+DEFAULT_ENGINE = "simpy"
+
 # Resource counts
 
 DEFAULT_N_TRIAGE = 1
@@ -95,12 +124,53 @@ DEFAULT_N_CUBICLES_2 = 1
 # default random number SET
 N_STREAMS = 20
 
+# number of samples each distribution draws from numpy at a time.
+# Set to None to sample one value per numpy call.
+DEFAULT_SAMPLE_BLOCK_SIZE = DEFAULT_BLOCK_SIZE
+
+# initial number of events an event log has space for (it grows as needed)
+EVENT_LOG_INITIAL_CAPACITY = 4096
+
+# maximum number of parsed arrival profiles kept in memory
+ARRIVAL_PROFILE_CACHE_SIZE = 32
+
 # default results collection period
 DEFAULT_RESULTS_COLLECTION_PERIOD = 60 * 19
 
+# default warm-up period (results are only collected after it)
+DEFAULT_WARM_UP = 0.0
+
+# warm-up estimation: length of pilot runs, minutes between observations of
+# the number of patients in the system, and observations per batch (MSER-5)
+DEFAULT_WARM_UP_PILOT_PERIOD = 60 * 24 * 10
+DEFAULT_WARM_UP_INTERVAL = 60.0
+DEFAULT_MSER_BATCH_SIZE = 5
+
 # number of replications.
 DEFAULT_N_REPS = 5
 
+# sequential replications: stop when every confidence interval half width is
+# within DEFAULT_TARGET_PRECISION of its mean (or DEFAULT_MAX_REPS is reached)
+DEFAULT_TARGET_PRECISION = 0.05
+DEFAULT_CONFIDENCE_LEVEL = 0.95
+DEFAULT_MIN_REPS = 3
+DEFAULT_MAX_REPS = 50
+
+# batch means: length of the single long run and number of batches
+DEFAULT_BATCH_MEANS_PERIOD = 60 * 24 * 30
+DEFAULT_N_BATCHES = 10
+
+# results cache: directory, maximum size on disk and a version number that
+# is part of every key (increase it when a change to the model alters results)
+DEFAULT_CACHE_DIR = '.results_cache'
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+RESULTS_CACHE_VERSION = 2
+
+# number of worker processes used to run replications.
+# 1 runs replications serially in the current process (required for stlite,
+# where no process pool is available); -1 uses every available core.
+DEFAULT_N_JOBS = 1
+
 # Show the a trace of simulated events
 # not recommended when running multiple replications
 TRACE = False
@@ -216,1456 +286,3731 @@ class CustomResource(simpy.Resource):
 #         if hasattr(resource, name):
 #             setattr(resource, name, get_wrapper(getattr(resource, name)))
 
-# ## Model parameterisation
+# ## Resource pools
 
-class Scenario:
+class ResourcePool:
     '''
-    Container class for scenario parameters/arguments
-
-    Passed to a model and its process classes
+    A pool of identical resources (e.g. triage bays) identified by the
+    integer ids 1 to n_resources.
+
+    The free ids are kept as the set bits of an int, so a request is
+    given the lowest free id and a release is O(1).  A request is a
+    single simpy event, and a released id goes to the longest waiting
+    request (see hand_over) rather than back into the pool.
+
+    The number in use is updated only when a resource is taken from or
+    returned to the pool, and the time-weighted number in use (busy time)
+    is accumulated as the run progresses.  This gives exact utilisation
+    without an auditing process.
     '''
+    def __init__(self, env, n_resources):
+        '''
+        Params:
+        ------
+        env: simpy.Environment
+            the simulation environment
 
-    def __init__(self,
-                 random_number_set=1,
-                 n_triage=DEFAULT_N_TRIAGE,
-                 n_reg=DEFAULT_N_REG,
-                 n_exam=DEFAULT_N_EXAM,
-                 n_trauma=DEFAULT_N_TRAUMA,
-                 n_cubicles_1=DEFAULT_N_CUBICLES_1,
-                 n_cubicles_2=DEFAULT_N_CUBICLES_2,
-                 triage_mean=DEFAULT_TRIAGE_MEAN,
-                 reg_mean=DEFAULT_REG_MEAN,
-                 reg_var=DEFAULT_REG_VAR,
-                 exam_mean=DEFAULT_EXAM_MEAN,
-                 exam_var=DEFAULT_EXAM_VAR,
-                 trauma_mean=DEFAULT_TRAUMA_MEAN,
-                 trauma_treat_mean=DEFAULT_TRAUMA_TREAT_MEAN,
-                 trauma_treat_var=DEFAULT_TRAUMA_TREAT_VAR,
-                 non_trauma_treat_mean=DEFAULT_NON_TRAUMA_TREAT_MEAN,
-                 non_trauma_treat_var=DEFAULT_NON_TRAUMA_TREAT_VAR,
-                 non_trauma_treat_p=DEFAULT_NON_TRAUMA_TREAT_P,
-                 prob_trauma=DEFAULT_PROB_TRAUMA,
-                 arrival_df=NSPP_PATH,
-                 override_arrival_rate=OVERRIDE_ARRIVAL_RATE,
-                 manual_arrival_rate=MANUAL_ARRIVAL_RATE_VALUE,
-                 model="full"
-                 ):
+        n_resources: int
+            The number of resources in the pool
         '''
-        Create a scenario to parameterise the simulation model
+        self._env = env
+        self.n_resources = n_resources
+        # bit (id - 1) is set when resource id is free
+        self.free = (1 << n_resources) - 1
+        # requests waiting for a resource, in order of request, and how
+        # many of them are already being handed a released resource
+        self.waiting = deque()
+        self.n_handing_over = 0
+
+        # number in use and the time-weighted total
+        self.n_busy = 0
+        self.busy_integral = 0.0
+        self.last_change = env.now
+
+        # history of changes to the number in use
+        self.change_times = [env.now]
+        self.n_busy_history = [0]
+
+    def get(self):
+        '''
+        Request a resource.  Yield the returned request to wait for it;
+        the process resumes with the resource id.
+        '''
+        request = self.request()
+        if self.free:
+            # (while any resource is free, every waiting request is
+            # already being handed a released resource)
+            self.grant(request, self.take())
+        else:
+            self.waiting.append(request)
+        return request
 
-        Parameters:
-        -----------
-        random_number_set: int, optional (default=DEFAULT_RNG_SET)
-            Set to control the initial seeds of each stream of pseudo
-            random numbers used in the model.
+    def put(self, resource_id):
+        '''
+        Release a resource
 
-        n_triage: int
-            The number of triage cubicles
+        Params:
+        ------
+        resource_id: int
+            The id given to the process by get
+        '''
+        if len(self.waiting) > self.n_handing_over:
+            # handed to the longest waiting request that is not already
+            # being handed one, so remains in use
+            self.n_handing_over += 1
+            self.hand_over(resource_id)
+            return
 
-        n_reg: int
-            The number of registration clerks
+        self.free |= 1 << (resource_id - 1)
+        self.record_change(self.n_busy - 1)
 
-        n_exam: int
-            The number of examination rooms
+    def take(self):
+        '''
+        Remove the lowest free id from the pool and return it
+        '''
+        lowest = self.free & -self.free
+        self.free ^= lowest
+        self.record_change(self.n_busy + 1)
+        return lowest.bit_length()
 
-        n_trauma: int
-            The number of trauma bays for stablisation
+    def request(self):
+        '''
+        Create a request for a resource
+        '''
+        return self._env.event()
 
-        n_cubicles_1: int
-            The number of non-trauma treatment cubicles
+    def grant(self, request, resource_id):
+        '''
+        Give a resource to a request
 
-        n_cubicles_2: int
-            The number of trauma treatment cubicles
+        Params:
+        ------
+        request: simpy.Event
+            Created by request
 
-        triage_mean: float
-            Mean duration of the triage distribution (Exponential)
+        resource_id: int
+            The resource's id
+        '''
+        request.succeed(resource_id)
 
-        reg_mean: float
-            Mean duration of the registration distribution (Lognormal)
+    def hand_over(self, resource_id):
+        '''
+        Grant a released resource to the longest waiting request once the
+        release has been processed.  As with a simpy.Store, anything else
+        the releasing process does at the same time (e.g. requesting its
+        next resource) happens first.  This keeps the order samples are
+        taken in, and so the results, the same as the simpy.Store of
+        CustomResource objects this pool replaced.
 
-        reg_var: float
-            Variance of the registration distribution (Lognormal)
+        Params:
+        ------
+        resource_id: int
+            The id of the released resource
+        '''
+        release = self._env.event()
+        release.callbacks.append(
+            lambda event: self.grant_waiting(event.value))
+        release.succeed(resource_id)
 
-        exam_mean: float
-            Mean of the examination distribution (Normal)
+    def grant_waiting(self, resource_id):
+        '''
+        Grant a released resource to the longest waiting request
+        (see hand_over)
 
-        exam_var: float
-            Variance of the examination distribution (Normal)
+        Params:
+        ------
+        resource_id: int
+            The id of the released resource
+        '''
+        self.n_handing_over -= 1
+        self.grant(self.waiting.popleft(), resource_id)
 
-        trauma_mean: float
-            Mean of the trauma stabilisation distribution (Exponential)
+    def record_change(self, n_busy):
+        '''
+        Update the busy time and history if the number in use has changed.
 
-        trauma_treat_mean: float
-            Mean of the trauma cubicle treatment distribution (Lognormal)
+        Params:
+        ------
+        n_busy: int
+            The number in use after a resource was taken or returned
+        '''
+        if n_busy == self.n_busy:
+            return
+
+        now = self._env.now
+        self.busy_integral += self.n_busy * (now - self.last_change)
+        self.n_busy = n_busy
+        self.last_change = now
+
+        # only keep the final state for each point in time
+        if self.change_times[-1] == now:
+            if len(self.n_busy_history) > 1 and self.n_busy_history[-2] == n_busy:
+                # changed and changed back at the same time
+                self.change_times.pop()
+                self.n_busy_history.pop()
+            else:
+                self.n_busy_history[-1] = n_busy
+        else:
+            self.change_times.append(now)
+            self.n_busy_history.append(n_busy)
 
-        trauma_treat_var: float
-            Variance of the trauma cubicle treatment distribution (Lognormal)
+    def busy_time(self, until=None):
+        '''
+        Total time resources in the pool have been in use up to a time.
 
-        non_trauma_treat_mean: float
-            Mean of the non trauma treatment distribution
+        Params:
+        ------
+        until: float, optional (default=None)
+            Time up to which to total. Defaults to the current simulation
+            time.
 
-        non_trauma_treat_var: float
-            Variance of the non trauma treatment distribution
+        Returns:
+        -------
+        float
+        '''
+        if until is None:
+            until = self._env.now
 
-        non_trauma_treat_p: float
-            Probability non trauma patient requires treatment
+        if until >= self.last_change:
+            return self.busy_integral + self.n_busy * (until - self.last_change)
 
-        prob_trauma: float
-            probability that a new arrival is a trauma patient.
+        # an earlier time: total from the history of changes
+        times = np.append(self.change_times, until)
+        n = np.searchsorted(times[:-1], until, side='right')
+        durations = np.diff(times[:n]).tolist() + [until - times[n - 1]]
+        return float(np.dot(durations, self.n_busy_history[:n]))
 
-        model: string
-            What model to run. Default is full. 
-            Options are "full", "simplest", "simple_with_branch"
+    def utilisation(self, period, warm_up=0.0):
         '''
-        # sampling
-        self.random_number_set = random_number_set
+        Proportion of the period [warm_up, warm_up + period] the pool of
+        resources was in use.
 
-        # store parameters for sampling
-        self.triage_mean = triage_mean
-        self.reg_mean = reg_mean
-        self.reg_var = reg_var
-        self.exam_mean = exam_mean
-        self.exam_var = exam_var
-        self.trauma_mean = trauma_mean
-        self.trauma_treat_mean = trauma_treat_mean
-        self.trauma_treat_var = trauma_treat_var
-        self.non_trauma_treat_mean = non_trauma_treat_mean
-        self.non_trauma_treat_var = non_trauma_treat_var
-        self.non_trauma_treat_p = non_trauma_treat_p
-        self.prob_trauma = prob_trauma
-        self.manual_arrival_rate = manual_arrival_rate
-        self.arrival_df = arrival_df
-        self.override_arrival_rate = override_arrival_rate
-        self.model = model
-
-        self.init_sampling()
+        Params:
+        ------
+        period: float
+            Length of the period (e.g. the results collection period)
 
-        # count of each type of resource
-        self.init_resource_counts(n_triage, n_reg, n_exam, n_trauma,
-                                  n_cubicles_1, n_cubicles_2)
+        warm_up: float, optional (default=0.0)
+            Start of the period
 
-    def set_random_no_set(self, random_number_set):
-        '''
-        Controls the random sampling 
-        Parameters:
-        ----------
-        random_number_set: int
-            Used to control the set of psuedo random numbers
-            used by the distributions in the simulation.
+        Returns:
+        -------
+        float
         '''
-        self.random_number_set = random_number_set
-        self.init_sampling()
+        busy = (self.busy_time(until=warm_up + period)
+                - self.busy_time(until=warm_up))
+        return busy / (period * self.n_resources)
 
-    def init_resource_counts(self, n_triage, n_reg, n_exam, n_trauma,
-                             n_cubicles_1, n_cubicles_2):
-        '''
-        Init the counts of resources to default values...
-        '''
-        self.n_triage = n_triage
-        self.n_reg = n_reg
-        self.n_exam = n_exam
-        self.n_trauma = n_trauma
+def utilisation_audit_frame(resources):
+    '''
+    Returns the history of the number of resources in use as a
+    pandas.DataFrame with one row each time the number changed.
 
-        # non-trauma (1), trauma (2) treatment cubicles
-        self.n_cubicles_1 = n_cubicles_1
-        self.n_cubicles_2 = n_cubicles_2
+    Params:
+    ------
+    resources: list
+        a list of dictionaries containing ResourcePool objects in the format
+        [{'resource_name':'my_resource', 'resource_object': pool}]
 
-    def init_sampling(self):
-        '''
-        Create the distributions used by the model and initialise 
-        the random seeds of each.
-        '''
-        # create random number streams
-        rng_streams = np.random.default_rng(self.random_number_set)
-        self.seeds = rng_streams.integers(0, 999999999, size=N_STREAMS)
+    Returns:
+    -------
+    pd.DataFrame
+    '''
+    frames = [
+        pd.DataFrame({
+            'resource_name': resource['resource_name'],
+            'simulation_time': resource['resource_object'].change_times,
+            'number_utilised': resource['resource_object'].n_busy_history,
+            'number_available': resource['resource_object'].n_resources
+        })
+        for resource in resources
+    ]
+    audit = pd.concat(frames, ignore_index=True)
+    return audit.sort_values('simulation_time', kind='stable',
+                             ignore_index=True)
+
+
+def monitored_utilisation(resources, period, warm_up=0.0):
+    '''
+    Returns the exact utilisation of each resource over
+    [warm_up, warm_up + period] as a pandas.Series indexed by resource name.
 
-        # create distributions
+    Params:
+    ------
+    resources: list
+        a list of dictionaries containing ResourcePool objects in the format
+        [{'resource_name':'my_resource', 'resource_object': pool}]
 
-        # Triage duration
-        self.triage_dist = Exponential(self.triage_mean,
-                                       random_seed=self.seeds[0])
+    period: float
+        Length of the period (e.g. the results collection period)
 
-        # Registration duration (non-trauma only)
-        self.reg_dist = Lognormal(self.reg_mean,
-                                  np.sqrt(self.reg_var),
-                                  random_seed=self.seeds[1])
+    warm_up: float, optional (default=0.0)
+        Start of the period
 
-        # Evaluation (non-trauma only)
-        self.exam_dist = Normal(self.exam_mean,
-                                np.sqrt(self.exam_var),
-                                random_seed=self.seeds[2])
+    Returns:
+    -------
+    pd.Series
+    '''
+    return pd.Series({resource['resource_name']:
+                      resource['resource_object'].utilisation(period, warm_up)
+                      for resource in resources},
+                     name='utilisation')
 
-        # Trauma/stablisation duration (trauma only)
-        self.trauma_dist = Exponential(self.trauma_mean,
-                                       random_seed=self.seeds[3])
 
-        # Non-trauma treatment
-        self.nt_treat_dist = Lognormal(self.non_trauma_treat_mean,
-                                       np.sqrt(self.non_trauma_treat_var),
-                                       random_seed=self.seeds[4])
+# ## Event-heap engine
 
-        # treatment of trauma patients
-        self.treat_dist = Lognormal(self.trauma_treat_mean,
-                                    np.sqrt(self.non_trauma_treat_var),
-                                    random_seed=self.seeds[5])
+class HeapEnvironment:
+    '''
+    A minimal discrete-event simulation kernel used in place of
+    simpy.Environment when a Scenario has engine="heap".
+
+    It provides only what the models and pathways use: `now`,
+    `timeout`, `process` and `run`, with resources given by
+    HeapResourcePool.  Processes are generators, as in SimPy, but a
+    timeout or resource request is pushed straight onto a heap of
+    (time, event id, process, value) entries when it is created and the
+    process simply yields.  No event objects or callbacks are created, so
+    a run is faster: measured on 30 day runs, about 2.2-2.6x for the full
+    and simple_with_branch models and 1.3-1.9x for the simplest model
+    (see ENGINES).
+
+    Events are processed in the same order as SimPy (by time, then the
+    order they were scheduled, with newly started processes first), so
+    a model gives identical results whichever engine it runs on.
+    '''
+    def __init__(self, initial_time=0):
+        '''
+        Params:
+        ------
+        initial_time: float, optional (default=0)
+            The simulation time at the start of the run
+        '''
+        self.now = initial_time
+        self.active_process = None
+        self._queue = []
+        self._eid = count()
+        # processes started but not yet run (SimPy's urgent init events)
+        self._new_processes = deque()
+
+    def schedule(self, process, delay=0, value=None):
+        '''
+        Resume a process after a delay
 
-        # probability of non-trauma patient requiring treatment
-        self.nt_p_treat_dist = Bernoulli(self.non_trauma_treat_p,
-                                         random_seed=self.seeds[6])
+        Params:
+        ------
+        process: generator
+            The process to resume
 
-        # probability of non-trauma versus trauma patient
-        self.p_trauma_dist = Bernoulli(self.prob_trauma,
-                                       random_seed=self.seeds[7])
+        delay: float, optional (default=0)
+            Time from now to resume the process
 
-        # init sampling for non-stationary poisson process
-        self.init_nspp()
+        value: object, optional (default=None)
+            Sent to the process when it resumes
+        '''
+        heappush(self._queue,
+                 (self.now + delay, next(self._eid), process, value))
 
-    def init_nspp(self):
+    def timeout(self, delay):
+        '''
+        Resume the active process after a delay.  The process should then
+        yield (the return value is None).
 
-        # read arrival profile
-        self.arrivals = pd.read_csv(NSPP_PATH)  # pylint: disable=attribute-defined-outside-init
-        self.arrivals['mean_iat'] = 60 / self.arrivals['arrival_rate']
+        Params:
+        ------
+        delay: float
+            Time from now to resume the process
+        '''
+        if delay < 0:
+            raise ValueError(f'Negative delay {delay}')
+        heappush(self._queue, (self.now + delay, next(self._eid),
+                               self.active_process, None))
 
-        # maximum arrival rate (smallest time between arrivals)
-        self.lambda_max = self.arrivals['arrival_rate'].max()  # pylint: disable=attribute-defined-outside-init
+    def process(self, generator):
+        '''
+        Start a process. It is run before any other event at the
+        current time.
 
-        # thinning exponential
-        if self.override_arrival_rate is True:
+        Params:
+        ------
+        generator: generator
+            The process e.g. `patient.execute()`
+        '''
+        self._new_processes.append(generator)
 
-            self.arrival_dist = Exponential(self.manual_arrival_rate,  # pylint: disable=attribute-defined-outside-init
-                                            random_seed=self.seeds[8])
-        else:
-            self.arrival_dist = Exponential(60.0 / self.lambda_max,  # pylint: disable=attribute-defined-outside-init
-                                            random_seed=self.seeds[8])
+    def run(self, until):
+        '''
+        Process events until the simulation time reaches until.
+        Events scheduled for exactly until are not processed.
 
-            # thinning uniform rng
-            self.thinning_rng = Uniform(low=0.0, high=1.0,  # pylint: disable=attribute-defined-outside-init
-                                        random_seed=self.seeds[9])
+        Params:
+        ------
+        until: float
+            The time to run the simulation until
+        '''
+        queue = self._queue
+        new_processes = self._new_processes
 
+        while True:
+            while new_processes:
+                self.resume(new_processes.popleft(), None)
 
-# ## Patient Pathways Process Logic
+            if not queue or queue[0][0] >= until:
+                break
 
+            # (as resume, inlined as this is the innermost loop of a run)
+            self.now, _, process, value = heappop(queue)
+            self.active_process = process
+            try:
+                process.send(value)
+            except StopIteration:
+                pass
 
-class TraumaPathway:
-    '''
-    Encapsulates the process a patient with severe injuries or illness.
+        self.now = until
 
-    These patients are signed into the ED and triaged as having severe injuries
-    or illness.
+    def resume(self, process, value):
+        '''
+        Run a process until it next yields (or finishes)
 
-    Patients are stabilised in resus (trauma) and then sent to Treatment.  
-    Following treatment they are discharged.
-    '''
+        Params:
+        ------
+        process: generator
+            The process to resume
 
-    def __init__(self, identifier, env, args, full_event_log):
+        value: object
+            Sent to the process (e.g. the resource it requested)
         '''
-        Constructor method
+        self.active_process = process
+        try:
+            process.send(value)
+        except StopIteration:
+            pass
 
-        Params:
-        -----
-        identifier: int
-            a numeric identifier for the patient.
 
-        env: simpy.Environment
-            the simulation environment
-
-        args: Scenario
-            Container class for the simulation parameters
+class HeapResourcePool(ResourcePool):
+    '''
+    A ResourcePool for use with HeapEnvironment.
 
+    A request is the requesting process itself, which is resumed with
+    the resource id when the resource is granted.
+    '''
+    def __init__(self, env, n_resources):
         '''
-        self.identifier = identifier
-        self.env = env
-        self.args = args
-        self.full_event_log = full_event_log
+        Params:
+        ------
+        env: HeapEnvironment
+            the simulation environment
 
-        # metrics
-        self.arrival = -np.inf
-        self.wait_triage = -np.inf
-        self.wait_trauma = -np.inf
-        self.wait_treat = -np.inf
-        self.total_time = -np.inf
+        n_resources: int
+            The number of resources in the pool
+        '''
+        super().__init__(env, n_resources)
 
-        self.triage_duration = -np.inf
-        self.trauma_duration = -np.inf
-        self.treat_duration = -np.inf
+        # process that hands released resources to waiting processes
+        self._dispatcher = self.dispatch()
+        next(self._dispatcher)
 
-    def execute(self):
+    def request(self):
         '''
-        simulates the major treatment process for a patient
-
-        1. request and wait for sign-in/triage
-        2. trauma
-        3. treatment
+        The active process, which should yield after calling get
         '''
-        # record the time of arrival and entered the triage queue
-        self.arrival = self.env.now
-        self.full_event_log.append(
-            {'patient': self.identifier,
-             'pathway': 'Trauma',
-             'event_type': 'queue',
-             'event': 'triage_wait_begins',
-             'time': self.env.now}
-        )
-
-        ###################################################
-        # request sign-in/triage
-        triage_resource = yield self.args.triage.get()
+        return self._env.active_process
 
-        # record the waiting time for triage
-        self.wait_triage = self.env.now - self.arrival
+    def grant(self, request, resource_id):
+        '''
+        Resume a waiting process with a resource id
 
-        trace(f'patient {self.identifier} triaged to trauma '
-                f'{self.env.now:.3f}')
-        self.full_event_log.append(
-            {'patient': self.identifier,
-             'pathway': 'Trauma',
-             'event_type': 'resource_use',
-             'event': 'triage_begins',
-             'time': self.env.now,
-             'resource_id': triage_resource.id_attribute
-            }
-        )
+        Params:
+        ------
+        request: generator
+            The process that requested the resource
 
-        # sample triage duration.
-        self.triage_duration = self.args.triage_dist.sample()
-        yield self.env.timeout(self.triage_duration)
-        
-        trace(f'triage {self.identifier} complete {self.env.now:.3f}; '
-              f'waiting time was {self.wait_triage:.3f}')
-        self.full_event_log.append(
-            {'patient': self.identifier,
-             'pathway': 'Trauma',
-             'event_type': 'resource_use_end',
-             'event': 'triage_complete',
-             'time': self.env.now,
-             'resource_id': triage_resource.id_attribute}
-        )
+        resource_id: int
+            The resource's id
+        '''
+        self._env.schedule(request, value=resource_id)
 
-        # Resource is no longer in use, so put it back in the store 
-        self.args.triage.put(triage_resource) 
-        ###################################################
+    def hand_over(self, resource_id):
+        '''
+        Grant a released resource to the longest waiting process once the
+        release has been processed (see ResourcePool.hand_over)
 
-        # record the time that entered the trauma queue
-        start_wait = self.env.now
-        self.full_event_log.append(
-            {'patient': self.identifier,
-             'pathway': 'Trauma',
-             'event_type': 'queue',
-             'event': 'TRAUMA_stabilisation_wait_begins',
-             'time': self.env.now}
-        )
+        Params:
+        ------
+        resource_id: int
+            The id of the released resource
+        '''
+        self._env.schedule(self._dispatcher, value=resource_id)
 
-        ###################################################
-        # request trauma room
-        trauma_resource = yield self.args.trauma.get()
-
-        self.full_event_log.append(
-            {'patient': self.identifier,
-                'pathway': 'Trauma',
-                'event_type': 'resource_use',
-                'event': 'TRAUMA_stabilisation_begins',
-                'time': self.env.now,
-                'resource_id': trauma_resource.id_attribute
-                }
-        )
+    def dispatch(self):
+        '''
+        Process that grants the resource it is resumed with to the
+        longest waiting process
+        '''
+        while True:
+            resource_id = yield
+            self.grant_waiting(resource_id)
 
-        # record the waiting time for trauma
-        self.wait_trauma = self.env.now - start_wait
 
-        # sample stablisation duration.
-        self.trauma_duration = self.args.trauma_dist.sample()
-        yield self.env.timeout(self.trauma_duration)
+def create_environment(args):
+    '''
+    Create the simulation environment for the engine selected by
+    args.engine
 
-        trace(f'stabilisation of patient {self.identifier} at '
-              f'{self.env.now:.3f}')
-        self.full_event_log.append(
-            {'patient': self.identifier,
-             'pathway': 'Trauma',
-             'event_type': 'resource_use_end',
-             'event': 'TRAUMA_stabilisation_complete',
-             'time': self.env.now,
-             'resource_id': trauma_resource.id_attribute
-            }
-        )
-        # Resource is no longer in use, so put it back in the store
-        self.args.trauma.put(trauma_resource)
-        
-        #######################################################
+    Params:
+    ------
+    args: Scenario
+        Container class for the simulation parameters
 
-        # record the time that entered the treatment queue
-        start_wait = self.env.now
-        self.full_event_log.append(
-            {'patient': self.identifier,
-             'pathway': 'Trauma',
-             'event_type': 'queue',
-             'event': 'TRAUMA_treatment_wait_begins',
-             'time': self.env.now}
-        )
+    Returns:
+    -------
+    simpy.Environment or HeapEnvironment
+    '''
+    if args.engine == "heap":
+        return HeapEnvironment()
+    return simpy.Environment()
 
-        ########################################################
-        # request treatment cubicle
-        trauma_treatment_resource = yield self.args.cubicle_2.get()
 
-        # record the waiting time for trauma
-        self.wait_treat = self.env.now - start_wait
-        trace(f'treatment of patient {self.identifier} at '
-                f'{self.env.now:.3f}')
-        self.full_event_log.append(
-            {'patient': self.identifier,
-                'pathway': 'Trauma',
-                'event_type': 'resource_use',
-                'event': 'TRAUMA_treatment_begins',
-                'time': self.env.now,
-                'resource_id': trauma_treatment_resource.id_attribute
-                }
-        )
+def create_resource_pool(env, n_resources):
+    '''
+    Create a pool of n_resources identical resources with ids 1 to
+    n_resources, monitored for utilisation.
 
-        # sample treatment duration.
-        self.treat_duration = self.args.trauma_dist.sample()
-        yield self.env.timeout(self.treat_duration)
+    Params:
+    ------
+    env: simpy.Environment or HeapEnvironment
+        the simulation environment
 
-        trace(f'patient {self.identifier} treatment complete {self.env.now:.3f}; '
-              f'waiting time was {self.wait_treat:.3f}')
-        self.full_event_log.append(
-            {'patient': self.identifier,
-             'pathway': 'Trauma',
-             'event_type': 'resource_use_end',
-             'event': 'TRAUMA_treatment_complete',
-             'time': self.env.now,
-             'resource_id': trauma_treatment_resource.id_attribute}
-        )
-        self.full_event_log.append(
-            {'patient': self.identifier,
-            'pathway': 'Shared',
-            'event': 'depart',
-            'event_type': 'arrival_departure',
-            'time': self.env.now}
-        )
+    n_resources: int
+        The number of resources
 
-        # Resource is no longer in use, so put it back in the store
-        self.args.cubicle_2.put(trauma_treatment_resource) 
+    Returns:
+    -------
+    ResourcePool or HeapResourcePool
+    '''
+    if isinstance(env, HeapEnvironment):
+        return HeapResourcePool(env, n_resources)
+    return ResourcePool(env, n_resources)
 
-        #########################################################
 
-        # total time in system
-        self.total_time = self.env.now - self.arrival
+# ## Event logging
 
-class NonTraumaPathway(object):
+class EventLog:
     '''
-    Encapsulates the process a patient with minor injuries and illness.
+    Columnar log of the events that happen to patients during a run.
 
-    These patients are signed into the ED and triaged as having minor 
-    complaints and streamed to registration and then examination. 
-
-    Post examination 40% are discharged while 60% proceed to treatment.  
-    Following treatment they are discharged.
+    Each event is written straight into preallocated typed numpy columns
+    (which double in size when full) rather than being stored as a dict.
+    The text columns (pathway, event_type and event) are stored as
+    integer codes, and converted back when the log is turned into a
+    DataFrame with `to_frame()`.
     '''
+    CODED_COLUMNS = ['pathway', 'event_type', 'event']
 
-    def __init__(self, identifier, env, args, full_event_log):
+    def __init__(self, capacity=EVENT_LOG_INITIAL_CAPACITY):
         '''
-        Constructor method
+        Params:
+        ------
+        capacity: int, optional (default=EVENT_LOG_INITIAL_CAPACITY)
+            Number of events to allocate space for up front
+        '''
+        self.n_events = 0
+        self.capacity = capacity
+
+        self.patient = np.empty(capacity, dtype=np.int64)
+        self.pathway = np.empty(capacity, dtype=np.int16)
+        self.event_type = np.empty(capacity, dtype=np.int16)
+        self.event = np.empty(capacity, dtype=np.int16)
+        self.time = np.empty(capacity, dtype=np.float64)
+        # -1 for events that do not involve a resource
+        self.resource_id = np.empty(capacity, dtype=np.int32)
+
+        # integer code for each distinct string seen, per coded column
+        self.pathway_codes = {}
+        self.event_type_codes = {}
+        self.event_codes = {}
+
+    def __len__(self):
+        return self.n_events
+
+    def record(self, patient, pathway, event_type, event, time,
+               resource_id=-1):
+        '''
+        Add an event to the log
 
         Params:
-        -----
-        identifier: int
-            a numeric identifier for the patient.
+        ------
+        patient: int
+            patient identifier
 
-        env: simpy.Environment
-            the simulation environment
+        pathway: str
+            e.g. 'Trauma'
 
-        args: Scenario
-            Container class for the simulation parameters
+        event_type: str
+            e.g. 'queue', 'resource_use'
 
-        '''
-        self.identifier = identifier
-        self.env = env
-        self.args = args
-        self.full_event_log = full_event_log
+        event: str
+            e.g. 'triage_wait_begins'
 
-        # triage resource
-        self.triage = args.triage
+        time: float
+            simulation time of the event
 
-        # metrics
-        self.arrival = -np.inf
-        self.wait_triage = -np.inf
-        self.wait_reg = -np.inf
-        self.wait_exam = -np.inf
-        self.wait_treat = -np.inf
-        self.total_time = -np.inf
+        resource_id: int, optional (default=-1)
+            id of the resource used, or -1 if no resource is involved
+        '''
+        i = self.n_events
+        if i == self.capacity:
+            self.grow()
 
-        self.triage_duration = -np.inf
-        self.reg_duration = -np.inf
-        self.exam_duration = -np.inf
-        self.treat_duration = -np.inf
+        self.patient[i] = patient
+        self.pathway[i] = self.pathway_codes.setdefault(pathway, len(self.pathway_codes))
+        self.event_type[i] = self.event_type_codes.setdefault(event_type, len(self.event_type_codes))
+        self.event[i] = self.event_codes.setdefault(event, len(self.event_codes))
+        self.time[i] = time
+        self.resource_id[i] = resource_id
 
-    def execute(self):
-        '''
-        simulates the non-trauma/minor treatment process for a patient
+        self.n_events = i + 1
 
-        1. request and wait for sign-in/triage
-        2. patient registration
-        3. examination
-        4.1 40% discharged
-        4.2 60% treatment then discharge
+    def grow(self):
         '''
-        # record the time of arrival and entered the triage queue
-        self.arrival = self.env.now
-        self.full_event_log.append(
-            {'patient': self.identifier,
-             'pathway': 'Non-Trauma',
-             'event_type': 'queue',
-             'event': 'triage_wait_begins',
-             'time': self.env.now}
-        )
-
-        ###################################################
-        # request sign-in/triage
-        triage_resource = yield self.args.triage.get()
+        Double the space available in every column
+        '''
+        self.capacity *= 2
+        for column in ['patient', 'pathway', 'event_type', 'event', 'time',
+                       'resource_id']:
+            values = getattr(self, column)
+            grown = np.empty(self.capacity, dtype=values.dtype)
+            grown[:self.n_events] = values[:self.n_events]
+            setattr(self, column, grown)
+
+    def to_frame(self):
+        '''
+        Returns the event log as a pandas.DataFrame, one row per event.
 
-        # record the waiting time for triage
-        self.wait_triage = self.env.now - self.arrival
-        trace(f'patient {self.identifier} triaged to minors '
-                f'{self.env.now:.3f}')
-        self.full_event_log.append(
-            {'patient': self.identifier,
-                'pathway': 'Non-Trauma',
-                'event_type': 'resource_use',
-                'event': 'triage_begins',
-                'time': self.env.now,
-                'resource_id': triage_resource.id_attribute
-                }
-        )
+        pathway, event_type and event are categorical columns.
+        resource_id is NaN for events that do not involve a resource.
 
-        # sample triage duration.
-        self.triage_duration = self.args.triage_dist.sample()
-        yield self.env.timeout(self.triage_duration)
+        Returns:
+        -------
+        pd.DataFrame
+        '''
+        n = self.n_events
 
-        trace(f'triage {self.identifier} complete {self.env.now:.3f}; '
-                f'waiting time was {self.wait_triage:.3f}')
-        self.full_event_log.append(
-            {'patient': self.identifier,
-                'pathway': 'Non-Trauma',
-                'event_type': 'resource_use_end',
-                'event': 'triage_complete',
-                'time': self.env.now,
-                'resource_id': triage_resource.id_attribute}
-        )
+        columns = {'patient': self.patient[:n]}
 
-        # Resource is no longer in use, so put it back in the store 
-        self.args.triage.put(triage_resource) 
-        #########################################################
+        for column in self.CODED_COLUMNS:
+            codes = getattr(self, f'{column}_codes')
+            # order categories alphabetically so logs from different runs
+            # share a dtype whenever they contain the same events
+            categories = sorted(codes)
+            recode = np.empty(max(len(codes), 1), dtype=np.int16)
+            recode[[codes[c] for c in categories]] = np.arange(len(categories))
+            columns[column] = pd.Categorical.from_codes(
+                recode[getattr(self, column)[:n]], categories=categories)
 
-        # record the time that entered the registration queue
-        start_wait = self.env.now
-        self.full_event_log.append(
-            {'patient': self.identifier,
-             'pathway': 'Non-Trauma',
-             'event_type': 'queue',
-             'event': 'MINORS_registration_wait_begins',
-             'time': self.env.now}
-        )
+        columns['time'] = self.time[:n]
 
-        #########################################################
-        # request registration clerk
-        registration_resource = yield self.args.registration.get()
-            
-        # record the waiting time for registration
-        self.wait_reg = self.env.now - start_wait
-        trace(f'registration of patient {self.identifier} at '
-                f'{self.env.now:.3f}')
-        self.full_event_log.append(
-            {'patient': self.identifier,
-                'pathway': 'Non-Trauma',
-                'event_type': 'resource_use',
-                'event': 'MINORS_registration_begins',
-                'time': self.env.now,
-                'resource_id': registration_resource.id_attribute
-                }
-        )
+        resource_id = self.resource_id[:n]
+        columns['resource_id'] = np.where(resource_id >= 0, resource_id, np.nan)
 
-        # sample registration duration.
-        self.reg_duration = self.args.reg_dist.sample()
-        yield self.env.timeout(self.reg_duration)
+        return pd.DataFrame(columns)
 
-        trace(f'patient {self.identifier} registered at'
-                f'{self.env.now:.3f}; '
-                f'waiting time was {self.wait_reg:.3f}')
-        self.full_event_log.append(
-            {'patient': self.identifier,
-                'pathway': 'Non-Trauma',
-                'event': 'MINORS_registration_complete',
-                'event_type': 'resource_use_end',
-                'time': self.env.now,
-                'resource_id': registration_resource.id_attribute}
-        )
-        # Resource is no longer in use, so put it back in the store
-        self.args.registration.put(registration_resource)
-        ########################################################
 
-        # record the time that entered the evaluation queue
-        start_wait = self.env.now
+class NullEventLog:
+    '''
+    Stands in for an EventLog when event logging is switched off.
 
-        self.full_event_log.append(
-            {'patient': self.identifier,
-             'pathway': 'Non-Trauma',
-             'event': 'MINORS_examination_wait_begins',
-             'event_type': 'queue',
-             'time': self.env.now}
-        )
+    Recording an event does nothing, so a model built with
+    event_logging=False pays no cost for logging.
+    '''
+    def __len__(self):
+        return 0
 
-        #########################################################
-        # request examination resource
-        examination_resource = yield self.args.exam.get()
+    def record(self, patient, pathway, event_type, event, time,
+               resource_id=-1):
+        '''
+        Discard an event. See EventLog.record
+        '''
 
-        # record the waiting time for examination to begin
-        self.wait_exam = self.env.now - start_wait
-        trace(f'examination of patient {self.identifier} begins '
-                f'{self.env.now:.3f}')
-        self.full_event_log.append(
-            {'patient': self.identifier,
-                'pathway': 'Non-Trauma',
-                'event': 'MINORS_examination_begins',
-                'event_type': 'resource_use',
-                'time': self.env.now,
-                'resource_id': examination_resource.id_attribute
-                }
-        )
+    def to_frame(self):
+        '''
+        Returns an empty event log DataFrame
+        '''
+        return EventLog(capacity=0).to_frame()
 
-        # sample examination duration.
-        self.exam_duration = self.args.exam_dist.sample()
-        yield self.env.timeout(self.exam_duration)
 
-        trace(f'patient {self.identifier} examination complete '
-                f'at {self.env.now:.3f};'
-                f'waiting time was {self.wait_exam:.3f}')
-        self.full_event_log.append(
-            {'patient': self.identifier,
-                'pathway': 'Non-Trauma',
-                'event': 'MINORS_examination_complete',
-                'event_type': 'resource_use_end',
-                'time': self.env.now,
-                'resource_id': examination_resource.id_attribute}
-        )
-        # Resource is no longer in use, so put it back in
-        self.args.exam.put(examination_resource) 
-        ############################################################################
+# ## Arrival profiles
 
-        # sample if patient requires treatment?
-        self.require_treat = self.args.nt_p_treat_dist.sample()  #pylint: disable=attribute-defined-outside-init
+class ArrivalProfile:
+    '''
+    A parsed time dependent arrival profile.
 
-        if self.require_treat:
+    Holds the arrival rates (arrivals per hour) along with the derived
+    mean inter-arrival times and maximum arrival rate as numpy arrays.
 
-            self.full_event_log.append(
-                {'patient': self.identifier,
-                 'pathway': 'Non-Trauma',
-                 'event': 'requires_treatment',
-                 'event_type': 'attribute_assigned',
-                 'time': self.env.now}
-            )
+    Instances are shared between every Scenario that uses the same profile
+    (see load_arrival_profile) so should be treated as read only.
+    '''
+    def __init__(self, arrivals):
+        '''
+        Params:
+        ------
+        arrivals: pd.DataFrame
+            Arrival profile with an 'arrival_rate' column, one row per hour
+        '''
+        self.arrivals = arrivals.copy()
+        self.arrivals['mean_iat'] = 60 / self.arrivals['arrival_rate']
 
-            # record the time that entered the treatment queue
-            start_wait = self.env.now
-            self.full_event_log.append(
-                {'patient': self.identifier,
-                 'pathway': 'Non-Trauma',
-                 'event': 'MINORS_treatment_wait_begins',
-                 'event_type': 'queue',
-                 'time': self.env.now}
-            )
-            ###################################################
-            # request treatment cubicle
+        self.arrival_rate = self.arrivals['arrival_rate'].to_numpy(dtype=float)
+        self.mean_iat = self.arrivals['mean_iat'].to_numpy(dtype=float)
 
-            non_trauma_treatment_resource = yield self.args.cubicle_1.get()
+        # maximum arrival rate (smallest time between arrivals)
+        self.lambda_max = self.arrival_rate.max()
 
-            # record the waiting time for treatment
-            self.wait_treat = self.env.now - start_wait
-            trace(f'treatment of patient {self.identifier} begins '
-                    f'{self.env.now:.3f}')
-            self.full_event_log.append(
-                {'patient': self.identifier,
-                    'pathway': 'Non-Trauma',
-                    'event': 'MINORS_treatment_begins',
-                    'event_type': 'resource_use',
-                    'time': self.env.now,
-                    'resource_id': non_trauma_treatment_resource.id_attribute
-                }
-            )
+        self.arrival_rate.flags.writeable = False
+        self.mean_iat.flags.writeable = False
 
-            # sample treatment duration.
-            self.treat_duration = self.args.nt_treat_dist.sample()
-            yield self.env.timeout(self.treat_duration)
 
-            trace(f'patient {self.identifier} treatment complete '
-                    f'at {self.env.now:.3f};'
-                    f'waiting time was {self.wait_treat:.3f}')
-            self.full_event_log.append(
-                {'patient': self.identifier,
-                    'pathway': 'Non-Trauma',
-                    'event': 'MINORS_treatment_ends',
-                    'event_type': 'resource_use_end',
-                    'time': self.env.now,
-                    'resource_id': non_trauma_treatment_resource.id_attribute}
-            )
+# parsed profiles keyed on (path, modification time) or, for profiles passed
+# as a DataFrame, on the arrival rates themselves
+_arrival_profile_cache = {}
 
-            # Resource is no longer in use, so put it back in the store
-            self.args.cubicle_1.put(non_trauma_treatment_resource)
-        ##########################################################################
 
-        # Return to what happens to all patients, regardless of whether they were sampled as needing treatment
-        self.full_event_log.append(
-            {'patient': self.identifier,
-            'pathway': 'Shared',
-            'event': 'depart',
-            'event_type': 'arrival_departure',
-            'time': self.env.now}
-        )
+def load_arrival_profile(arrival_df=NSPP_PATH):
+    '''
+    Return the ArrivalProfile for a csv file or DataFrame.
 
-        # total time in system
-        self.total_time = self.env.now - self.arrival
+    Parsed profiles are cached so that re-seeding a Scenario for every
+    replication does not re-read the csv file.  Files are re-read if their
+    modification time changes.
 
+    Params:
+    ------
+    arrival_df: str or pd.DataFrame, optional (default=NSPP_PATH)
+        Path to a csv file, or a DataFrame, with an 'arrival_rate' column
 
-class TreatmentCentreModel:
+    Returns:
+    -------
+    ArrivalProfile
     '''
-    The treatment centre model
+    if isinstance(arrival_df, pd.DataFrame):
+        key = ('DataFrame',
+               arrival_df['arrival_rate'].to_numpy(dtype=float).tobytes())
+    else:
+        path = os.path.abspath(arrival_df)
+        key = (path, os.path.getmtime(path))
+
+    profile = _arrival_profile_cache.get(key)
+
+    if profile is None:
+        if isinstance(arrival_df, pd.DataFrame):
+            profile = ArrivalProfile(arrival_df)
+        else:
+            profile = ArrivalProfile(pd.read_csv(arrival_df))
+            # forget earlier versions of the same file
+            for stale_key in [k for k in _arrival_profile_cache if k[0] == key[0]]:
+                del _arrival_profile_cache[stale_key]
 
-    Patients arrive at random to a treatment centre, are triaged
-    and then processed in either a trauma or non-trauma pathway.
+        if len(_arrival_profile_cache) >= ARRIVAL_PROFILE_CACHE_SIZE:
+            # evict the oldest entry
+            del _arrival_profile_cache[next(iter(_arrival_profile_cache))]
 
-    The main class that a user interacts with to run the model is 
-    `TreatmentCentreModel`.  This implements a `.run()` method, contains a simple
-    algorithm for the non-stationary poission process for patients arrivals and 
-    inits instances of `TraumaPathway` or `NonTraumaPathway` depending on the 
-    arrival type.    
+        _arrival_profile_cache[key] = profile
 
-    '''
+    return profile
 
-    def __init__(self, args):
-        self.env = simpy.Environment()
-        self.args = args
-        self.init_resources()
 
-        self.patients = []
-        self.trauma_patients = []
-        self.non_trauma_patients = []
+# ## Model parameterisation
 
-        self.rc_period = None
-        self.results = None
+# attributes that the models attach to a Scenario in init_resources()
+MODEL_RESOURCES = ['triage', 'registration', 'exam', 'trauma',
+                   'cubicle_1', 'cubicle_2', 'treatment']
 
-        self.full_event_log = []
-        self.utilisation_audit = []
+# distributions sampled by patients
+PATIENT_DISTRIBUTIONS = ['triage_dist', 'reg_dist', 'exam_dist',
+                         'trauma_dist', 'nt_treat_dist', 'treat_dist',
+                         'nt_p_treat_dist', 'p_trauma_dist']
 
-    def init_resources(self):
-        '''
-        Init the number of resources
-        and store in the arguments container object
+# metrics recorded for each patient (a pathway records a subset of these)
+PATIENT_METRICS = ['arrival', 'wait_triage', 'wait_reg', 'wait_exam',
+                   'wait_trauma', 'wait_treat', 'total_time',
+                   'triage_duration', 'reg_duration', 'exam_duration',
+                   'trauma_duration', 'treat_duration']
 
-        Resource list:
-        1. Sign-in/triage bays
-        2. registration clerks
-        3. examination bays
-        4. trauma bays
-        5. non-trauma cubicles (1)
-        6. trauma cubicles (2)
+class Scenario:
+    '''
+    Container class for scenario parameters/arguments
+
+    Passed to a model and its process classes
+    '''
 
+    def __init__(self,
+                 random_number_set=1,
+                 n_triage=DEFAULT_N_TRIAGE,
+                 n_reg=DEFAULT_N_REG,
+                 n_exam=DEFAULT_N_EXAM,
+                 n_trauma=DEFAULT_N_TRAUMA,
+                 n_cubicles_1=DEFAULT_N_CUBICLES_1,
+                 n_cubicles_2=DEFAULT_N_CUBICLES_2,
+                 triage_mean=DEFAULT_TRIAGE_MEAN,
+                 reg_mean=DEFAULT_REG_MEAN,
+                 reg_var=DEFAULT_REG_VAR,
+                 exam_mean=DEFAULT_EXAM_MEAN,
+                 exam_var=DEFAULT_EXAM_VAR,
+                 trauma_mean=DEFAULT_TRAUMA_MEAN,
+                 trauma_treat_mean=DEFAULT_TRAUMA_TREAT_MEAN,
+                 trauma_treat_var=DEFAULT_TRAUMA_TREAT_VAR,
+                 non_trauma_treat_mean=DEFAULT_NON_TRAUMA_TREAT_MEAN,
+                 non_trauma_treat_var=DEFAULT_NON_TRAUMA_TREAT_VAR,
+                 non_trauma_treat_p=DEFAULT_NON_TRAUMA_TREAT_P,
+                 prob_trauma=DEFAULT_PROB_TRAUMA,
+                 arrival_df=NSPP_PATH,
+                 override_arrival_rate=OVERRIDE_ARRIVAL_RATE,
+                 manual_arrival_rate=MANUAL_ARRIVAL_RATE_VALUE,
+                 model="full",
+                 sample_block_size=DEFAULT_SAMPLE_BLOCK_SIZE,
+                 arrival_sampling=DEFAULT_ARRIVAL_SAMPLING,
+                 common_random_numbers=False,
+                 engine=DEFAULT_ENGINE
+                 ):
         '''
+        Create a scenario to parameterise the simulation model
 
-        # sign/in triage
-        # self.args.triage = CustomResource(self.env,
-        #                                   capacity=self.args.n_triage)
-        
-        self.args.triage = simpy.Store(self.env)
+        Parameters:
+        -----------
+        random_number_set: int, optional (default=DEFAULT_RNG_SET)
+            Set to control the initial seeds of each stream of pseudo
+            random numbers used in the model.
 
-        for i in range(self.args.n_triage):
-            self.args.triage.put(
-                CustomResource(
-                    self.env,
-                    capacity=1,
-                    id_attribute = i+1)
-                )
+        n_triage: int
+            The number of triage cubicles
 
-        # registration
-        # self.args.registration = CustomResource(self.env,
-        #                                         capacity=self.args.n_reg)
+        n_reg: int
+            The number of registration clerks
 
-        self.args.registration = simpy.Store(self.env)
+        n_exam: int
+            The number of examination rooms
 
-        for i in range(self.args.n_reg):
-            self.args.registration.put(
-                CustomResource(
-                    self.env,
-                    capacity=1,
-                    id_attribute = i+1)
-                )
+        n_trauma: int
+            The number of trauma bays for stablisation
 
-        # examination
-        # self.args.exam = CustomResource(self.env,
-        #                                 capacity=self.args.n_exam)
-        
-        self.args.exam = simpy.Store(self.env)
+        n_cubicles_1: int
+            The number of non-trauma treatment cubicles
 
-        for i in range(self.args.n_exam):
-            self.args.exam.put(
-                CustomResource(
-                    self.env,
-                    capacity=1,
-                    id_attribute = i+1)
-                )
+        n_cubicles_2: int
+            The number of trauma treatment cubicles
 
-        # trauma
-        # self.args.trauma = CustomResource(self.env,
-        #                                   capacity=self.args.n_trauma)
-        
-        self.args.trauma = simpy.Store(self.env)
+        triage_mean: float
+            Mean duration of the triage distribution (Exponential)
 
-        for i in range(self.args.n_trauma):
-            self.args.trauma.put(
-                CustomResource(
-                    self.env,
-                    capacity=1,
-                    id_attribute = i+1)
-                )
+        reg_mean: float
+            Mean duration of the registration distribution (Lognormal)
 
-        # non-trauma treatment
-        # self.args.cubicle_1 = CustomResource(self.env,
-        #                                      capacity=self.args.n_cubicles_1)
-        
-        self.args.cubicle_1 = simpy.Store(self.env)
+        reg_var: float
+            Variance of the registration distribution (Lognormal)
 
-        for i in range(self.args.n_cubicles_1):
-            self.args.cubicle_1.put(
-                CustomResource(
-                    self.env,
-                    capacity=1,
-                    id_attribute = i+1)
-                )
+        exam_mean: float
+            Mean of the examination distribution (Normal)
 
-        # trauma treatment
-        # self.args.cubicle_2 = CustomResource(self.env,
-        #                                      capacity=self.args.n_cubicles_2)
-        
-        self.args.cubicle_2 = simpy.Store(self.env)
+        exam_var: float
+            Variance of the examination distribution (Normal)
+
+        trauma_mean: float
+            Mean of the trauma stabilisation distribution (Exponential)
+
+        trauma_treat_mean: float
+            Mean of the trauma cubicle treatment distribution (Lognormal)
+
+        trauma_treat_var: float
+            Variance of the trauma cubicle treatment distribution (Lognormal)
+
+        non_trauma_treat_mean: float
+            Mean of the non trauma treatment distribution
+
+        non_trauma_treat_var: float
+            Variance of the non trauma treatment distribution
 
-        for i in range(self.args.n_cubicles_2):
-            self.args.cubicle_2.put(
-                CustomResource(
-                    self.env,
-                    capacity=1,
-                    id_attribute = i+1)
-                )
+        non_trauma_treat_p: float
+            Probability non trauma patient requires treatment
+
+        prob_trauma: float
+            probability that a new arrival is a trauma patient.
+
+        arrival_df: str or pd.DataFrame
+            Path to a csv file, or a DataFrame, with an hourly
+            'arrival_rate' column.  Parsed profiles are cached.
+
+        model: string
+            What model to run. Default is full. 
+            Options are "full", "simplest", "simple_with_branch"
 
-    def run(self, results_collection_period=DEFAULT_RESULTS_COLLECTION_PERIOD):
+        sample_block_size: int or None, optional
+            (default=DEFAULT_SAMPLE_BLOCK_SIZE)
+            Number of samples each distribution draws from numpy at a time.
+            Buffering does not change the samples drawn for a given random
+            number set. None turns buffering off.
+
+        arrival_sampling: string, optional (default=DEFAULT_ARRIVAL_SAMPLING)
+            How arrival times are sampled.
+            Options are "thinning" (sample each arrival as the model runs),
+            "thinning_vectorised" (generate all arrivals for the run up
+            front) and "inversion" (generate all arrivals for the run up
+            front by inverting the cumulative arrival rate). All give
+            statistically equivalent arrivals, but not the same arrival
+            times for a given random number set.
+
+        common_random_numbers: bool, optional (default=False)
+            Give patient n the n-th sample of a separate stream for each
+            of their trauma flag, activity durations and treatment decision
+            (see PatientStreams).  Each patient then receives the same
+            variates whatever the resource counts, so scenarios run with
+            the same random number set can be compared pairwise with
+            fewer replications.
         '''
-        Conduct a single run of the model in its current 
-        configuration
+        if arrival_sampling not in ARRIVAL_SAMPLING_METHODS:
+            raise ValueError(f'arrival_sampling must be one of '
+                             f'{ARRIVAL_SAMPLING_METHODS}')
+
+        # sampling
+        self.random_number_set = random_number_set
+        self.sample_block_size = sample_block_size
+        self.arrival_sampling = arrival_sampling
+        self.common_random_numbers = common_random_numbers
+        self.engine = engine
+
+        # store parameters for sampling
+        self.triage_mean = triage_mean
+        self.reg_mean = reg_mean
+        self.reg_var = reg_var
+        self.exam_mean = exam_mean
+        self.exam_var = exam_var
+        self.trauma_mean = trauma_mean
+        self.trauma_treat_mean = trauma_treat_mean
+        self.trauma_treat_var = trauma_treat_var
+        self.non_trauma_treat_mean = non_trauma_treat_mean
+        self.non_trauma_treat_var = non_trauma_treat_var
+        self.non_trauma_treat_p = non_trauma_treat_p
+        self.prob_trauma = prob_trauma
+        self.manual_arrival_rate = manual_arrival_rate
+        self.arrival_df = arrival_df
+        self.override_arrival_rate = override_arrival_rate
+        self.model = model
+
+        self.init_sampling()
+
+        # count of each type of resource
+        self.init_resource_counts(n_triage, n_reg, n_exam, n_trauma,
+                                  n_cubicles_1, n_cubicles_2)
+
+    def __getstate__(self):
+        '''
+        Support pickling so a scenario can be sent to worker processes.
+
+        The resource pools a model attaches to the scenario are bound to
+        that model's environment, which cannot be pickled.  They are
+        rebuilt by every new model, so they are dropped here.
+        '''
+        state = self.__dict__.copy()
+        for resource_name in MODEL_RESOURCES:
+            state.pop(resource_name, None)
+        return state
+
+    def fingerprint(self):
+        '''
+        Canonical description of every parameter that changes the results
+        of the scenario (not the random number set, which is part of the
+        run configuration, or the engine, which gives identical results).
+        Two scenarios with equal fingerprints give identical results for
+        the same run configuration.
+        See run_fingerprint.
 
+        Returns:
+        -------
+        dict
+        '''
+        params = {name: getattr(self, name)
+                  for name in ['n_triage', 'n_reg', 'n_exam', 'n_trauma',
+                               'n_cubicles_1', 'n_cubicles_2',
+                               'triage_mean', 'reg_mean', 'reg_var',
+                               'exam_mean', 'exam_var', 'trauma_mean',
+                               'trauma_treat_mean', 'trauma_treat_var',
+                               'non_trauma_treat_mean',
+                               'non_trauma_treat_var', 'non_trauma_treat_p',
+                               'prob_trauma', 'override_arrival_rate',
+                               'manual_arrival_rate', 'model',
+                               'arrival_sampling', 'common_random_numbers']}
+
+        # the arrival profile is identified by its rates
+        rates = np.ascontiguousarray(self.arrival_profile.arrival_rate,
+                                     dtype=np.float64)
+        params['arrival_rate'] = hashlib.sha256(rates.tobytes()).hexdigest()
+        return params
 
+    def set_random_no_set(self, random_number_set):
+        '''
+        Controls the random sampling 
         Parameters:
         ----------
-        results_collection_period, float, optional
-            default = DEFAULT_RESULTS_COLLECTION_PERIOD
+        random_number_set: int
+            Used to control the set of psuedo random numbers
+            used by the distributions in the simulation.
+        '''
+        self.random_number_set = random_number_set
+        self.init_sampling()
+
+    def init_resource_counts(self, n_triage, n_reg, n_exam, n_trauma,
+                             n_cubicles_1, n_cubicles_2):
+        '''
+        Init the counts of resources to default values...
+        '''
+        self.n_triage = n_triage
+        self.n_reg = n_reg
+        self.n_exam = n_exam
+        self.n_trauma = n_trauma
+
+        # non-trauma (1), trauma (2) treatment cubicles
+        self.n_cubicles_1 = n_cubicles_1
+        self.n_cubicles_2 = n_cubicles_2
+
+    def init_sampling(self):
+        '''
+        Create the distributions used by the model and initialise 
+        the random seeds of each.
+        '''
+        # create random number streams
+        rng_streams = np.random.default_rng(self.random_number_set)
+        self.seeds = rng_streams.integers(0, 999999999, size=N_STREAMS)
+
+        # create distributions
+        for stream, dist_name in enumerate(PATIENT_DISTRIBUTIONS):
+            setattr(self, dist_name,
+                    self.buffered(self.create_distribution(
+                        dist_name, random_seed=self.seeds[stream])))
+
+        # common random numbers mode: patient n is given sample n
+        # of a separate stream for each distribution (see PatientStreams).
+        # The streams for each distribution are created as they are needed
+        # (see crn_sampler)
+        self.crn_samplers = None
+        if self.common_random_numbers:
+            self.crn_samplers = {dist_name: [] for dist_name in PATIENT_DISTRIBUTIONS}
+
+        # init sampling for non-stationary poisson process
+        self.init_nspp()
+
+    def create_distribution(self, dist_name, random_seed=None):
+        '''
+        Create one of the distributions sampled by patients
+        (see PATIENT_DISTRIBUTIONS) using the scenario's parameters.
+
+        Params:
+        ------
+        dist_name: str
+            Name of the distribution e.g. 'triage_dist'
+
+        random_seed: int, optional (default=None)
+            Seed for the distribution's random numbers
+        '''
+        # Triage duration
+        if dist_name == 'triage_dist':
+            return Exponential(self.triage_mean,
+                               random_seed=random_seed)
+
+        # Registration duration (non-trauma only)
+        if dist_name == 'reg_dist':
+            return Lognormal(self.reg_mean,
+                             np.sqrt(self.reg_var),
+                             random_seed=random_seed)
+
+        # Evaluation (non-trauma only)
+        if dist_name == 'exam_dist':
+            return Normal(self.exam_mean,
+                          np.sqrt(self.exam_var),
+                          random_seed=random_seed)
+
+        # Trauma/stablisation duration (trauma only)
+        if dist_name == 'trauma_dist':
+            return Exponential(self.trauma_mean,
+                               random_seed=random_seed)
+
+        # Non-trauma treatment
+        if dist_name == 'nt_treat_dist':
+            return Lognormal(self.non_trauma_treat_mean,
+                             np.sqrt(self.non_trauma_treat_var),
+                             random_seed=random_seed)
+
+        # treatment of trauma patients
+        if dist_name == 'treat_dist':
+            return Lognormal(self.trauma_treat_mean,
+                             np.sqrt(self.non_trauma_treat_var),
+                             random_seed=random_seed)
+
+        # probability of non-trauma patient requiring treatment
+        if dist_name == 'nt_p_treat_dist':
+            return Bernoulli(self.non_trauma_treat_p,
+                             random_seed=random_seed)
+
+        # probability of non-trauma versus trauma patient
+        if dist_name == 'p_trauma_dist':
+            return Bernoulli(self.prob_trauma,
+                             random_seed=random_seed)
+
+        raise ValueError(f'Unknown distribution {dist_name}')
+
+    def crn_sampler(self, dist_name, draw):
+        '''
+        The stream of samples used for each patient's draw-th sample from
+        a distribution in common random numbers mode.
+
+        The first draw uses the distribution's own stream.  A patient that
+        samples the same distribution again (e.g. trauma patients sample
+        trauma_dist for both stabilisation and treatment) is given sample n
+        of a further stream for each repeat, so their draws are independent
+        of each other as they are when common random numbers are off.
+
+        Params:
+        ------
+        dist_name: str
+            Name of the distribution e.g. 'triage_dist'
+
+        draw: int
+            How many samples the patient has already taken from it
+
+        Returns:
+        -------
+        IndexedSampler
+        '''
+        samplers = self.crn_samplers[dist_name]
+        while len(samplers) <= draw:
+            seed = self.seeds[11 + PATIENT_DISTRIBUTIONS.index(dist_name)]
+            if samplers:
+                seed = np.random.default_rng([seed, len(samplers)]).integers(0, 999999999)
+            samplers.append(IndexedSampler(
+                self.create_distribution(dist_name, random_seed=seed),
+                block_size=self.sample_block_size or DEFAULT_BLOCK_SIZE))
+        return samplers[draw]
+
+    def patient_streams(self, identifier):
+        '''
+        The distributions a patient should sample from.
+
+        Params:
+        ------
+        identifier: int
+            the patient's numeric identifier
+
+        Returns:
+        -------
+        PatientStreams in common random numbers mode, otherwise the
+        scenario itself (whose distributions are shared by all patients).
+        '''
+        if self.common_random_numbers:
+            return PatientStreams(self, identifier)
+        return self
+
+    def buffered(self, distribution):
+        '''
+        Wrap a distribution so that it samples in blocks of
+        sample_block_size (see distribution_classes.BufferedSampler).
+        Returns the distribution unchanged if buffering is turned off.
+
+        Params:
+        ------
+        distribution: object
+            A distribution from distribution_classes
+        '''
+        if not self.sample_block_size:
+            return distribution
+        return BufferedSampler(distribution, block_size=self.sample_block_size)
+
+    def init_nspp(self):
+
+        # read arrival profile (cached between calls)
+        self.arrival_profile = load_arrival_profile(self.arrival_df)  # pylint: disable=attribute-defined-outside-init
+        self.arrivals = self.arrival_profile.arrivals  # pylint: disable=attribute-defined-outside-init
+
+        # maximum arrival rate (smallest time between arrivals)
+        self.lambda_max = self.arrival_profile.lambda_max  # pylint: disable=attribute-defined-outside-init
+
+        # thinning exponential
+        if self.override_arrival_rate is True:
+
+            self.arrival_dist = self.buffered(Exponential(self.manual_arrival_rate,  # pylint: disable=attribute-defined-outside-init
+                                                          random_seed=self.seeds[8]))
+        else:
+            self.arrival_dist = self.buffered(Exponential(60.0 / self.lambda_max,  # pylint: disable=attribute-defined-outside-init
+                                                          random_seed=self.seeds[8]))
+
+            # thinning uniform rng
+            self.thinning_rng = self.buffered(Uniform(low=0.0, high=1.0,  # pylint: disable=attribute-defined-outside-init
+                                                      random_seed=self.seeds[9]))
+
+            # generates a whole run of arrivals at once
+            if self.arrival_sampling == "inversion":
+                nspp = NSPPInversion
+            else:
+                nspp = NSPPThinning
+
+            self.nspp_dist = nspp(self.arrival_profile.arrival_rate,  # pylint: disable=attribute-defined-outside-init
+                                  interval=60.0,
+                                  random_seed=self.seeds[10])
+
+    def sample_arrival_schedule(self, horizon):
+        '''
+        Sample the arrival times of every patient arriving before horizon.
+
+        Used when arrival_sampling is "thinning_vectorised" or "inversion".
+
+        Params:
+        ------
+        horizon: float
+            The end of the period to generate arrivals for
+
+        Returns:
+        -------
+        np.ndarray of sorted arrival times
+        '''
+        if not self.override_arrival_rate:
+            return self.nspp_dist.sample(horizon)
+
+        # stationary arrivals: cumulative sum of exponential
+        # inter-arrival times, sampled in blocks until the horizon is passed
+        block_size = int(horizon / self.manual_arrival_rate * 1.1) + 16
+        arrivals = []
+        last_arrival = 0.0
+        while last_arrival < horizon:
+            block = last_arrival + np.cumsum(self.arrival_dist.sample(size=block_size))
+            arrivals.append(block[block < horizon])
+            last_arrival = block[-1]
+
+        return np.concatenate(arrivals)
+
+
+class PatientStreams:
+    '''
+    The distributions sampled by a single patient in common random
+    numbers mode.
+
+    Each distribution has its own stream of samples and patient n is always
+    given sample n of it (see Scenario.crn_sampler), so each patient
+    receives the same trauma flag, activity durations and treatment
+    decision whatever order events happen in and however many resources
+    there are.  A patient's second sample from a distribution comes from a
+    second stream, and so on.
+    '''
+    __slots__ = ('args', 'identifier', 'draws')
+
+    def __init__(self, args, identifier):
+        '''
+        Params:
+        ------
+        args: Scenario
+            Container class for the simulation parameters
+
+        identifier: int
+            the patient's numeric identifier
+        '''
+        self.args = args
+        self.identifier = identifier
+        self.draws = {}
+
+    def __getattr__(self, dist_name):
+        if dist_name not in PATIENT_DISTRIBUTIONS:
+            raise AttributeError(dist_name)
+        return PatientSample(self, dist_name)
+
+    def sample(self, dist_name):
+        '''
+        Returns the patient's next sample from a distribution
+
+        Params:
+        ------
+        dist_name: str
+            Name of the distribution e.g. 'triage_dist'
+        '''
+        draw = self.draws.get(dist_name, 0)
+        self.draws[dist_name] = draw + 1
+        return self.args.crn_sampler(dist_name, draw).sample_at(self.identifier)
+
+
+class PatientSample:
+    '''
+    A patient's sample from one distribution in common random numbers mode.
+    '''
+    __slots__ = ('streams', 'dist_name')
+
+    def __init__(self, streams, dist_name):
+        self.streams = streams
+        self.dist_name = dist_name
+
+    def sample(self):
+        '''
+        Returns the patient's next sample
+        '''
+        return self.streams.sample(self.dist_name)
+
+
+def interarrival_times(env, args, horizon):
+    '''
+    Generator of the time to wait until each successive patient arrives.
+
+    Shared by the arrivals generators of every model.  Non stationary
+    arrivals are implemented via the thinning acceptance-rejection
+    algorithm, either one arrival at a time as the simulation runs or, if
+    args.arrival_sampling is "thinning_vectorised", from a schedule of all
+    arrivals before horizon generated up front.  If args.arrival_sampling
+    is "inversion" the up front schedule is generated by inverting the
+    cumulative arrival rate instead of by thinning.
+
+    Params:
+    ------
+    env: simpy.Environment or HeapEnvironment
+        the simulation environment
+
+    args: Scenario
+        Container class for the simulation parameters
+
+    horizon: float
+        The time the simulation will run until
+    '''
+    if args.arrival_sampling in ("thinning_vectorised", "inversion"):
+        for arrival_time in args.sample_arrival_schedule(horizon):
+            yield arrival_time - env.now
+        return
+
+    arrival_rate = args.arrival_profile.arrival_rate
+
+    while True:
+        # this give us the index of the arrival rate to use
+        t = int(env.now // 60) % arrival_rate.shape[0]
+        lambda_t = arrival_rate[t]
+
+        # set to a large number so that at least 1 sample taken!
+        u = np.Inf
+
+        interarrival_time = 0.0
+
+        if args.override_arrival_rate:
+            interarrival_time += args.arrival_dist.sample()
+        else:
+            # reject samples if u >= lambda_t / lambda_max
+            while u >= (lambda_t / args.lambda_max):
+                interarrival_time += args.arrival_dist.sample()
+                u = args.thinning_rng.sample()
+
+        yield interarrival_time
+
+
+# ## Patient Pathways Process Logic
+
+
+class TraumaPathway:
+    '''
+    Encapsulates the process a patient with severe injuries or illness.
+
+    These patients are signed into the ED and triaged as having severe injuries
+    or illness.
+
+    Patients are stabilised in resus (trauma) and then sent to Treatment.  
+    Following treatment they are discharged.
+    '''
+
+    # patients are kept for the whole run, so avoid a __dict__ per patient
+    __slots__ = ('identifier', 'env', 'args', 'full_event_log', 'dists',
+                 'arrival', 'wait_triage', 'wait_trauma', 'wait_treat',
+                 'total_time', 'triage_duration', 'trauma_duration',
+                 'treat_duration')
+
+    def __init__(self, identifier, env, args, full_event_log, dists=None):
+        '''
+        Constructor method
+
+        Params:
+        -----
+        identifier: int
+            a numeric identifier for the patient.
+
+        env: simpy.Environment or HeapEnvironment
+            the simulation environment
+
+        args: Scenario
+            Container class for the simulation parameters
+
+        full_event_log: EventLog
+            The event log of the run, shared by every patient
+
+        dists: Scenario or PatientStreams, optional (default=None)
+            The distributions to sample from. Defaults to those of args.
+            See Scenario.patient_streams.
+
+        '''
+        self.identifier = identifier
+        self.env = env
+        self.args = args
+        self.full_event_log = full_event_log
+        self.dists = args if dists is None else dists
+
+        # metrics
+        self.arrival = -np.inf
+        self.wait_triage = -np.inf
+        self.wait_trauma = -np.inf
+        self.wait_treat = -np.inf
+        self.total_time = -np.inf
+
+        self.triage_duration = -np.inf
+        self.trauma_duration = -np.inf
+        self.treat_duration = -np.inf
+
+    def execute(self):
+        '''
+        simulates the major treatment process for a patient
+
+        1. request and wait for sign-in/triage
+        2. trauma
+        3. treatment
+        '''
+        # record the time of arrival and entered the triage queue
+        self.arrival = self.env.now
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='Trauma',
+            event_type='queue',
+            event='triage_wait_begins',
+            time=self.env.now
+        )
+
+        ###################################################
+        # request sign-in/triage
+        triage_id = yield self.args.triage.get()
+
+        # record the waiting time for triage
+        self.wait_triage = self.env.now - self.arrival
+
+        if TRACE:
+            trace(f'patient {self.identifier} triaged to trauma '
+                    f'{self.env.now:.3f}')
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='Trauma',
+            event_type='resource_use',
+            event='triage_begins',
+            time=self.env.now,
+            resource_id=triage_id
+        )
+
+        # sample triage duration.
+        self.triage_duration = self.dists.triage_dist.sample()
+        yield self.env.timeout(self.triage_duration)
+        
+        if TRACE:
+            trace(f'triage {self.identifier} complete {self.env.now:.3f}; '
+                  f'waiting time was {self.wait_triage:.3f}')
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='Trauma',
+            event_type='resource_use_end',
+            event='triage_complete',
+            time=self.env.now,
+            resource_id=triage_id
+        )
+
+        # Resource is no longer in use, so put it back in the store 
+        self.args.triage.put(triage_id) 
+        ###################################################
+
+        # record the time that entered the trauma queue
+        start_wait = self.env.now
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='Trauma',
+            event_type='queue',
+            event='TRAUMA_stabilisation_wait_begins',
+            time=self.env.now
+        )
+
+        ###################################################
+        # request trauma room
+        trauma_id = yield self.args.trauma.get()
+
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='Trauma',
+            event_type='resource_use',
+            event='TRAUMA_stabilisation_begins',
+            time=self.env.now,
+            resource_id=trauma_id
+        )
+
+        # record the waiting time for trauma
+        self.wait_trauma = self.env.now - start_wait
+
+        # sample stablisation duration.
+        self.trauma_duration = self.dists.trauma_dist.sample()
+        yield self.env.timeout(self.trauma_duration)
+
+        if TRACE:
+            trace(f'stabilisation of patient {self.identifier} at '
+                  f'{self.env.now:.3f}')
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='Trauma',
+            event_type='resource_use_end',
+            event='TRAUMA_stabilisation_complete',
+            time=self.env.now,
+            resource_id=trauma_id
+        )
+        # Resource is no longer in use, so put it back in the store
+        self.args.trauma.put(trauma_id)
+        
+        #######################################################
+
+        # record the time that entered the treatment queue
+        start_wait = self.env.now
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='Trauma',
+            event_type='queue',
+            event='TRAUMA_treatment_wait_begins',
+            time=self.env.now
+        )
+
+        ########################################################
+        # request treatment cubicle
+        trauma_treatment_id = yield self.args.cubicle_2.get()
+
+        # record the waiting time for trauma
+        self.wait_treat = self.env.now - start_wait
+        if TRACE:
+            trace(f'treatment of patient {self.identifier} at '
+                    f'{self.env.now:.3f}')
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='Trauma',
+            event_type='resource_use',
+            event='TRAUMA_treatment_begins',
+            time=self.env.now,
+            resource_id=trauma_treatment_id
+        )
+
+        # sample treatment duration.
+        self.treat_duration = self.dists.trauma_dist.sample()
+        yield self.env.timeout(self.treat_duration)
+
+        if TRACE:
+            trace(f'patient {self.identifier} treatment complete {self.env.now:.3f}; '
+                  f'waiting time was {self.wait_treat:.3f}')
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='Trauma',
+            event_type='resource_use_end',
+            event='TRAUMA_treatment_complete',
+            time=self.env.now,
+            resource_id=trauma_treatment_id
+        )
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='Shared',
+            event_type='arrival_departure',
+            event='depart',
+            time=self.env.now
+        )
+
+        # Resource is no longer in use, so put it back in the store
+        self.args.cubicle_2.put(trauma_treatment_id) 
+
+        #########################################################
+
+        # total time in system
+        self.total_time = self.env.now - self.arrival
+
+class NonTraumaPathway(object):
+    '''
+    Encapsulates the process a patient with minor injuries and illness.
+
+    These patients are signed into the ED and triaged as having minor 
+    complaints and streamed to registration and then examination. 
+
+    Post examination 40% are discharged while 60% proceed to treatment.  
+    Following treatment they are discharged.
+    '''
+
+    __slots__ = ('identifier', 'env', 'args', 'full_event_log', 'dists',
+                 'arrival', 'wait_triage', 'wait_reg', 'wait_exam',
+                 'wait_treat', 'total_time', 'triage_duration',
+                 'reg_duration', 'exam_duration', 'treat_duration',
+                 'require_treat')
+
+    def __init__(self, identifier, env, args, full_event_log, dists=None):
+        '''
+        Constructor method
+
+        Params:
+        -----
+        identifier: int
+            a numeric identifier for the patient.
+
+        env: simpy.Environment or HeapEnvironment
+            the simulation environment
+
+        args: Scenario
+            Container class for the simulation parameters
+
+        full_event_log: EventLog
+            The event log of the run, shared by every patient
+
+        dists: Scenario or PatientStreams, optional (default=None)
+            The distributions to sample from. Defaults to those of args.
+            See Scenario.patient_streams.
+
+        '''
+        self.identifier = identifier
+        self.env = env
+        self.args = args
+        self.full_event_log = full_event_log
+        self.dists = args if dists is None else dists
+
+        # metrics
+        self.arrival = -np.inf
+        self.wait_triage = -np.inf
+        self.wait_reg = -np.inf
+        self.wait_exam = -np.inf
+        self.wait_treat = -np.inf
+        self.total_time = -np.inf
+
+        self.triage_duration = -np.inf
+        self.reg_duration = -np.inf
+        self.exam_duration = -np.inf
+        self.treat_duration = -np.inf
+
+    def execute(self):
+        '''
+        simulates the non-trauma/minor treatment process for a patient
+
+        1. request and wait for sign-in/triage
+        2. patient registration
+        3. examination
+        4.1 40% discharged
+        4.2 60% treatment then discharge
+        '''
+        # record the time of arrival and entered the triage queue
+        self.arrival = self.env.now
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='Non-Trauma',
+            event_type='queue',
+            event='triage_wait_begins',
+            time=self.env.now
+        )
+
+        ###################################################
+        # request sign-in/triage
+        triage_id = yield self.args.triage.get()
+
+        # record the waiting time for triage
+        self.wait_triage = self.env.now - self.arrival
+        if TRACE:
+            trace(f'patient {self.identifier} triaged to minors '
+                    f'{self.env.now:.3f}')
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='Non-Trauma',
+            event_type='resource_use',
+            event='triage_begins',
+            time=self.env.now,
+            resource_id=triage_id
+        )
+
+        # sample triage duration.
+        self.triage_duration = self.dists.triage_dist.sample()
+        yield self.env.timeout(self.triage_duration)
+
+        if TRACE:
+            trace(f'triage {self.identifier} complete {self.env.now:.3f}; '
+                    f'waiting time was {self.wait_triage:.3f}')
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='Non-Trauma',
+            event_type='resource_use_end',
+            event='triage_complete',
+            time=self.env.now,
+            resource_id=triage_id
+        )
+
+        # Resource is no longer in use, so put it back in the store 
+        self.args.triage.put(triage_id) 
+        #########################################################
+
+        # record the time that entered the registration queue
+        start_wait = self.env.now
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='Non-Trauma',
+            event_type='queue',
+            event='MINORS_registration_wait_begins',
+            time=self.env.now
+        )
+
+        #########################################################
+        # request registration clerk
+        registration_id = yield self.args.registration.get()
+            
+        # record the waiting time for registration
+        self.wait_reg = self.env.now - start_wait
+        if TRACE:
+            trace(f'registration of patient {self.identifier} at '
+                    f'{self.env.now:.3f}')
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='Non-Trauma',
+            event_type='resource_use',
+            event='MINORS_registration_begins',
+            time=self.env.now,
+            resource_id=registration_id
+        )
+
+        # sample registration duration.
+        self.reg_duration = self.dists.reg_dist.sample()
+        yield self.env.timeout(self.reg_duration)
+
+        if TRACE:
+            trace(f'patient {self.identifier} registered at'
+                    f'{self.env.now:.3f}; '
+                    f'waiting time was {self.wait_reg:.3f}')
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='Non-Trauma',
+            event_type='resource_use_end',
+            event='MINORS_registration_complete',
+            time=self.env.now,
+            resource_id=registration_id
+        )
+        # Resource is no longer in use, so put it back in the store
+        self.args.registration.put(registration_id)
+        ########################################################
+
+        # record the time that entered the evaluation queue
+        start_wait = self.env.now
+
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='Non-Trauma',
+            event_type='queue',
+            event='MINORS_examination_wait_begins',
+            time=self.env.now
+        )
+
+        #########################################################
+        # request examination resource
+        examination_id = yield self.args.exam.get()
+
+        # record the waiting time for examination to begin
+        self.wait_exam = self.env.now - start_wait
+        if TRACE:
+            trace(f'examination of patient {self.identifier} begins '
+                    f'{self.env.now:.3f}')
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='Non-Trauma',
+            event_type='resource_use',
+            event='MINORS_examination_begins',
+            time=self.env.now,
+            resource_id=examination_id
+        )
+
+        # sample examination duration.
+        self.exam_duration = self.dists.exam_dist.sample()
+        yield self.env.timeout(self.exam_duration)
+
+        if TRACE:
+            trace(f'patient {self.identifier} examination complete '
+                    f'at {self.env.now:.3f};'
+                    f'waiting time was {self.wait_exam:.3f}')
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='Non-Trauma',
+            event_type='resource_use_end',
+            event='MINORS_examination_complete',
+            time=self.env.now,
+            resource_id=examination_id
+        )
+        # Resource is no longer in use, so put it back in
+        self.args.exam.put(examination_id) 
+        ############################################################################
+
+        # sample if patient requires treatment?
+        self.require_treat = self.dists.nt_p_treat_dist.sample()  #pylint: disable=attribute-defined-outside-init
+
+        if self.require_treat:
+
+            self.full_event_log.record(
+                patient=self.identifier,
+                pathway='Non-Trauma',
+                event_type='attribute_assigned',
+                event='requires_treatment',
+                time=self.env.now
+            )
+
+            # record the time that entered the treatment queue
+            start_wait = self.env.now
+            self.full_event_log.record(
+                patient=self.identifier,
+                pathway='Non-Trauma',
+                event_type='queue',
+                event='MINORS_treatment_wait_begins',
+                time=self.env.now
+            )
+            ###################################################
+            # request treatment cubicle
+
+            non_trauma_treatment_id = yield self.args.cubicle_1.get()
+
+            # record the waiting time for treatment
+            self.wait_treat = self.env.now - start_wait
+            if TRACE:
+                trace(f'treatment of patient {self.identifier} begins '
+                        f'{self.env.now:.3f}')
+            self.full_event_log.record(
+                patient=self.identifier,
+                pathway='Non-Trauma',
+                event_type='resource_use',
+                event='MINORS_treatment_begins',
+                time=self.env.now,
+                resource_id=non_trauma_treatment_id
+            )
+
+            # sample treatment duration.
+            self.treat_duration = self.dists.nt_treat_dist.sample()
+            yield self.env.timeout(self.treat_duration)
+
+            if TRACE:
+                trace(f'patient {self.identifier} treatment complete '
+                        f'at {self.env.now:.3f};'
+                        f'waiting time was {self.wait_treat:.3f}')
+            self.full_event_log.record(
+                patient=self.identifier,
+                pathway='Non-Trauma',
+                event_type='resource_use_end',
+                event='MINORS_treatment_ends',
+                time=self.env.now,
+                resource_id=non_trauma_treatment_id
+            )
+
+            # Resource is no longer in use, so put it back in the store
+            self.args.cubicle_1.put(non_trauma_treatment_id)
+        ##########################################################################
+
+        # Return to what happens to all patients, regardless of whether they were sampled as needing treatment
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='Shared',
+            event_type='arrival_departure',
+            event='depart',
+            time=self.env.now
+        )
+
+        # total time in system
+        self.total_time = self.env.now - self.arrival
+
+
+class TreatmentCentreModel:
+    '''
+    The treatment centre model
+
+    Patients arrive at random to a treatment centre, are triaged
+    and then processed in either a trauma or non-trauma pathway.
+
+    The main class that a user interacts with to run the model is 
+    `TreatmentCentreModel`.  This implements a `.run()` method, contains a simple
+    algorithm for the non-stationary poission process for patients arrivals and 
+    inits instances of `TraumaPathway` or `NonTraumaPathway` depending on the 
+    arrival type.    
+
+    '''
+
+    def __init__(self, args, event_logging=True):
+        '''
+        Params:
+        ------
+        args: Scenario
+            Container class for the simulation parameters
+
+        event_logging: bool, optional (default=True)
+            Record every event in full_event_log and audit utilisation.
+            Set to False when only the summary results are needed.
+        '''
+        self.env = create_environment(args)
+        self.args = args
+        self.event_logging = event_logging
+        self.init_resources()
+
+        self.patients = []
+        self.trauma_patients = []
+        self.non_trauma_patients = []
+
+        self.rc_period = None
+        self.warm_up = DEFAULT_WARM_UP
+        self.results = None
+
+        self.full_event_log = EventLog() if event_logging else NullEventLog()
+        self.utilisation_audit = []
+
+    def init_resources(self):
+        '''
+        Init the number of resources
+        and store in the arguments container object
+
+        Resource list:
+        1. Sign-in/triage bays
+        2. registration clerks
+        3. examination bays
+        4. trauma bays
+        5. non-trauma cubicles (1)
+        6. trauma cubicles (2)
+
+        '''
+
+        # sign/in triage
+        # self.args.triage = CustomResource(self.env,
+        #                                   capacity=self.args.n_triage)
+        
+        self.args.triage = create_resource_pool(self.env, self.args.n_triage)
+
+        # registration
+        # self.args.registration = CustomResource(self.env,
+        #                                         capacity=self.args.n_reg)
+
+        self.args.registration = create_resource_pool(self.env, self.args.n_reg)
+
+        # examination
+        # self.args.exam = CustomResource(self.env,
+        #                                 capacity=self.args.n_exam)
+        
+        self.args.exam = create_resource_pool(self.env, self.args.n_exam)
+
+        # trauma
+        # self.args.trauma = CustomResource(self.env,
+        #                                   capacity=self.args.n_trauma)
+        
+        self.args.trauma = create_resource_pool(self.env, self.args.n_trauma)
+
+        # non-trauma treatment
+        # self.args.cubicle_1 = CustomResource(self.env,
+        #                                      capacity=self.args.n_cubicles_1)
+        
+        self.args.cubicle_1 = create_resource_pool(self.env, self.args.n_cubicles_1)
+
+        # trauma treatment
+        # self.args.cubicle_2 = CustomResource(self.env,
+        #                                      capacity=self.args.n_cubicles_2)
+        
+        self.args.cubicle_2 = create_resource_pool(self.env, self.args.n_cubicles_2)
+
+        self.monitored_resources = [
+            {'resource_name': 'registration_clerks',
+                'resource_object': self.args.registration},
+            {'resource_name': 'triage_bays', 'resource_object': self.args.triage},
+
+            {'resource_name': 'examination_bays',
+                'resource_object': self.args.exam},
+            {'resource_name': 'non_trauma_treatment_cubicle_type_1',
+                'resource_object': self.args.cubicle_1},
+
+            {'resource_name': 'trauma_bays', 'resource_object': self.args.trauma},
+            {'resource_name': 'trauma_treatmentcubicle_type_2',
+                'resource_object': self.args.cubicle_2}
+        ]
+
+    def run(self, results_collection_period=DEFAULT_RESULTS_COLLECTION_PERIOD,
+            warm_up=DEFAULT_WARM_UP):
+        '''
+        Conduct a single run of the model in its current 
+        configuration
+
+
+        Parameters:
+        ----------
+        results_collection_period, float, optional
+            default = DEFAULT_RESULTS_COLLECTION_PERIOD
+
+        warm_up, float, optional (default=DEFAULT_WARM_UP)
+
+            length of initial transient period to truncate
+            from results.  The model runs for warm_up +
+            results_collection_period and only patients arriving
+            at or after warm_up are included in the results.
+
+        Returns:
+        --------
+            None
+        '''
+        # setup the arrival generator process
+        self.env.process(self.arrivals_generator())
+
+        # resource use is monitored by the resource pools themselves
+        # (see ResourcePool) rather than by an auditing process
+
+        # self.env.process(
+        #     self.interval_audit_utilisation(
+        #         resources=self.args.triage,
+        #         interval=1
+        #     )
+        # )
+
+        # store rc period
+        self.rc_period = results_collection_period
+        self.warm_up = warm_up
+
+        # run
+        self.env.run(until=warm_up + results_collection_period)
+
+        if self.event_logging:
+            self.utilisation_audit = utilisation_audit_frame(
+                self.monitored_resources)
+
+        # self.utilisation_audit.append(
+
+        #         {'resource': 'triage',
+        #         'time': self.env.now,
+        #         'capacity': self.args.triage.capacity,
+        #         'usage': self.args.triage.count
+        #         }
+
+        #     )
+
+    def interval_audit_utilisation(self, resources, interval=1):
+        '''
+        Record utilisation at defined intervals. 
+
+        Needs to be passed to env.process when running model
+
+        Parameters:
+        ------
+        resource: SimPy resource object
+            The resource to monitor
+            OR 
+            a list of dictionaries containing simpy resource objects in the format
+            [{'resource_name':'my_resource', 'resource_object': resource}]
+
+        interval: int:
+            Time between audits. 
+            1 unit of time is 1 day in this model.  
+        '''
+
+        while True:
+            # Record time
+            if isinstance(resources, list):
+                for i in range(len(resources)):
+                    self.utilisation_audit.append({
+                        'resource_name': resources[i]['resource_name'],
+                        'simulation_time': self.env.now,  # The current simulation time
+                        # The number of users
+                        'number_utilised': resources[i]['resource_object'].n_busy,
+                        'number_available': resources[i]['resource_object'].n_resources,
+                        # The number of queued processes
+                        # 'number_queued': len(resources[i]['resource_object'].queue),
+                    })
+
+            else:
+                self.utilisation_audit.append({
+                    # 'simulation_time': resource._env.now,
+                    'simulation_time': self.env.now,  # The current simulation time
+                    'number_utilised': resources.n_busy,  # The number of users
+                    'number_available': resources.n_resources,
+                    # The number of queued processes
+                    # 'number_queued': len(resources.queue),
+                })
+
+            # Trigger next audit after interval
+            yield self.env.timeout(interval)
+
+    def resource_utilisation(self):
+        '''
+        Exact utilisation of each resource over the results collection
+        period (after any warm-up), from the busy time tracked by the
+        resource pools.
+
+        Call after run.
+
+        Returns:
+        -------
+        pd.Series
+        '''
+        return monitored_utilisation(self.monitored_resources,
+                                     self.rc_period,
+                                     warm_up=self.warm_up)
+
+    def arrivals_generator(self):
+        ''' 
+        Simulate the arrival of patients to the model
+
+        Patients either follow a TraumaPathway or
+        NonTraumaPathway simpy process.
+
+        Non stationary arrivals implemented via Thinning acceptance-rejection 
+        algorithm (see interarrival_times).
+        '''
+        for patient_count, interarrival_time in enumerate(
+                interarrival_times(self.env, self.args,
+                                   self.warm_up + self.rc_period)):
+            # iat
+            yield self.env.timeout(interarrival_time)
+
+            if TRACE:
+                trace(f'patient {patient_count} arrives at: {self.env.now:.3f}')
+            self.full_event_log.record(
+                patient=patient_count,
+                pathway='Shared',
+                event_type='arrival_departure',
+                event='arrival',
+                time=self.env.now
+            )
+
+            # the distributions this patient samples from
+            dists = self.args.patient_streams(patient_count)
+
+            # sample if the patient is trauma or non-trauma
+            trauma = dists.p_trauma_dist.sample()
+
+            if trauma:
+                # create and store a trauma patient to update KPIs.
+                new_patient = TraumaPathway(
+                    patient_count, self.env, self.args, self.full_event_log,
+                    dists)
+                self.trauma_patients.append(new_patient)
+            else:
+                # create and store a non-trauma patient to update KPIs.
+                new_patient = NonTraumaPathway(patient_count, self.env,
+                                               self.args, self.full_event_log,
+                                               dists)
+                self.non_trauma_patients.append(new_patient)
+
+            # start the pathway process for the patient
+            self.env.process(new_patient.execute())
+
+
+class SimulationSummary:
+    '''
+    End of run result processing logic of the simulation model
+    '''
+
+    def __init__(self, model, start=None, end=None):
+        '''
+        Constructor
+
+        Params:
+        ------
+        model: TraumaCentreModel
+            The model.
+
+        start: float, optional (default=None)
+            Only summarise patients arriving at or after start.
+            Defaults to the end of the model's warm-up period.
+
+        end: float, optional (default=None)
+            Only summarise patients arriving before end, and calculate
+            utilisation over [start, end).  Defaults to the end of the run
+            (utilisation over the results collection period).
+        '''
+        self.model = model
+        self.args = model.args
+        self.start = model.warm_up if start is None else start
+        self.end = end
+        self.results = None
+        self.patient_log = None
+        self._patient_metrics = None
+        self._resource_util = None
+        self.full_event_log = model.full_event_log
+        self.utilisation_audit = model.utilisation_audit
+
+    def process_run_results(self):
+        '''
+        Calculates statistics at end of run.
+
+        The patient metrics are extracted into arrays once
+        (see patient_metrics) and each KPI is calculated from those.
+        Only patients arriving in the period summarised (by default after
+        the model's warm-up period) are included.
+        '''
+        self.results = {}
+        metrics = self.patient_metrics()
+
+        if self.start > 0 or self.end is not None:
+            # only patients arriving in the period
+            collect = metrics['arrival'] >= self.start
+            if self.end is not None:
+                collect &= metrics['arrival'] < self.end
+            metrics = {name: values[collect] for name, values in metrics.items()}
+
+        if self.args.model == "simplest":
+
+            self.patient_log = self.model.patients
+
+            mean_treat_wait = self.get_mean_metric(metrics['wait_treat'])
+
+            perc_treat_wait_target_met = self.get_perc_wait_target_met(metrics['wait_treat'],
+                                                                       target=120)
+
+            # triage utilisation (both types of patient)
+            treat_util = self.get_resource_util(metrics['treat_duration'],
+                                                self.args.n_cubicles_1,
+                                                'treatment_cubicle_or_nurse')
+
+            mean_total = self.get_mean_metric(metrics['total_time'])
+
+            self.results = {'00_arrivals': len(metrics['identifier']),
+                            '01a_treatment_wait': mean_treat_wait,
+                            '01b_treatment_util': treat_util,
+                            '01c_treatment_wait_target_met': perc_treat_wait_target_met,
+                            '08_total_time': mean_total,
+                            '09_throughput': self.get_throughput(metrics['total_time'])
+                            }
+            
+        elif self.args.model == "simple_with_branch":
+
+            self.patient_log = self.model.patients
+
+            # mean waiting time for examination (non_trauma)
+            mean_wait_exam = self.get_mean_metric(metrics['wait_exam'])
+
+            # examination utilisation (non-trauma)
+            exam_util = self.get_resource_util(metrics['exam_duration'],
+                                               self.args.n_exam,
+                                               'examination_bays')
+
+            mean_treat_wait = self.get_mean_metric(metrics['wait_treat'])
+
+            perc_wait_exam_target_met = self.get_perc_wait_target_met(metrics['wait_exam'],
+                                                                      target=120)
+
+            # triage utilisation (both types of patient)
+            treat_util = self.get_resource_util(metrics['treat_duration'],
+                                                self.args.n_cubicles_1,
+                                                'treatment_cubicle_or_nurse')
+
+            mean_total = self.get_mean_metric(metrics['total_time'])
+
+            self.results = {'00_arrivals': len(metrics['identifier']),
+                            '01a_examination_wait': mean_wait_exam,
+                            '01b_examination_util': exam_util,
+                            '01c_examination_wait_target_met': perc_wait_exam_target_met,
+                            '02a_treatment_wait': mean_treat_wait,
+                            '02b_treatment_util': treat_util,
+                            '08_total_time': mean_total,
+                            '09_throughput': self.get_throughput(metrics['total_time'])
+                            }
+                            
+
+        else:
+            # masks for each type of patient
+            trauma = metrics['trauma']
+            non_trauma = ~trauma
+
+            # mean triage times (both types of patient)
+            mean_triage_wait = self.get_mean_metric(metrics['wait_triage'])
+
+            # triage utilisation (both types of patient)
+            triage_util = self.get_resource_util(metrics['triage_duration'],
+                                                 self.args.n_triage,
+                                                 'triage_bays')
+
+            # mean waiting time for registration (non_trauma)
+            mean_reg_wait = self.get_mean_metric(metrics['wait_reg'][non_trauma])
+
+            # registration utilisation (trauma)
+            reg_util = self.get_resource_util(metrics['reg_duration'][non_trauma],
+                                              self.args.n_reg,
+                                              'registration_clerks')
+
+            # mean waiting time for examination (non_trauma)
+            mean_wait_exam = self.get_mean_metric(metrics['wait_exam'][non_trauma])
+
+            # examination utilisation (non-trauma)
+            exam_util = self.get_resource_util(metrics['exam_duration'][non_trauma],
+                                               self.args.n_exam,
+                                               'examination_bays')
+
+            # mean waiting time for treatment (non-trauma)
+            mean_treat_wait = self.get_mean_metric(metrics['wait_treat'][non_trauma])
+
+            # treatment utilisation (non_trauma)
+            treat_util1 = self.get_resource_util(metrics['treat_duration'][non_trauma],
+                                                 self.args.n_cubicles_1,
+                                                 'non_trauma_treatment_cubicle_type_1')
+
+            # mean total time (non_trauma)
+            mean_total = self.get_mean_metric(metrics['total_time'][non_trauma])
+
+            # mean waiting time for trauma
+            mean_trauma_wait = self.get_mean_metric(metrics['wait_trauma'][trauma])
+
+            # trauma utilisation (trauma)
+            trauma_util = self.get_resource_util(metrics['trauma_duration'][trauma],
+                                                 self.args.n_trauma,
+                                                 'trauma_bays')
+
+            # mean waiting time for treatment (rauma)
+            mean_treat_wait2 = self.get_mean_metric(metrics['wait_treat'][trauma])
+
+            # treatment utilisation (trauma)
+            treat_util2 = self.get_resource_util(metrics['treat_duration'][trauma],
+                                                 self.args.n_cubicles_2,
+                                                 'trauma_treatmentcubicle_type_2')
+
+            # mean total time (trauma)
+            mean_total2 = self.get_mean_metric(metrics['total_time'][trauma])
+
+            # list of all patients
+            self.patient_log = self.model.non_trauma_patients + self.model.trauma_patients
+
+            self.results = {'00_arrivals': len(trauma),
+                            '01a_triage_wait': mean_triage_wait,
+                            '01b_triage_util': triage_util,
+                            '02a_registration_wait': mean_reg_wait,
+                            '02b_registration_util': reg_util,
+                            '03a_examination_wait': mean_wait_exam,
+                            '03b_examination_util': exam_util,
+                            '04a_treatment_wait(non_trauma)': mean_treat_wait,
+                            '04b_treatment_util(non_trauma)': treat_util1,
+                            '05_total_time(non-trauma)': mean_total,
+                            '06a_trauma_wait': mean_trauma_wait,
+                            '06b_trauma_util': trauma_util,
+                            '07a_treatment_wait(trauma)': mean_treat_wait2,
+                            '07b_treatment_util(trauma)': treat_util2,
+                            '08_total_time(trauma)': mean_total2,
+                            '09_throughput': self.get_throughput(metrics['total_time'])
+                            }
+
+    def patient_metrics(self):
+        '''
+        Returns the metrics of every patient in the run (including any
+        arriving during the warm-up period) as arrays.
+
+        Each patient's metrics are read in a single pass and the result is
+        cached, so it can be reused after process_run_results.  Each array
+        has one item per patient.  In the full model patients are ordered
+        non-trauma then trauma and the boolean array 'trauma' marks the
+        trauma patients.  Metrics that were not measured for a patient
+        (including those that do not apply to their pathway) are -np.inf.
+
+        Returns:
+        -------
+        dict
+            metric name: np.ndarray
+        '''
+        if self._patient_metrics is not None:
+            return self._patient_metrics
+
+        if self.args.model == "full":
+            cohorts = [self.model.non_trauma_patients,
+                       self.model.trauma_patients]
+        else:
+            cohorts = [self.model.patients]
+
+        n_patients = sum(len(cohort) for cohort in cohorts)
+        metrics = {'identifier': np.zeros(n_patients, dtype=np.int64)}
+        start = 0
+        for cohort in cohorts:
+            if len(cohort) == 0:
+                continue
+            end = start + len(cohort)
+            names = [name for name in PATIENT_METRICS
+                     if hasattr(cohort[0], name)]
+            values = np.array(list(map(attrgetter('identifier', *names),
+                                       cohort)),
+                              dtype=np.float64).reshape(len(cohort), -1)
+            metrics['identifier'][start:end] = values[:, 0]
+            for col, name in enumerate(names, start=1):
+                if name not in metrics:
+                    metrics[name] = np.full(n_patients, -np.inf)
+                metrics[name][start:end] = values[:, col]
+            start = end
+
+        for name in PATIENT_METRICS:
+            metrics.setdefault(name, np.full(n_patients, -np.inf))
+
+        if self.args.model == "full":
+            metrics['trauma'] = np.arange(n_patients) >= len(cohorts[0])
+
+        self._patient_metrics = metrics
+        return metrics
+
+    def get_mean_metric(self, values):
+        '''
+        Calculate mean of the performance measure for the
+        select cohort of patients,
+
+        Only calculates metrics for patients where it has been 
+        measured.
+
+        Params:
+        -------
+        values: np.ndarray
+            The metric for the cohort e.g. patient_metrics()['wait_treat']
+        '''
+        mean = values[values > -np.inf].mean()
+        return mean
+    
+    def get_perc_wait_target_met(self, values, target):
+        '''
+        Calculate the percentage of patients where a target was met for 
+        the select cohort of patients,
+
+        Only calculates metrics for patients where it has been 
+        measured.
+
+        Params:
+        -------
+        values: np.ndarray
+            The metric for the cohort e.g. patient_metrics()['wait_treat']
+
+        target: float
+            The target value of the metric
+        '''
+        met = np.count_nonzero(values < target)
+        total = np.count_nonzero(values > -np.inf)
+        if total == 0:
+            # not measured for any patient (like get_mean_metric)
+            return np.nan
+        return met/total
+
+    def get_resource_util(self, values, n_resources, resource_name=None):
+        '''
+        Calculate proportion of the results collection period
+        where a resource was in use.
+
+        For a monitored resource this is the exact busy time of the
+        resource over the period summarised (see period_utilisation),
+        with or without a warm-up.  Work done in the period on patients
+        who arrived before it is included, and work done after the period
+        is not.
+
+        Otherwise it is done by tracking the duration by patient, and
+        only calculates metrics for patients where it has been measured.
+
+        Params:
+        -------
+        values: np.ndarray
+            The activity duration for the cohort
+            e.g. patient_metrics()['treat_duration']
+
+        n_resources: int
+            The number of resources of this type
+
+        resource_name: str, optional (default=None)
+            The name of the resource in the model's monitored_resources
+        '''
+        if resource_name is not None:
+            return self.period_utilisation()[resource_name]
+
+        total = values[values > -np.inf].sum()
+
+        period = self.model.rc_period if self.end is None else self.end - self.start
+        return total / (period * n_resources)
+
+    def period_utilisation(self):
+        '''
+        Exact utilisation of each of the model's resources over the period
+        summarised, [start, end), from the busy time tracked by the
+        resource pools.  Without an end the period runs to the end of the
+        results collection period.
+
+        Returns:
+        -------
+        pd.Series
+        '''
+        if self._resource_util is None:
+            end = self.end
+            if end is None:
+                end = self.model.warm_up + self.model.rc_period
+            self._resource_util = monitored_utilisation(
+                self.model.monitored_resources, end - self.start,
+                warm_up=self.start)
+        return self._resource_util
+
+    def get_throughput(self, total_time):
+        '''
+        Returns the total number of patients that have successfully
+        been processed and discharged in the treatment centre
+        (they have a total time record)
+
+        Params:
+        -------
+        total_time: np.ndarray
+            total time in the system of all patients simulated.
+
+        Returns:
+        ------
+        int
+        '''
+        return int(np.count_nonzero(total_time > -np.inf))
+
+    def summary_frame(self):
+        '''
+        Returns run results as a pandas.DataFrame
+
+        Returns:
+        -------
+        pd.DataFrame
+        '''
+        # append to results df
+        if self.results is None:
+            self.process_run_results()
+
+        df = pd.DataFrame({'1': self.results})
+        df = df.T
+        df.index.name = 'rep'
+        return df
+
+    def detailed_logs(self):
+        '''
+        Returns run results as a pandas.DataFrame
+
+        Returns:
+        -------
+        pd.DataFrame
+        '''
+        # append to results df
+        if self.full_event_log is None:
+            self.process_run_results()
+
+        if self.utilisation_audit is None:
+            self.process_run_results()
+
+        return {
+            'patient': self.patient_log,
+            'event_log': self.full_event_log.to_frame(),
+            'utilisation_audit': self.utilisation_audit,
+            'results_summary': self.results
+        }
+
+    # def get_full_event_log(self):
+    #     '''
+    #     Returns run results as a pandas.DataFrame
+
+    #     Returns:
+    #     -------
+    #     pd.DataFrame
+    #     '''
+    #     # append to results df
+
+    #     df = pd.DataFrame(self.full_event_log)
+    #     #df = df.T
+    #     #df.index.name = 'rep'
+    #     return df
+
+
+# ## Results cache
+
+def run_fingerprint(scenario, **run_config):
+    '''
+    Canonical fingerprint of a scenario and the configuration of a run
+    (e.g. random number set, results collection period).  Used as the key
+    of the results cache.
+
+    Params:
+    ------
+    scenario: Scenario
+        The scenario/paramaters of the run
+
+    **run_config:
+        Any other settings that change the results of the run.  Values
+        must be JSON serialisable.
+
+    Returns:
+    -------
+    str
+    '''
+    config = {'scenario': scenario.fingerprint(),
+              'version': RESULTS_CACHE_VERSION,
+              **run_config}
+    encoded = json.dumps(config, sort_keys=True, default=_json_number)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+def _json_number(value):
+    # numpy scalars (e.g. seeds) are not JSON serialisable
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    raise TypeError(f'{type(value)} is not JSON serialisable')
+
+
+class ResultsCache:
+    '''
+    Disk backed cache of model results.
+
+    Each entry is a dictionary of pandas.DataFrames (e.g. a summary frame
+    and event logs) stored column by column in a numpy .npz file named by
+    its key (see run_fingerprint).  Entries survive restarts of the app.
+    When the cache grows beyond max_bytes the least recently used entries
+    are deleted.
+    '''
+    def __init__(self, directory=DEFAULT_CACHE_DIR,
+                 max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        '''
+        Params:
+        ------
+        directory: str, optional (default=DEFAULT_CACHE_DIR)
+            Directory to store results in.  Created if needed.
+
+        max_bytes: int, optional (default=DEFAULT_CACHE_MAX_BYTES)
+            Maximum total size of the cached results
+        '''
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, key):
+        '''
+        Path of the file holding the entry for key
+        '''
+        return os.path.join(self.directory, f'{key}.npz')
+
+    def get(self, key):
+        '''
+        Returns the cached frames for key, or None if not cached.
+
+        Params:
+        ------
+        key: str
+            e.g. from run_fingerprint
+
+        Returns:
+        -------
+        dict or None
+        '''
+        path = self.path(key)
+        try:
+            with np.load(path, allow_pickle=False) as arrays:
+                frames = arrays_to_frames(arrays)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError):
+            # unreadable (e.g. partly deleted) entries are dropped
+            self.remove(key)
+            return None
+
+        # mark as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return frames
+
+    def put(self, key, frames):
+        '''
+        Store frames under key and evict old entries if the cache is full.
+
+        Params:
+        ------
+        key: str
+            e.g. from run_fingerprint
+
+        frames: dict
+            name: pandas.DataFrame
+        '''
+        path = self.path(key)
+        # write to a temporary file first so readers never see a partial entry
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, **frames_to_arrays(frames))
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def remove(self, key):
+        '''
+        Remove the entry for key (if any)
+        '''
+        try:
+            os.remove(self.path(key))
+        except OSError:
+            pass
+
+    def evict(self):
+        '''
+        Delete least recently used entries until the cache fits in max_bytes
+        '''
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.name.endswith('.npz'):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+
+def frames_to_arrays(frames):
+    '''
+    Convert a dictionary of DataFrames into a flat dictionary of numpy
+    arrays (one or two per column) that can be saved with numpy.savez
+    without pickling.  See arrays_to_frames.
+
+    Columns that are neither numeric nor categorical are stored as strings.
+
+    Params:
+    ------
+    frames: dict
+        name: pandas.DataFrame
+
+    Returns:
+    -------
+    dict
+    '''
+    arrays = {}
+    meta = {}
+    for f, (name, df) in enumerate(frames.items()):
+        columns = []
+        for c, column in enumerate(df.columns):
+            values = df[column]
+            prefix = f'{f}.{c}'
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                kind = 'category'
+                arrays[f'{prefix}.codes'] = values.cat.codes.to_numpy()
+                arrays[f'{prefix}.categories'] = \
+                    values.cat.categories.to_numpy().astype(str)
+            elif values.dtype == object:
+                kind = 'str'
+                arrays[prefix] = values.to_numpy().astype(str)
+            else:
+                kind = 'values'
+                arrays[prefix] = values.to_numpy()
+            columns.append([str(column), kind])
+
+        index = df.index
+        if isinstance(index, pd.RangeIndex) and index.start == 0 \
+                and index.step == 1:
+            index_kind = 'range'
+        elif index.dtype == object:
+            index_kind = 'str'
+            arrays[f'{f}.index'] = index.to_numpy().astype(str)
+        else:
+            index_kind = 'values'
+            arrays[f'{f}.index'] = index.to_numpy()
+
+        meta[name] = {'position': f,
+                      'columns': columns,
+                      'n_rows': len(df),
+                      'index_kind': index_kind,
+                      'index_name': index.name}
+
+    arrays['meta'] = np.array(json.dumps(meta))
+    return arrays
+
+
+def arrays_to_frames(arrays):
+    '''
+    Rebuild the dictionary of DataFrames saved by frames_to_arrays.
+
+    Params:
+    ------
+    arrays: mapping
+        name: np.ndarray e.g. from numpy.load
+
+    Returns:
+    -------
+    dict
+        name: pandas.DataFrame
+    '''
+    meta = json.loads(str(arrays['meta']))
+    frames = {}
+    for name, info in meta.items():
+        f = info['position']
+        data = {}
+        for c, (column, kind) in enumerate(info['columns']):
+            prefix = f'{f}.{c}'
+            if kind == 'category':
+                data[column] = pd.Categorical.from_codes(
+                    arrays[f'{prefix}.codes'],
+                    categories=arrays[f'{prefix}.categories'].astype(object))
+            elif kind == 'str':
+                data[column] = arrays[prefix].astype(object)
+            else:
+                data[column] = arrays[prefix]
+
+        if info['index_kind'] == 'range':
+            index = pd.RangeIndex(info['n_rows'], name=info['index_name'])
+        elif info['index_kind'] == 'str':
+            index = pd.Index(arrays[f'{f}.index'].astype(object),
+                             name=info['index_name'])
+        else:
+            index = pd.Index(arrays[f'{f}.index'], name=info['index_name'])
+
+        frames[name] = pd.DataFrame(data, index=index,
+                                    columns=[column for column, _ in info['columns']])
+    return frames
+
+
+# ## Executing a model
+
+def create_model(scenario, event_logging=True):
+    '''
+    Create an instance of the model selected by scenario.model
+
+    Params:
+    ------
+    scenario: Scenario
+        The scenario/paramaters to run
+
+    event_logging: bool, optional (default=True)
+        Passed to the model. See TreatmentCentreModel.
+
+    Returns:
+    -------
+    TreatmentCentreModel, TreatmentCentreModelSimpleNurseStepOnly or
+    TreatmentCentreModelSimpleBranchedPathway
+    '''
+    if scenario.model == "full":
+        return TreatmentCentreModel(scenario, event_logging=event_logging)
+    if scenario.model == "simplest":
+        return TreatmentCentreModelSimpleNurseStepOnly(scenario,
+                                                       event_logging=event_logging)
+    if scenario.model == "simple_with_branch":
+        return TreatmentCentreModelSimpleBranchedPathway(scenario,
+                                                         event_logging=event_logging)
+    raise ValueError(f'Unknown model {scenario.model}')
+
+
+def single_run(scenario, rc_period=DEFAULT_RESULTS_COLLECTION_PERIOD,
+               random_no_set=1,
+               utilisation_audit_interval=1,
+               return_detailed_logs=False,
+               warm_up=DEFAULT_WARM_UP,
+               cache=None
+               ):
+    '''
+    Perform a single run of the model and return the results
+
+    Parameters:
+    -----------
+
+    scenario: Scenario object
+        The scenario/paramaters to run
+
+    rc_period: int
+        The length of the simulation run that collects results
+
+    random_no_set: int or None, optional (default=DEFAULT_RNG_SET)
+        Controls the set of random seeds used by the stochastic parts of the 
+        model.  Set to different ints to get different results.  Set to None
+        for a random set of seeds.
+
+    return_detailed_logs: bool, optional (default=False)
+        Return the event log and utilisation audit as well as the summary.
+        If False the model is run in summary only mode, with event logging
+        and auditing switched off; the summary results are the same.
+
+    warm_up: float, optional (default=DEFAULT_WARM_UP)
+        Length of the warm-up period run before the results collection
+        period.  See estimate_warm_up.
+
+    cache: ResultsCache, optional (default=None)
+        Return the results from the cache if this run (or the replication
+        of multiple_replications with this random number set) has been
+        done before, otherwise store them in it.  Runs with
+        random_no_set=None are not cached.
+
+    Returns:
+    --------
+        pandas.DataFrame:
+        results from single run.
+    '''
+    # set random number set - this controls sampling for the run.
+    scenario.set_random_no_set(random_no_set)
+
+    if cache is not None and random_no_set is not None:
+        result = run_replications(scenario, rc_period, [random_no_set],
+                                  return_detailed_logs=return_detailed_logs,
+                                  warm_up=warm_up, cache=cache)[0]
+        scenario.set_random_no_set(random_no_set)
+        return result
+
+    # create an instance of the model
+    # (the logs are only needed if they are being returned)
+    model = create_model(scenario, event_logging=return_detailed_logs)
+
+    # run the model
+    model.run(results_collection_period=rc_period, warm_up=warm_up)
+
+    # run results
+    summary = SimulationSummary(model)
+
+    if return_detailed_logs:
+        return {
+            'full_event_log': model.full_event_log.to_frame(),
+            'patient_log':  pd.DataFrame(summary.patient_log),
+            'utilisation_audit': pd.DataFrame(model.utilisation_audit),
+            'summary_df': summary.summary_frame()
+        }
+
+    summary_df = summary.summary_frame()
+
+    return summary_df
+
+
+def multiple_replications(scenario,
+                          rc_period=DEFAULT_RESULTS_COLLECTION_PERIOD,
+                          n_reps=5,
+                          return_detailed_logs=False,
+                          n_jobs=DEFAULT_N_JOBS,
+                          warm_up=DEFAULT_WARM_UP,
+                          cache=None):
+    '''
+    Perform multiple replications of the model.
+
+    Params:
+    ------
+    scenario: Scenario
+        Parameters/arguments to configurethe model
+
+    rc_period: float, optional (default=DEFAULT_RESULTS_COLLECTION_PERIOD)
+        results collection period.
+        the number of minutes to run the model to collect results
+
+    n_reps: int, optional (default=DEFAULT_N_REPS)
+        Number of independent replications to run.
+
+    return_detailed_logs: bool, optional (default=False)
+        Return the event logs of each replication as well as the summary.
+        If False the replications are run in summary only mode (see
+        single_run) and a single DataFrame of results is returned.
+
+    n_jobs: int, optional (default=DEFAULT_N_JOBS)
+        Number of worker processes to spread the replications over.
+        1 runs serially; -1 uses all available cores.  If a process pool
+        cannot be started (e.g. when running in the browser via stlite)
+        the replications are run serially instead.  Results are identical
+        whichever option is used.
+
+    warm_up: float, optional (default=DEFAULT_WARM_UP)
+        Length of the warm-up period of each replication.  See single_run.
+
+    cache: ResultsCache, optional (default=None)
+        Each replication is cached separately, so only replications not
+        run before (e.g. the extra ones when n_reps is increased) are
+        simulated.  See run_replications.
+
+    Returns:
+    --------
+    pandas.DataFrame
+    '''
+    # replication k always uses random number set (base + k)
+    random_no_sets = [scenario.random_number_set + rep for rep in range(n_reps)]
+
+    results = run_replications(scenario, rc_period, random_no_sets,
+                               return_detailed_logs=return_detailed_logs,
+                               n_jobs=n_jobs, warm_up=warm_up, cache=cache)
+
+    if return_detailed_logs:
+        return [{'rep': rep+1, 'results': result}
+                for rep, result in enumerate(results)]
+
+    # format and return results in a dataframe
+    return replications_frame(results)
+
+
+def replications_frame(results):
+    '''
+    Combine the summary results of replications into a single DataFrame
+    with one row per replication, indexed by replication number from 1.
+
+    Params:
+    ------
+    results: list
+        pandas.DataFrame returned by single_run for each replication
 
-        warm_up, float, optional (default=0)
+    Returns:
+    -------
+    pandas.DataFrame
+    '''
+    df_results = pd.concat(results)
+    df_results.index = np.arange(1, len(df_results)+1)
+    df_results.index.name = 'rep'
+    return df_results
 
-            length of initial transient period to truncate
-            from results.
 
-        Returns:
-        --------
-            None
-        '''
-        # setup the arrival generator process
-        self.env.process(self.arrivals_generator())
+def run_replications(scenario, rc_period, random_no_sets,
+                     return_detailed_logs=False, n_jobs=DEFAULT_N_JOBS,
+                     warm_up=DEFAULT_WARM_UP, cache=None):
+    '''
+    Run one replication of the model per random number set and return
+    the output of `single_run` for each, in the order of `random_no_sets`.
 
-        # setup the resource montioring process
+    Params:
+    ------
+    scenario: Scenario
+        Parameters/arguments to configure the model.  It is left on its
+        original random number set afterwards.
 
-        # self.env.process(
-        #     self.interval_audit_utilisation(
-        #         resources=self.args.triage,
-        #         interval=1
-        #     )
-        # )
+    rc_period: float
+        results collection period.
 
-        resources_list = [
-            {'resource_name': 'registration_clerks',
-                'resource_object': self.args.registration},
-            {'resource_name': 'triage_bays', 'resource_object': self.args.triage},
+    random_no_sets: list of int
+        The random number set to use for each replication.
 
-            {'resource_name': 'examination_bays',
-                'resource_object': self.args.exam},
-            {'resource_name': 'non_trauma_treatment_cubicle_type_1',
-                'resource_object': self.args.cubicle_1},
+    return_detailed_logs: bool, optional (default=False)
+        Passed through to `single_run`.
 
-            {'resource_name': 'trauma_bays', 'resource_object': self.args.trauma},
-            {'resource_name': 'trauma_treatmentcubicle_type_2',
-                'resource_object': self.args.cubicle_2}
-        ]
+    n_jobs: int, optional (default=DEFAULT_N_JOBS)
+        Number of worker processes. See `multiple_replications`.
 
-        self.env.process(
-            self.interval_audit_utilisation(
-                resources=resources_list,
-                interval=5
-            )
-        )
+    warm_up: float, optional (default=DEFAULT_WARM_UP)
+        Passed through to `single_run`.
 
-        # store rc period
-        self.rc_period = results_collection_period
+    cache: ResultsCache, optional (default=None)
+        Replications found in the cache (see replication_key) are not
+        run again.  Those that are run are added to it.
 
-        # run
-        self.env.run(until=results_collection_period)
+    Returns:
+    --------
+    list
+    '''
+    results = [None] * len(random_no_sets)
+    if cache is not None:
+        results = [cached_replication(cache, scenario, random_no_set,
+                                      rc_period, warm_up,
+                                      return_detailed_logs)
+                   for random_no_set in random_no_sets]
+
+    missing = [i for i, result in enumerate(results) if result is None]
+    tasks = [(scenario, rc_period, random_no_sets[i], return_detailed_logs,
+              warm_up)
+             for i in missing]
+
+    new_results = None
+    n_workers = get_n_workers(n_jobs, len(tasks))
+
+    if n_workers > 1:
+        new_results = map_in_process_pool(_run_replication, tasks, n_workers)
+
+    if new_results is None:
+        original_random_no_set = scenario.random_number_set
+        new_results = [_run_replication(task) for task in tasks]
+        scenario.set_random_no_set(original_random_no_set)
+
+    for i, result in zip(missing, new_results):
+        results[i] = result
+        if cache is not None:
+            frames = result if return_detailed_logs else {'summary_df': result}
+            cache.put(replication_key(scenario, random_no_sets[i], rc_period,
+                                      warm_up, return_detailed_logs),
+                      frames)
+
+    return results
+
+
+def replication_key(scenario, random_no_set, rc_period, warm_up,
+                    return_detailed_logs):
+    '''
+    Results cache key of one replication (equivalently a single_run) of a
+    scenario.
 
-        # self.utilisation_audit.append(
+    Params:
+    ------
+    scenario: Scenario
+        The scenario/paramaters of the run
 
-        #         {'resource': 'triage',
-        #         'time': self.env.now,
-        #         'capacity': self.args.triage.capacity,
-        #         'usage': self.args.triage.count
-        #         }
+    random_no_set: int
+        The random number set of the replication
 
-        #     )
+    rc_period: float
+        results collection period.
 
-    def interval_audit_utilisation(self, resources, interval=1):
-        '''
-        Record utilisation at defined intervals. 
+    warm_up: float
+        warm-up period
 
-        Needs to be passed to env.process when running model
+    return_detailed_logs: bool
+        Whether the entry holds the detailed logs or only the summary
 
-        Parameters:
-        ------
-        resource: SimPy resource object
-            The resource to monitor
-            OR 
-            a list of dictionaries containing simpy resource objects in the format
-            [{'resource_name':'my_resource', 'resource_object': resource}]
+    Returns:
+    -------
+    str
+    '''
+    return run_fingerprint(scenario, run='replication',
+                           random_no_set=random_no_set,
+                           rc_period=rc_period, warm_up=warm_up,
+                           return_detailed_logs=return_detailed_logs)
 
-        interval: int:
-            Time between audits. 
-            1 unit of time is 1 day in this model.  
-        '''
 
-        while True:
-            # Record time
-            if isinstance(resources, list):
-                for i in range(len(resources)):
-                    self.utilisation_audit.append({
-                        'resource_name': resources[i]['resource_name'],
-                        'simulation_time': self.env.now,  # The current simulation time
-                        # The number of users
-                        'number_utilised': len(resources[i]['resource_object'].items),
-                        'number_available': resources[i]['resource_object'].capacity,
-                        # The number of queued processes
-                        # 'number_queued': len(resources[i]['resource_object'].queue),
-                    })
+def cached_replication(cache, scenario, random_no_set, rc_period, warm_up,
+                       return_detailed_logs):
+    '''
+    Returns the output of single_run for a replication from the cache, or
+    None if it is not cached.  A summary can also be taken from a cached
+    replication with detailed logs.
 
-            else:
-                self.utilisation_audit.append({
-                    # 'simulation_time': resource._env.now,
-                    'simulation_time': self.env.now,  # The current simulation time
-                    'number_utilised': len(resources.items),  # The number of users
-                    'number_available': resources.capacity,
-                    # The number of queued processes
-                    # 'number_queued': len(resources.queue),
-                })
+    Params:
+    ------
+    cache: ResultsCache
+        The cache to look in
 
-            # Trigger next audit after interval
-            yield self.env.timeout(interval)
+    Other params: see replication_key
+    '''
+    frames = cache.get(replication_key(scenario, random_no_set, rc_period,
+                                       warm_up, return_detailed_logs))
+    if frames is None and not return_detailed_logs:
+        frames = cache.get(replication_key(scenario, random_no_set, rc_period,
+                                           warm_up, True))
+    if frames is None:
+        return None
 
-    def arrivals_generator(self):
-        ''' 
-        Simulate the arrival of patients to the model
+    if return_detailed_logs:
+        return frames
+    return frames['summary_df']
 
-        Patients either follow a TraumaPathway or
-        NonTraumaPathway simpy process.
 
-        Non stationary arrivals implemented via Thinning acceptance-rejection 
-        algorithm.
-        '''
-        # while self.env.now < self.rc_period:
-        # if int(round(self.env.now,0)) % 10 == 0:
-        for patient_count in itertools.count():
-            # this give us the index of dataframe to use
-            t = int(self.env.now // 60) % self.args.arrivals.shape[0]
-            lambda_t = self.args.arrivals['arrival_rate'].iloc[t]
+def get_n_workers(n_jobs, n_tasks):
+    '''
+    Number of worker processes to use for n_tasks given a requested n_jobs.
 
-            # set to a large number so that at least 1 sample taken!
-            u = np.Inf
+    Params:
+    ------
+    n_jobs: int or None
+        Requested number of workers. None or 1 means serial, -1 (or any
+        negative number) means all available cores.
 
-            interarrival_time = 0.0
+    n_tasks: int
+        Number of tasks to be run.
 
-            if self.args.override_arrival_rate:
-                interarrival_time += self.args.arrival_dist.sample()
-            else:
-                # reject samples if u >= lambda_t / lambda_max
-                while u >= (lambda_t / self.args.lambda_max):
-                    interarrival_time += self.args.arrival_dist.sample()
-                    u = self.args.thinning_rng.sample()
+    Returns:
+    -------
+    int
+    '''
+    if n_jobs is None:
+        n_jobs = 1
+    elif n_jobs < 0:
+        n_jobs = os.cpu_count() or 1
 
-            # iat
-            yield self.env.timeout(interarrival_time)
+    return max(1, min(n_jobs, n_tasks))
 
-            trace(f'patient {patient_count} arrives at: {self.env.now:.3f}')
-            self.full_event_log.append(
-                {'patient': patient_count,
-                 'pathway': 'Shared',
-                 'event': 'arrival',
-                 'event_type': 'arrival_departure',
-                 'time': self.env.now}
-            )
 
-            # sample if the patient is trauma or non-trauma
-            trauma = self.args.p_trauma_dist.sample()
+def map_in_process_pool(func, tasks, n_workers):
+    '''
+    Map func over tasks in a process pool, preserving the order of tasks.
 
-            if trauma:
-                # create and store a trauma patient to update KPIs.
-                new_patient = TraumaPathway(
-                    patient_count, self.env, self.args, self.full_event_log)
-                self.trauma_patients.append(new_patient)
-            else:
-                # create and store a non-trauma patient to update KPIs.
-                new_patient = NonTraumaPathway(patient_count, self.env,
-                                               self.args, self.full_event_log)
-                self.non_trauma_patients.append(new_patient)
+    Params:
+    ------
+    func: callable
+        A module level function (so it can be sent to the workers)
 
-            # start the pathway process for the patient
-            self.env.process(new_patient.execute())
+    tasks: list
+        The arguments to call func with, one item per call
 
+    n_workers: int
+        Number of worker processes
 
-class SimulationSummary:
+    Returns:
+    -------
+    list, or None if a process pool is not available on this platform
+    (e.g. pyodide) so that the caller can fall back to running serially.
     '''
-    End of run result processing logic of the simulation model
+    try:
+        from concurrent.futures import ProcessPoolExecutor
+        from concurrent.futures.process import BrokenProcessPool
+    except ImportError:
+        return None
+
+    try:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            # hand each worker a few contiguous blocks of tasks
+            chunksize = max(1, len(tasks) // (n_workers * 4))
+            return list(executor.map(func, tasks, chunksize=chunksize))
+    except (NotImplementedError, OSError, BrokenProcessPool):
+        return None
+
+
+def _run_replication(task):
     '''
+    Run a single replication. Module level so that it can be sent to
+    worker processes.
 
-    def __init__(self, model):
-        '''
-        Constructor
+    Params:
+    ------
+    task: tuple
+        (scenario, rc_period, random_no_set, return_detailed_logs, warm_up)
+    '''
+    scenario, rc_period, random_no_set, return_detailed_logs, warm_up = task
+    return single_run(scenario,
+                      rc_period,
+                      random_no_set=random_no_set,
+                      return_detailed_logs=return_detailed_logs,
+                      warm_up=warm_up)
+
+
+# ## Sequential replications
+
+def sequential_replications(scenario,
+                            rc_period=DEFAULT_RESULTS_COLLECTION_PERIOD,
+                            kpis=None,
+                            target_precision=DEFAULT_TARGET_PRECISION,
+                            confidence_level=DEFAULT_CONFIDENCE_LEVEL,
+                            min_reps=DEFAULT_MIN_REPS,
+                            max_reps=DEFAULT_MAX_REPS,
+                            time_budget=None,
+                            n_jobs=DEFAULT_N_JOBS,
+                            warm_up=DEFAULT_WARM_UP,
+                            cache=None):
+    '''
+    Run replications of the model until the confidence interval of each
+    chosen KPI is precise enough, or a limit is reached.
 
-        Params:
-        ------
-        model: TraumaCentreModel
-            The model.
-        '''
-        self.model = model
-        self.args = model.args
-        self.results = None
-        self.patient_log = None
-        self.full_event_log = model.full_event_log
-        self.utilisation_audit = model.utilisation_audit
+    Precision is the half width of the confidence interval of the mean
+    relative to the mean (see replication_precision).  Replication k uses
+    random number set (base + k), as in multiple_replications, so the
+    first n replications are identical to multiple_replications(n_reps=n).
 
-    def process_run_results(self):
-        '''
-        Calculates statistics at end of run.
-        '''
-        self.results = {}
+    Params:
+    ------
+    scenario: Scenario
+        Parameters/arguments to configure the model
 
-        if self.args.model == "simplest":
+    rc_period: float, optional (default=DEFAULT_RESULTS_COLLECTION_PERIOD)
+        results collection period.
+        the number of minutes to run the model to collect results
 
+    kpis: list, optional (default=None)
+        The columns of the results (e.g. '01a_triage_wait') that must
+        reach the target precision.  None means every KPI.
 
-            self.patient_log = self.model.patients
+    target_precision: float, optional (default=DEFAULT_TARGET_PRECISION)
+        Stop when every chosen KPI has a relative precision at or below
+        this value e.g. 0.05 for a half width within 5% of the mean.
 
-            mean_treat_wait = self.get_mean_metric('wait_treat', self.model.patients)
+    confidence_level: float, optional (default=DEFAULT_CONFIDENCE_LEVEL)
+        Confidence level of the intervals.
 
-            perc_treat_wait_target_met = self.get_perc_wait_target_met('wait_treat',
-                                                                       self.model.patients,
-                                                                       target=120)
+    min_reps: int, optional (default=DEFAULT_MIN_REPS)
+        Number of replications to run before precision is first checked.
 
-            # triage utilisation (both types of patient)
-            treat_util = self.get_resource_util('treat_duration',
-                                                self.args.n_cubicles_1,
-                                                self.model.patients)
+    max_reps: int, optional (default=DEFAULT_MAX_REPS)
+        Maximum number of replications to run.
 
-            mean_total = self.get_mean_metric('total_time', self.model.patients)
+    time_budget: float, optional (default=None)
+        Stop launching replications after this many seconds of wall
+        clock time.  None means no limit.
 
-            self.results = {'00_arrivals': len(self.model.patients),
-                            '01a_treatment_wait': mean_treat_wait,
-                            '01b_treatment_util': treat_util,
-                            '01c_treatment_wait_target_met': perc_treat_wait_target_met,
-                            '08_total_time': mean_total,
-                            '09_throughput': self.get_throughput(self.model.patients)
-                            }
-            
-        elif self.args.model == "simple_with_branch":
+    n_jobs: int, optional (default=DEFAULT_N_JOBS)
+        Number of worker processes. After the first min_reps replications,
+        replications are launched in batches of one per worker.
+        See multiple_replications.
 
-            self.patient_log = self.model.patients
+    warm_up: float, optional (default=DEFAULT_WARM_UP)
+        Length of the warm-up period of each replication.  See single_run.
 
-            # mean waiting time for examination (non_trauma)
-            mean_wait_exam = self.get_mean_metric('wait_exam',
-                                                self.model.patients)
+    cache: ResultsCache, optional (default=None)
+        Cache of replications. See run_replications.
 
-            # examination utilisation (non-trauma)
-            exam_util = self.get_resource_util('exam_duration',
-                                            self.args.n_exam,
-                                            self.model.patients)
+    Returns:
+    --------
+    (pandas.DataFrame, pandas.DataFrame)
+        The results of each replication (as multiple_replications) and the
+        precision achieved for each KPI (as replication_precision).
+    '''
+    if max_reps < 1:
+        raise ValueError(f'max_reps must be at least 1, got {max_reps}')
+    if min_reps > max_reps:
+        raise ValueError(f'min_reps ({min_reps}) must not be greater than '
+                         f'max_reps ({max_reps})')
 
-            mean_treat_wait = self.get_mean_metric('wait_treat', self.model.patients)
+    start = time.perf_counter()
+    n_workers = get_n_workers(n_jobs, max_reps)
 
-            perc_wait_exam_target_met = self.get_perc_wait_target_met('wait_exam',
-                                                            self.model.patients,
-                                                            target=120)
+    results = []
+    while len(results) < max_reps:
+        n_new = min(max(min_reps - len(results), n_workers),
+                    max_reps - len(results))
+        random_no_sets = [scenario.random_number_set + rep
+                          for rep in range(len(results), len(results) + n_new)]
+        results.extend(run_replications(scenario, rc_period, random_no_sets,
+                                        n_jobs=n_jobs, warm_up=warm_up,
+                                        cache=cache))
 
-            # triage utilisation (both types of patient)
-            treat_util = self.get_resource_util('treat_duration',
-                                                self.args.n_cubicles_1,
-                                                self.model.patients)
+        df_results = replications_frame(results)
 
-            mean_total = self.get_mean_metric('total_time', self.model.patients)
+        precision = replication_precision(df_results, kpis=kpis,
+                                          confidence_level=confidence_level)
+        precision['target_met'] = \
+            precision['relative_precision'] <= target_precision
 
-            self.results = {'00_arrivals': len(self.model.patients),
-                            '01a_examination_wait': mean_wait_exam,
-                            '01b_examination_util': exam_util,
-                            '01c_examination_wait_target_met': perc_wait_exam_target_met,
-                            '02a_treatment_wait': mean_treat_wait,
-                            '02b_treatment_util': treat_util,
-                            '08_total_time': mean_total,
-                            '09_throughput': self.get_throughput(self.model.patients)
-                            }
-                            
+        if precision['target_met'].all():
+            break
 
-        else:
-        # list of all patients
-            patients = self.model.non_trauma_patients + self.model.trauma_patients
+        if time_budget is not None and time.perf_counter() - start >= time_budget:
+            break
 
-            # mean triage times (both types of patient)
-            mean_triage_wait = self.get_mean_metric('wait_triage', patients)
+    return df_results, precision
 
-            # triage utilisation (both types of patient)
-            triage_util = self.get_resource_util('triage_duration',
-                                                self.args.n_triage,
-                                                patients)
 
-            # mean waiting time for registration (non_trauma)
-            mean_reg_wait = self.get_mean_metric('wait_reg',
-                                                self.model.non_trauma_patients)
+def replication_precision(replications, kpis=None,
+                          confidence_level=DEFAULT_CONFIDENCE_LEVEL):
+    '''
+    Confidence intervals for the mean of each KPI across replications.
 
-            # registration utilisation (trauma)
-            reg_util = self.get_resource_util('reg_duration',
-                                            self.args.n_reg,
-                                            self.model.non_trauma_patients)
+    Params:
+    ------
+    replications: pandas.DataFrame
+        Results of the replications, one row per replication
+        e.g. from multiple_replications
 
-            # mean waiting time for examination (non_trauma)
-            mean_wait_exam = self.get_mean_metric('wait_exam',
-                                                self.model.non_trauma_patients)
+    kpis: list, optional (default=None)
+        The columns to summarise.  None means every column.
 
-            # examination utilisation (non-trauma)
-            exam_util = self.get_resource_util('exam_duration',
-                                            self.args.n_exam,
-                                            self.model.non_trauma_patients)
+    confidence_level: float, optional (default=DEFAULT_CONFIDENCE_LEVEL)
+        Confidence level of the intervals.
 
-            # mean waiting time for treatment (non-trauma)
-            mean_treat_wait = self.get_mean_metric('wait_treat',
-                                                self.model.non_trauma_patients)
+    Returns:
+    -------
+    pandas.DataFrame
+        indexed by KPI, with the number of replications used (those where
+        the KPI could be measured), mean, standard deviation, confidence
+        interval half width and relative precision (half width / mean).
+    '''
+    if kpis is None:
+        kpis = list(replications.columns)
+
+    rows = {}
+    for kpi in kpis:
+        values = replications[kpi].dropna().to_numpy(dtype=np.float64)
+        n_reps = len(values)
+
+        mean = values.mean() if n_reps > 0 else np.nan
+        std = values.std(ddof=1) if n_reps > 1 else np.nan
+        half_width = np.nan
+        if n_reps > 1:
+            t_value = t_quantile(1 - (1 - confidence_level) / 2, n_reps - 1)
+            half_width = t_value * std / np.sqrt(n_reps)
+
+        if mean == 0 and half_width == 0:
+            # e.g. a wait that was zero in every replication
+            relative_precision = 0.0
+        elif mean == 0:
+            relative_precision = np.inf
+        else:
+            relative_precision = half_width / abs(mean)
 
-            # treatment utilisation (non_trauma)
-            treat_util1 = self.get_resource_util('treat_duration',
-                                                self.args.n_cubicles_1,
-                                                self.model.non_trauma_patients)
+        rows[kpi] = {'n_reps': n_reps,
+                     'mean': mean,
+                     'std': std,
+                     'half_width': half_width,
+                     'relative_precision': relative_precision}
 
-            # mean total time (non_trauma)
-            mean_total = self.get_mean_metric('total_time',
-                                            self.model.non_trauma_patients)
+    precision = pd.DataFrame.from_dict(rows, orient='index')
+    precision.index.name = 'kpi'
+    return precision
 
-            # mean waiting time for trauma
-            mean_trauma_wait = self.get_mean_metric('wait_trauma',
-                                                    self.model.trauma_patients)
 
-            # trauma utilisation (trauma)
-            trauma_util = self.get_resource_util('trauma_duration',
-                                                self.args.n_trauma,
-                                                self.model.trauma_patients)
+def t_quantile(p, df):
+    '''
+    Quantile function of Student's t distribution (avoids depending on
+    scipy).
 
-            # mean waiting time for treatment (rauma)
-            mean_treat_wait2 = self.get_mean_metric('wait_treat',
-                                                    self.model.trauma_patients)
+    Exact for 1 and 2 degrees of freedom. Otherwise uses the
+    Cornish-Fisher expansion around the normal quantile, accurate to
+    around 0.1% for the 97.5% quantile at 3 degrees of freedom and
+    improving rapidly as the degrees of freedom increase.
 
-            # treatment utilisation (trauma)
-            treat_util2 = self.get_resource_util('treat_duration',
-                                                self.args.n_cubicles_2,
-                                                self.model.trauma_patients)
+    Params:
+    ------
+    p: float
+        probability, between 0 and 1
 
-            # mean total time (trauma)
-            mean_total2 = self.get_mean_metric('total_time',
-                                            self.model.trauma_patients)
+    df: int
+        degrees of freedom (>= 1)
 
-            self.patient_log = patients
+    Returns:
+    -------
+    float
+    '''
+    if df == 1:
+        return np.tan(np.pi * (p - 0.5))
 
-            self.results = {'00_arrivals': len(patients),
-                            '01a_triage_wait': mean_triage_wait,
-                            '01b_triage_util': triage_util,
-                            '02a_registration_wait': mean_reg_wait,
-                            '02b_registration_util': reg_util,
-                            '03a_examination_wait': mean_wait_exam,
-                            '03b_examination_util': exam_util,
-                            '04a_treatment_wait(non_trauma)': mean_treat_wait,
-                            '04b_treatment_util(non_trauma)': treat_util1,
-                            '05_total_time(non-trauma)': mean_total,
-                            '06a_trauma_wait': mean_trauma_wait,
-                            '06b_trauma_util': trauma_util,
-                            '07a_treatment_wait(trauma)': mean_treat_wait2,
-                            '07b_treatment_util(trauma)': treat_util2,
-                            '08_total_time(trauma)': mean_total2,
-                            '09_throughput': self.get_throughput(patients)
-                            }
+    if df == 2:
+        return (2 * p - 1) / np.sqrt(2 * p * (1 - p))
 
-    def get_mean_metric(self, metric, patients):
-        '''
-        Calculate mean of the performance measure for the
-        select cohort of patients,
+    z = NormalDist().inv_cdf(p)
+    return (z
+            + (z**3 + z) / (4 * df)
+            + (5*z**5 + 16*z**3 + 3*z) / (96 * df**2)
+            + (3*z**7 + 19*z**5 + 17*z**3 - 15*z) / (384 * df**3)
+            + (79*z**9 + 776*z**7 + 1482*z**5 - 1920*z**3 - 945*z)
+            / (92160 * df**4))
 
-        Only calculates metrics for patients where it has been 
-        measured.
 
-        Params:
-        -------
-        metric: str
-            The name of the metric e.g. 'wait_treat'
+# ## Warm-up
 
-        patients: list
-            A list of patients
-        '''
-        mean = np.array([getattr(p, metric) for p in patients
-                         if getattr(p, metric) > -np.inf]).mean()
-        return mean
-    
-    def get_perc_wait_target_met(self, metric, patients, target):
-        '''
-        Calculate the percentage of patients where a target was met for 
-        the select cohort of patients,
+def estimate_warm_up(scenario, rc_period=DEFAULT_WARM_UP_PILOT_PERIOD,
+                     n_reps=DEFAULT_N_REPS,
+                     interval=DEFAULT_WARM_UP_INTERVAL,
+                     batch_size=DEFAULT_MSER_BATCH_SIZE,
+                     n_jobs=DEFAULT_N_JOBS):
+    '''
+    Estimate the warm-up period of a scenario from pilot runs using the
+    MSER-5 rule.
+
+    Each pilot run records the number of patients in the treatment centre
+    at the end of every interval.  These are averaged across replications
+    and the truncation point chosen by mser is returned as a length of
+    time.
+
+    Params:
+    ------
+    scenario: Scenario
+        Parameters/arguments to configure the model
 
-        Only calculates metrics for patients where it has been 
-        measured.
+    rc_period: float, optional (default=DEFAULT_WARM_UP_PILOT_PERIOD)
+        Length of each pilot run.  This should be a good deal longer than
+        the expected warm-up: at most half of it can be truncated.  An
+        estimate of half the run suggests the scenario never reaches a
+        steady state (e.g. a queue that grows without limit).
 
-        Params:
-        -------
-        metric: str
-            The name of the metric e.g. 'wait_treat'
+    n_reps: int, optional (default=DEFAULT_N_REPS)
+        Number of pilot runs.  These use the same random number sets as
+        multiple_replications.
 
-        patients: list
-            A list of patients
-        '''
-        met = len(np.array([getattr(p, metric) for p in patients
-                         if getattr(p, metric) < target]))
-        total = len(np.array([getattr(p, metric) for p in patients
-                         if getattr(p, metric) > -np.inf]))
-        return met/total
+    interval: float, optional (default=DEFAULT_WARM_UP_INTERVAL)
+        Time between observations of the number of patients in the system.
 
-    def get_resource_util(self, metric, n_resources, patients):
-        '''
-        Calculate proportion of the results collection period
-        where a resource was in use.
+    batch_size: int, optional (default=DEFAULT_MSER_BATCH_SIZE)
+        Number of observations averaged into each batch by MSER.
 
-        Done by tracking the duration by patient.
+    n_jobs: int, optional (default=DEFAULT_N_JOBS)
+        Number of worker processes. See multiple_replications.
 
-        Only calculates metrics for patients where it has been 
-        measured.
+    Returns:
+    -------
+    float
+        The estimated warm-up period
+    '''
+    tasks = [(scenario, rc_period, scenario.random_number_set + rep, interval)
+             for rep in range(n_reps)]
 
-        Params:
-        -------
-        metric: str
-            The name of the metric e.g. 'treatment_duration'
+    series = None
+    n_workers = get_n_workers(n_jobs, len(tasks))
 
-        patients: list
-            A list of patients
-        '''
-        total = np.array([getattr(p, metric) for p in patients
-                         if getattr(p, metric) > -np.inf]).sum()
+    if n_workers > 1:
+        series = map_in_process_pool(_run_pilot, tasks, n_workers)
 
-        return total / (self.model.rc_period * n_resources)
+    if series is None:
+        original_random_no_set = scenario.random_number_set
+        series = [_run_pilot(task) for task in tasks]
+        scenario.set_random_no_set(original_random_no_set)
 
-    def get_throughput(self, patients):
-        '''
-        Returns the total number of patients that have successfully
-        been processed and discharged in the treatment centre
-        (they have a total time record)
+    truncation = mser(np.mean(series, axis=0), batch_size=batch_size)
+    return truncation * interval
 
-        Params:
-        -------
-        patients: list
-            list of all patient objects simulated.
 
-        Returns:
-        ------
-        float
-        '''
-        return len([p for p in patients if p.total_time > -np.inf])
+def _run_pilot(task):
+    '''
+    Run a pilot replication for estimate_warm_up and return the number of
+    patients in the system at the end of each interval.  Module level so
+    that it can be sent to worker processes.
 
-    def summary_frame(self):
-        '''
-        Returns run results as a pandas.DataFrame
+    Params:
+    ------
+    task: tuple
+        (scenario, rc_period, random_no_set, interval)
+    '''
+    scenario, rc_period, random_no_set, interval = task
+    scenario.set_random_no_set(random_no_set)
 
-        Returns:
-        -------
-        pd.DataFrame
-        '''
-        # append to results df
-        if self.results is None:
-            self.process_run_results()
+    model = create_model(scenario, event_logging=False)
+    model.run(results_collection_period=rc_period)
 
-        df = pd.DataFrame({'1': self.results})
-        df = df.T
-        df.index.name = 'rep'
-        return df
+    metrics = SimulationSummary(model).patient_metrics()
+    arrived = metrics['arrival'] > -np.inf
+    arrival = metrics['arrival'][arrived]
+    total_time = metrics['total_time'][arrived]
 
-    def detailed_logs(self):
-        '''
-        Returns run results as a pandas.DataFrame
+    # patients still in the system at the end of the run never leave
+    departure = np.where(total_time > -np.inf, arrival + total_time, np.inf)
 
-        Returns:
-        -------
-        pd.DataFrame
-        '''
-        # append to results df
-        if self.full_event_log is None:
-            self.process_run_results()
+    times = np.arange(1, int(rc_period // interval) + 1) * interval
+    n_arrived = np.searchsorted(np.sort(arrival), times, side='right')
+    n_departed = np.searchsorted(np.sort(departure), times, side='right')
+    return n_arrived - n_departed
 
-        if self.utilisation_audit is None:
-            self.process_run_results()
 
-        return {
-            'patient': self.patient_log,
-            'event_log': self.full_event_log,
-            'utilisation_audit': self.utilisation_audit,
-            'results_summary': self.results
-        }
+def mser(series, batch_size=DEFAULT_MSER_BATCH_SIZE):
+    '''
+    Marginal Standard Error Rule (MSER) truncation point of an output
+    series.  With batch_size=5 this is MSER-5.
 
-    # def get_full_event_log(self):
-    #     '''
-    #     Returns run results as a pandas.DataFrame
+    The series is averaged in batches.  The truncation point is the number
+    of leading batches d (at most half of them) minimising
+    sum((Y_i - mean(Y_d+1..n))^2) / (n - d)^2 over the remaining batches.
 
-    #     Returns:
-    #     -------
-    #     pd.DataFrame
-    #     '''
-    #     # append to results df
+    Params:
+    ------
+    series: array-like
+        Observations of a model output in time order e.g. the number of
+        patients in the system at regular intervals
 
-    #     df = pd.DataFrame(self.full_event_log)
-    #     #df = df.T
-    #     #df.index.name = 'rep'
-    #     return df
+    batch_size: int, optional (default=DEFAULT_MSER_BATCH_SIZE)
+        Number of observations averaged into each batch.
 
+    Returns:
+    -------
+    int
+        Number of observations to truncate (a multiple of batch_size)
+    '''
+    series = np.asarray(series, dtype=np.float64)
+    n_batches = len(series) // batch_size
+    if n_batches < 2:
+        return 0
 
-# ## Executing a model
+    batches = series[:n_batches * batch_size].reshape(n_batches, batch_size)
+    batch_means = batches.mean(axis=1)
 
-def single_run(scenario, rc_period=DEFAULT_RESULTS_COLLECTION_PERIOD,
-               random_no_set=1,
-               utilisation_audit_interval=1,
-               return_detailed_logs=False
-               ):
+    # sums over the batches remaining after truncating d = 0 .. n-1
+    remaining = np.arange(n_batches, 0, -1)
+    total = np.cumsum(batch_means[::-1])[::-1]
+    total_sq = np.cumsum(batch_means[::-1]**2)[::-1]
+    sum_sq_dev = total_sq - total**2 / remaining
+    statistic = sum_sq_dev / remaining**2
+
+    # only consider truncating up to half of the series
+    d = int(np.argmin(statistic[:n_batches // 2 + 1]))
+    return d * batch_size
+
+
+# ## Batch means
+
+def batch_means(scenario, rc_period=DEFAULT_BATCH_MEANS_PERIOD,
+                n_batches=DEFAULT_N_BATCHES,
+                warm_up=DEFAULT_WARM_UP,
+                kpis=None,
+                confidence_level=DEFAULT_CONFIDENCE_LEVEL):
     '''
-    Perform a single run of the model and return the results
+    Estimate steady state performance from a single long run of the model
+    using the method of batch means.
 
-    Parameters:
-    -----------
+    The run is warmed up once, then the results collection period is split
+    into n_batches batches of equal length.  Each batch is summarised as if
+    it were a replication (patients arriving during the batch, utilisation
+    over the batch), so only one start-up transient is simulated.  Batches
+    should be long enough for their means to be roughly independent.
 
-    scenario: Scenario object
-        The scenario/paramaters to run
+    Params:
+    ------
+    scenario: Scenario
+        Parameters/arguments to configure the model.  Its current random
+        number set is used.
 
-    rc_period: int
-        The length of the simulation run that collects results
+    rc_period: float, optional (default=DEFAULT_BATCH_MEANS_PERIOD)
+        Total results collection period (after the warm-up)
 
-    random_no_set: int or None, optional (default=DEFAULT_RNG_SET)
-        Controls the set of random seeds used by the stochastic parts of the 
-        model.  Set to different ints to get different results.  Set to None
-        for a random set of seeds.
+    n_batches: int, optional (default=DEFAULT_N_BATCHES)
+        Number of batches to split the results collection period into
+
+    warm_up: float, optional (default=DEFAULT_WARM_UP)
+        Length of the warm-up period.  See estimate_warm_up.
+
+    kpis: list, optional (default=None)
+        The KPIs to calculate confidence intervals for. None means every KPI.
+
+    confidence_level: float, optional (default=DEFAULT_CONFIDENCE_LEVEL)
+        Confidence level of the intervals.
 
     Returns:
     --------
-        pandas.DataFrame:
-        results from single run.
+    (pandas.DataFrame, pandas.DataFrame)
+        The results of each batch (indexed by batch, with the same columns
+        as multiple_replications) and confidence intervals of the mean of
+        each KPI (as replication_precision).
     '''
-    # set random number set - this controls sampling for the run.
-    scenario.set_random_no_set(random_no_set)
-
-    # create an instance of the model
-    if scenario.model == "full":
-        model = TreatmentCentreModel(scenario)
-    if scenario.model == "simplest":
-        model = TreatmentCentreModelSimpleNurseStepOnly(scenario)
-    if scenario.model == "simple_with_branch":
-        model = TreatmentCentreModelSimpleBranchedPathway(scenario)
+    # restart the random number streams
+    scenario.set_random_no_set(scenario.random_number_set)
 
-    # run the model
-    model.run(results_collection_period=rc_period)
+    model = create_model(scenario, event_logging=False)
+    model.run(results_collection_period=rc_period, warm_up=warm_up)
 
-    # run results
-    summary = SimulationSummary(model)
+    batch_length = rc_period / n_batches
+    results = []
+    for batch in range(n_batches):
+        start = warm_up + batch * batch_length
+        summary = SimulationSummary(model, start=start,
+                                    end=start + batch_length)
+        results.append(summary.summary_frame())
 
-    if return_detailed_logs:
-        return {
-            'full_event_log': pd.DataFrame(model.full_event_log),
-            'patient_log':  pd.DataFrame(summary.patient_log),
-            'utilisation_audit': pd.DataFrame(model.utilisation_audit),
-            'summary_df': summary.summary_frame()
-        }
+    df_results = replications_frame(results)
+    df_results.index.name = 'batch'
 
-    summary_df = summary.summary_frame()
+    precision = replication_precision(df_results, kpis=kpis,
+                                      confidence_level=confidence_level)
+    return df_results, precision
 
-    return summary_df
 
+# ## Analytic estimates
 
-def multiple_replications(scenario,
-                          rc_period=DEFAULT_RESULTS_COLLECTION_PERIOD,
-                          n_reps=5,
-                          return_detailed_logs=False):
+def estimate_simplest_model(scenario,
+                            rc_period=DEFAULT_RESULTS_COLLECTION_PERIOD,
+                            warm_up=DEFAULT_WARM_UP,
+                            target=120):
     '''
-    Perform multiple replications of the model.
+    Estimate the results of the "simplest" model (a single treatment step
+    with n_cubicles_1 nurses) with queueing theory instead of simulation.
+
+    The run is split into pieces with a constant arrival rate (each hour
+    of the arrival profile, or the whole run if the arrival rate is
+    overridden).  Each piece is treated as a stationary M/G/c queue
+    (Erlang C, with the Allen-Cunneen correction for the variability of
+    treatment times) while the nurses can keep up.  Any backlog of
+    patients, built up while arrivals outpace the nurses, is tracked as a
+    fluid that carries over between pieces and drains at the nurses'
+    spare capacity.  While there is a backlog every nurse is busy and a
+    new arrival waits for the backlog to be treated.
+
+    The estimate takes well under a millisecond, so it can be used to
+    preview results while the simulation runs or to rule out clearly
+    infeasible numbers of nurses before running replications.  It is an
+    approximation of the expected results and ignores the variation
+    between replications.  When the nurses cannot keep up, it will not
+    match the simulation closely: the simulated mean wait only includes
+    patients whose treatment started before the end of the run, and the
+    simulated percentage meeting the target also counts patients still
+    waiting.
 
     Params:
     ------
     scenario: Scenario
-        Parameters/arguments to configurethe model
+        Parameters of the "simplest" model
 
     rc_period: float, optional (default=DEFAULT_RESULTS_COLLECTION_PERIOD)
-        results collection period.  
-        the number of minutes to run the model to collect results
+        results collection period.
 
-    n_reps: int, optional (default=DEFAULT_N_REPS)
-        Number of independent replications to run.
+    warm_up: float, optional (default=DEFAULT_WARM_UP)
+        Length of the warm-up period before results are collected
+
+    target: float, optional (default=120)
+        Target waiting time for treatment
 
     Returns:
     --------
-    pandas.DataFrame
+    dict
+        The estimated results, with the same keys as the model's results
+        (see SimulationSummary)
+    '''
+    n_servers = scenario.n_cubicles_1
+
+    # treatment times are lognormal: mean and squared coefficient of
+    # variation of the distribution the model samples from
+    treat_dist = scenario.create_distribution('treat_dist')
+    service_mean = np.exp(treat_dist.mu + treat_dist.sigma**2 / 2)
+    service_scv = np.expm1(treat_dist.sigma**2)
+    capacity = n_servers / service_mean
+
+    # pieces of the run with a constant arrival rate, split at the warm-up
+    horizon = warm_up + rc_period
+    edges = np.unique(np.concatenate([np.arange(0.0, horizon, 60.0),
+                                      [warm_up, horizon]]))
+    start, length = edges[:-1], np.diff(edges)
+
+    # arrivals per minute
+    if scenario.override_arrival_rate:
+        arrival_rate = np.full(len(start), 1.0 / scenario.manual_arrival_rate)
+    else:
+        hourly_rate = scenario.arrival_profile.arrival_rate
+        arrival_rate = hourly_rate[(start // 60).astype(int) % len(hourly_rate)] / 60.0
+    offered_load = arrival_rate * service_mean
+
+    # stationary M/G/c queue where the nurses can keep up
+    stable = offered_load < n_servers
+    p_wait = np.ones(len(start))
+    p_wait[stable] = erlang_c(n_servers, offered_load[stable])
+    # waits beyond zero are approximately exponential at this rate
+    decay = np.where(stable, (capacity - arrival_rate) * 2 / (1 + service_scv), 1.0)
+    stationary_wait = p_wait / decay
+    stationary_met = 1 - p_wait * np.exp(-decay * target)
+
+    # fluid backlog: grows (or drains) at the difference between arrivals
+    # and the nurses' capacity, and cannot fall below zero
+    drift = arrival_rate - capacity
+    level = np.cumsum(drift * length)
+    backlog_end = level - np.minimum(np.minimum.accumulate(level), 0.0)
+    backlog_start = np.concatenate([[0.0], backlog_end[:-1]])
+
+    # time in each piece that every nurse is busy with a backlog
+    drain_time = np.divide(backlog_start, -drift,
+                           out=np.full(len(start), np.inf), where=drift < 0)
+    saturated = np.where(drift >= 0, length, np.minimum(length, drain_time))
+    backlog_low = np.minimum(backlog_start, backlog_start + drift * saturated)
+    backlog_high = np.maximum(backlog_start, backlog_start + drift * saturated)
+
+    # an arrival during the backlog waits for the backlog to be treated
+    fluid_wait = (backlog_low + backlog_high) / 2 / capacity
+    # proportion of the backlog period the backlog is below target
+    target_backlog = target * capacity
+    fluid_met = np.where(
+        backlog_high > backlog_low,
+        np.clip((target_backlog - backlog_low)
+                / np.maximum(backlog_high - backlog_low, 1e-12), 0.0, 1.0),
+        (backlog_low < target_backlog).astype(float))
+
+    # combine the backlog and stationary parts of each piece
+    p_saturated = saturated / length
+    wait = (p_saturated * fluid_wait
+            + np.where(stable, (1 - p_saturated) * stationary_wait, 0.0))
+    met = (p_saturated * fluid_met
+           + np.where(stable, (1 - p_saturated) * stationary_met, 0.0))
+    busy = n_servers * saturated + offered_load * (length - saturated)
+
+    # summarise the results collection period, weighting by arrivals
+    collect = start >= warm_up
+    arrivals = arrival_rate[collect] * length[collect]
+    n_arrivals = arrivals.sum()
+    mean_wait = np.average(wait[collect], weights=arrivals)
+
+    # patients still waiting or being treated at the end of the run
+    in_service = n_servers if saturated[-1] == length[-1] else offered_load[-1]
+    throughput = max(n_arrivals - backlog_end[-1] - in_service, 0.0)
+
+    results = {'00_arrivals': float(n_arrivals),
+               '01a_treatment_wait': mean_wait,
+               '01b_treatment_util': busy[collect].sum() / (n_servers * rc_period),
+               '01c_treatment_wait_target_met': np.average(met[collect],
+                                                           weights=arrivals),
+               '08_total_time': mean_wait + service_mean,
+               '09_throughput': throughput}
+
+    return results
+
+
+def erlang_c(n_servers, offered_load):
     '''
+    Probability that an arrival has to wait in an M/M/c queue (Erlang C)
+
+    Params:
+    ------
+    n_servers: int
+        Number of servers (c)
 
-    # if return_full_log:
-    #     results = [single_run(scenario,
-    #                           rc_period,
-    #                           random_no_set=(scenario.random_number_set)+rep,
-    #                           return_full_log=True,
-    #                           return_event_log=False)
-    #                for rep in range(n_reps)]
+    offered_load: float or np.ndarray
+        Arrival rate x mean service time. Must be less than n_servers.
 
-    # format and return results in a dataframe
-    # df_results = pd.concat(reesults)
-    # df_results.index = np.arange(1, len(df_results)+1)
-    # df_results.index.name = 'rep'
-    # return df_results
-    # return results
+    Returns:
+    -------
+    float or np.ndarray
+    '''
+    offered_load = np.asarray(offered_load, dtype=np.float64)
 
-    if return_detailed_logs:
-        results = [{'rep': rep+1,
-                    'results': single_run(scenario,
-                                          rc_period,
-                                          random_no_set=(scenario.random_number_set)+rep,
-                                          return_detailed_logs=True)}
-                   #   .assign(Rep=rep+1)
-                   for rep in range(n_reps)]
-
-        # format and return results in a dataframe
-
-        return results
-    # {
-        # {df_results = [pd.concat(result) for result in results] }
-        # }
-        # return results
-
-    results = [single_run(scenario,
-                          rc_period,
-                          random_no_set=(scenario.random_number_set)+rep)
-               for rep in range(n_reps)]
+    # Erlang B by its recurrence, then converted to Erlang C
+    erlang_b = np.ones_like(offered_load)
+    for k in range(1, n_servers + 1):
+        erlang_b = offered_load * erlang_b / (k + offered_load * erlang_b)
 
-    # format and return results in a dataframe
-    df_results = pd.concat(results)
-    df_results.index = np.arange(1, len(df_results)+1)
-    df_results.index.name = 'rep'
-    return df_results
+    utilisation = offered_load / n_servers
+    return erlang_b / (1 - utilisation * (1 - erlang_b))
 
 
 # ## Scenario Analysis
@@ -1703,7 +4048,8 @@ def get_scenarios():
     return scenarios
 
 
-def run_scenario_analysis(scenarios, rc_period, n_reps):
+def run_scenario_analysis(scenarios, rc_period, n_reps,
+                          n_jobs=DEFAULT_N_JOBS, warm_up=DEFAULT_WARM_UP):
     '''
     Run each of the scenarios for a specified results
     collection period and replications.
@@ -1719,24 +4065,133 @@ def run_scenario_analysis(scenarios, rc_period, n_reps):
     n_rep: int
         Number of replications
 
+    n_jobs: int, optional (default=DEFAULT_N_JOBS)
+        Number of worker processes shared by all of the scenarios.
+        See iter_scenario_results.
+
+    warm_up: float, optional (default=DEFAULT_WARM_UP)
+        Length of the warm-up period of each replication.
+
+    Returns:
+    -------
+    dict
+        replications of each scenario (see multiple_replications), in the
+        same order as scenarios.  Pass to scenario_summary_frame.
     '''
     print('Scenario Analysis')
     print(f'No. Scenario: {len(scenarios)}')
     print(f'Replications: {n_reps}')
 
     scenario_results = {}
-    for sc_name, scenario in scenarios.items():
-
-        print(f'Running {sc_name}', end=' => ')
-        replications = multiple_replications(scenario, rc_period=rc_period,
-                                             n_reps=n_reps)
-        print('done.\n')
+    for sc_name, replications in iter_scenario_results(scenarios, rc_period,
+                                                       n_reps, n_jobs=n_jobs,
+                                                       warm_up=warm_up):
+        print(f'{sc_name} => done.')
 
         # save the results
         scenario_results[sc_name] = replications
 
     print('Scenario analysis complete.')
-    return scenario_results
+    return {sc_name: scenario_results[sc_name] for sc_name in scenarios}
+
+
+def iter_scenario_results(scenarios, rc_period, n_reps,
+                          n_jobs=DEFAULT_N_JOBS, warm_up=DEFAULT_WARM_UP):
+    '''
+    Generator that runs the replications of several scenarios and yields
+    the results of each scenario as soon as all of its replications are
+    complete.
+
+    Every (scenario, replication) pair is submitted to a single process
+    pool, so run time scales with the total number of replications
+    rather than the number of scenarios.  Replication k of a scenario uses
+    the same random number set as in multiple_replications, so results
+    are identical to running each scenario with multiple_replications.
+    If a process pool cannot be used the scenarios are run serially in
+    order.
+
+    Params:
+    ------
+    scenarios: dict
+        dictionary of Scenario objects
+
+    rc_period: float
+        model run length
+
+    n_reps: int
+        Number of replications of each scenario
+
+    n_jobs: int, optional (default=DEFAULT_N_JOBS)
+        Number of worker processes. See multiple_replications.
+
+    warm_up: float, optional (default=DEFAULT_WARM_UP)
+        Length of the warm-up period of each replication.
+
+    Yields:
+    ------
+    (str, pandas.DataFrame)
+        name of the scenario and its replications (as multiple_replications)
+        in the order they complete
+    '''
+    completed = set()
+    n_workers = get_n_workers(n_jobs, len(scenarios) * n_reps)
+
+    if n_workers > 1:
+        for sc_name, replications in _iter_scenario_results_in_pool(
+                scenarios, rc_period, n_reps, n_workers, warm_up):
+            completed.add(sc_name)
+            yield sc_name, replications
+
+    # serially (no pool, or any scenarios left if the pool broke)
+    for sc_name, scenario in scenarios.items():
+        if sc_name not in completed:
+            yield sc_name, multiple_replications(scenario, rc_period=rc_period,
+                                                 n_reps=n_reps,
+                                                 warm_up=warm_up)
+
+
+def _iter_scenario_results_in_pool(scenarios, rc_period, n_reps, n_workers,
+                                   warm_up):
+    '''
+    Yields the results of each scenario as it completes using a process
+    pool (see iter_scenario_results).  Stops early, without raising, if a
+    process pool is not available on this platform.
+    '''
+    try:
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        from concurrent.futures.process import BrokenProcessPool
+    except ImportError:
+        return
+
+    results = {sc_name: [None] * n_reps for sc_name in scenarios}
+    remaining = {sc_name: n_reps for sc_name in scenarios}
+
+    try:
+        with ProcessPoolExecutor(max_workers=n_workers) as executor:
+            # queued one scenario at a time, so the first scenarios finish
+            # (and are yielded) while later ones are still running
+            futures = {}
+            for sc_name, scenario in scenarios.items():
+                for rep in range(n_reps):
+                    task = (scenario, rc_period,
+                            scenario.random_number_set + rep, False, warm_up)
+                    futures[executor.submit(_run_replication, task)] = \
+                        (sc_name, rep)
+
+            try:
+                for future in as_completed(futures):
+                    sc_name, rep = futures[future]
+                    results[sc_name][rep] = future.result()
+                    remaining[sc_name] -= 1
+                    if remaining[sc_name] == 0:
+                        yield sc_name, replications_frame(results[sc_name])
+            finally:
+                # e.g. the caller stopped iterating early
+                for future in futures:
+                    future.cancel()
+
+    except (NotImplementedError, OSError, BrokenProcessPool):
+        return
 
 
 def scenario_summary_frame(scenario_results):
@@ -1781,17 +4236,29 @@ class TreatmentCentreModelSimpleNurseStepOnly:
 
     '''
 
-    def __init__(self, args):
-        self.env = simpy.Environment()
+    def __init__(self, args, event_logging=True):
+        '''
+        Params:
+        ------
+        args: Scenario
+            Container class for the simulation parameters
+
+        event_logging: bool, optional (default=True)
+            Record every event in full_event_log and audit utilisation.
+            Set to False when only the summary results are needed.
+        '''
+        self.env = create_environment(args)
         self.args = args
+        self.event_logging = event_logging
         self.init_resources()
 
         self.patients = []
 
         self.rc_period = None
+        self.warm_up = DEFAULT_WARM_UP
         self.results = None
 
-        self.full_event_log = []
+        self.full_event_log = EventLog() if event_logging else NullEventLog()
         self.utilisation_audit = []
 
     def init_resources(self):
@@ -1807,19 +4274,17 @@ class TreatmentCentreModelSimpleNurseStepOnly:
         # self.args.treatment = CustomResource(self.env,
         #                                 capacity=self.args.n_cubicles_1)
         
-        self.args.treatment = simpy.Store(self.env)
+        self.args.treatment = create_resource_pool(self.env, self.args.n_cubicles_1)
 
-        for i in range(self.args.n_cubicles_1):
-            self.args.treatment.put(
-                CustomResource(
-                    self.env,
-                    capacity=1,
-                    id_attribute = i+1)
-                )
+        self.monitored_resources = [
+            {'resource_name': 'treatment_cubicle_or_nurse',
+                'resource_object': self.args.treatment}
+        ]
 
 
 
-    def run(self, results_collection_period=DEFAULT_RESULTS_COLLECTION_PERIOD):
+    def run(self, results_collection_period=DEFAULT_RESULTS_COLLECTION_PERIOD,
+            warm_up=DEFAULT_WARM_UP):
         '''
         Conduct a single run of the model in its current
         configuration
@@ -1830,10 +4295,12 @@ class TreatmentCentreModelSimpleNurseStepOnly:
         results_collection_period, float, optional
             default = DEFAULT_RESULTS_COLLECTION_PERIOD
 
-        warm_up, float, optional (default=0)
+        warm_up, float, optional (default=DEFAULT_WARM_UP)
 
             length of initial transient period to truncate
-            from results.
+            from results.  The model runs for warm_up +
+            results_collection_period and only patients arriving
+            at or after warm_up are included in the results.
 
         Returns:
         --------
@@ -1856,9 +4323,14 @@ class TreatmentCentreModelSimpleNurseStepOnly:
 
         # store rc perio
         self.rc_period = results_collection_period
+        self.warm_up = warm_up
 
         # run
-        self.env.run(until=results_collection_period)
+        self.env.run(until=warm_up + results_collection_period)
+
+        if self.event_logging:
+            self.utilisation_audit = utilisation_audit_frame(
+                self.monitored_resources)
 
     def interval_audit_utilisation(self, resources, interval=1):
         '''
@@ -1887,25 +4359,41 @@ class TreatmentCentreModelSimpleNurseStepOnly:
                         'resource_name': resources[i]['resource_name'],
                         'simulation_time': self.env.now,  # The current simulation time
                         # The number of users
-                        'number_utilised': resources[i]['resource_object'].count,
-                        'number_available': resources[i]['resource_object'].capacity,
+                        'number_utilised': resources[i]['resource_object'].n_busy,
+                        'number_available': resources[i]['resource_object'].n_resources,
                         # The number of queued processes
-                        'number_queued': len(resources[i]['resource_object'].queue),
+                        # 'number_queued': len(resources[i]['resource_object'].queue),
                     })
 
             else:
                 self.utilisation_audit.append({
                     # 'simulation_time': resource._env.now,
                     'simulation_time': self.env.now,  # The current simulation time
-                    'number_utilised': resources.count,  # The number of users
-                    'number_available': resources.capacity,
+                    'number_utilised': resources.n_busy,  # The number of users
+                    'number_available': resources.n_resources,
                     # The number of queued processes
-                    'number_queued': len(resources.queue),
+                    # 'number_queued': len(resources.queue),
                 })
 
             # Trigger next audit after interval
             yield self.env.timeout(interval)
 
+    def resource_utilisation(self):
+        '''
+        Exact utilisation of each resource over the results collection
+        period (after any warm-up), from the busy time tracked by the
+        resource pools.
+
+        Call after run.
+
+        Returns:
+        -------
+        pd.Series
+        '''
+        return monitored_utilisation(self.monitored_resources,
+                                     self.rc_period,
+                                     warm_up=self.warm_up)
+
     def arrivals_generator(self):
         '''
         Simulate the arrival of patients to the model
@@ -1913,31 +4401,16 @@ class TreatmentCentreModelSimpleNurseStepOnly:
         Patients follow the SimplePathway process.
 
         Non stationary arrivals implemented via Thinning acceptance-rejection
-        algorithm.
+        algorithm (see interarrival_times).
         '''
-        for patient_count in itertools.count():
-
-            # this give us the index of dataframe to use
-            t = int(self.env.now // 60) % self.args.arrivals.shape[0]
-            lambda_t = self.args.arrivals['arrival_rate'].iloc[t]
-
-            # set to a large number so that at least 1 sample taken!
-            u = np.Inf
-
-            interarrival_time = 0.0
-
-            if self.args.override_arrival_rate:
-                interarrival_time += self.args.arrival_dist.sample()
-            else:
-            # reject samples if u >= lambda_t / lambda_max
-                while u >= (lambda_t / self.args.lambda_max):
-                    interarrival_time += self.args.arrival_dist.sample()
-                    u = self.args.thinning_rng.sample()
-
+        for patient_count, interarrival_time in enumerate(
+                interarrival_times(self.env, self.args,
+                                   self.warm_up + self.rc_period)):
             # iat
             yield self.env.timeout(interarrival_time)
 
-            trace(f'patient {patient_count} arrives at: {self.env.now:.3f}')
+            if TRACE:
+                trace(f'patient {patient_count} arrives at: {self.env.now:.3f}')
             # self.full_event_log.append(
             #     {'patient': patient_count,
             #      'pathway': 'Simplest',
@@ -1947,7 +4420,8 @@ class TreatmentCentreModelSimpleNurseStepOnly:
             # )
 
             # Generate the patient
-            new_patient = SimplePathway(patient_count, self.env, self.args, self.full_event_log)
+            new_patient = SimplePathway(patient_count, self.env, self.args, self.full_event_log,
+                                        self.args.patient_streams(patient_count))
             self.patients.append(new_patient)
             # start the pathway process for the patient
             self.env.process(new_patient.execute())
@@ -1965,7 +4439,10 @@ class SimplePathway(object):
     Following treatment they are discharged.
     '''
 
-    def __init__(self, identifier, env, args, full_event_log):
+    __slots__ = ('identifier', 'env', 'args', 'full_event_log', 'dists',
+                 'arrival', 'wait_treat', 'total_time', 'treat_duration')
+
+    def __init__(self, identifier, env, args, full_event_log, dists=None):
         '''
         Constructor method
 
@@ -1974,17 +4451,25 @@ class SimplePathway(object):
         identifier: int
             a numeric identifier for the patient.
 
-        env: simpy.Environment
+        env: simpy.Environment or HeapEnvironment
             the simulation environment
 
         args: Scenario
             Container class for the simulation parameters
 
+        full_event_log: EventLog
+            The event log of the run, shared by every patient
+
+        dists: Scenario or PatientStreams, optional (default=None)
+            The distributions to sample from. Defaults to those of args.
+            See Scenario.patient_streams.
+
         '''
         self.identifier = identifier
         self.env = env
         self.args = args
         self.full_event_log = full_event_log
+        self.dists = args if dists is None else dists
 
         # metrics
         self.arrival = -np.inf
@@ -2003,68 +4488,69 @@ class SimplePathway(object):
         '''
         # record the time of arrival and entered the triage queue
         self.arrival = self.env.now
-        self.full_event_log.append(
-            {'patient': self.identifier,
-             'pathway': 'Simplest',
-             'event_type': 'arrival_departure',
-             'event': 'arrival',
-             'time': self.env.now}
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='Simplest',
+            event_type='arrival_departure',
+            event='arrival',
+            time=self.env.now
         )
 
         # request examination resource
         start_wait = self.env.now
-        self.full_event_log.append(
-            {'patient': self.identifier,
-             'pathway': 'Simplest',
-             'event': 'treatment_wait_begins',
-             'event_type': 'queue',
-             'time': self.env.now}
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='Simplest',
+            event_type='queue',
+            event='treatment_wait_begins',
+            time=self.env.now
         )
 
         # Seize a treatment resource when available
-        treatment_resource = yield self.args.treatment.get()
+        treatment_id = yield self.args.treatment.get()
             
         # record the waiting time for registration
         self.wait_treat = self.env.now - start_wait
-        trace(f'treatment of patient {self.identifier} begins '
-                f'{self.env.now:.3f}')
-        self.full_event_log.append(
-            {'patient': self.identifier,
-                'pathway': 'Simplest',
-                'event': 'treatment_begins',
-                'event_type': 'resource_use',
-                'time': self.env.now,
-                'resource_id': treatment_resource.id_attribute
-                }
+        if TRACE:
+            trace(f'treatment of patient {self.identifier} begins '
+                    f'{self.env.now:.3f}')
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='Simplest',
+            event_type='resource_use',
+            event='treatment_begins',
+            time=self.env.now,
+            resource_id=treatment_id
         )
 
         # sample examination duration.
-        self.treat_duration = self.args.treat_dist.sample()
+        self.treat_duration = self.dists.treat_dist.sample()
         yield self.env.timeout(self.treat_duration)
 
-        trace(f'patient {self.identifier} nurse exam/treatment complete '
-                f'at {self.env.now:.3f};'
-                f'waiting time was {self.wait_treat:.3f}')
-        self.full_event_log.append(
-            {'patient': self.identifier,
-                'pathway': 'Simplest',
-                'event': 'treatment_complete',
-                'event_type': 'resource_use_end',
-                'time': self.env.now,
-                'resource_id': treatment_resource.id_attribute}
+        if TRACE:
+            trace(f'patient {self.identifier} nurse exam/treatment complete '
+                    f'at {self.env.now:.3f};'
+                    f'waiting time was {self.wait_treat:.3f}')
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='Simplest',
+            event_type='resource_use_end',
+            event='treatment_complete',
+            time=self.env.now,
+            resource_id=treatment_id
         )
     
         # Resource is no longer in use, so put it back in
-        self.args.treatment.put(treatment_resource) 
+        self.args.treatment.put(treatment_id) 
 
         # total time in system
         self.total_time = self.env.now - self.arrival
-        self.full_event_log.append(
-            {'patient': self.identifier,
-            'pathway': 'Simplest',
-            'event': 'depart',
-            'event_type': 'arrival_departure',
-            'time': self.env.now}
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='Simplest',
+            event_type='arrival_departure',
+            event='depart',
+            time=self.env.now
         )
 
 
@@ -2089,17 +4575,29 @@ class TreatmentCentreModelSimpleBranchedPathway:
 
     '''
 
-    def __init__(self, args):
-        self.env = simpy.Environment()
+    def __init__(self, args, event_logging=True):
+        '''
+        Params:
+        ------
+        args: Scenario
+            Container class for the simulation parameters
+
+        event_logging: bool, optional (default=True)
+            Record every event in full_event_log and audit utilisation.
+            Set to False when only the summary results are needed.
+        '''
+        self.env = create_environment(args)
         self.args = args
+        self.event_logging = event_logging
         self.init_resources()
 
         self.patients = []
 
         self.rc_period = None
+        self.warm_up = DEFAULT_WARM_UP
         self.results = None
 
-        self.full_event_log = []
+        self.full_event_log = EventLog() if event_logging else NullEventLog()
         self.utilisation_audit = []
 
     def init_resources(self):
@@ -2116,29 +4614,21 @@ class TreatmentCentreModelSimpleBranchedPathway:
         #                                 capacity=self.args.n_cubicles_1)
 
         # Create examination bays
-        self.args.exam = simpy.Store(self.env)
-
-        for i in range(self.args.n_exam):
-            self.args.exam.put(
-                CustomResource(
-                    self.env,
-                    capacity=1,
-                    id_attribute = i+1)
-                )
+        self.args.exam = create_resource_pool(self.env, self.args.n_exam)
 
         # Create treatment bays   
-        self.args.treatment = simpy.Store(self.env)
+        self.args.treatment = create_resource_pool(self.env, self.args.n_cubicles_1)
 
-        for i in range(self.args.n_cubicles_1):
-            self.args.treatment.put(
-                CustomResource(
-                    self.env,
-                    capacity=1,
-                    id_attribute = i+1)
-                )
+        self.monitored_resources = [
+            {'resource_name': 'examination_bays',
+                'resource_object': self.args.exam},
+            {'resource_name': 'treatment_cubicle_or_nurse',
+                'resource_object': self.args.treatment}
+        ]
 
 
-    def run(self, results_collection_period=DEFAULT_RESULTS_COLLECTION_PERIOD):
+    def run(self, results_collection_period=DEFAULT_RESULTS_COLLECTION_PERIOD,
+            warm_up=DEFAULT_WARM_UP):
         '''
         Conduct a single run of the model in its current
         configuration
@@ -2149,10 +4639,12 @@ class TreatmentCentreModelSimpleBranchedPathway:
         results_collection_period, float, optional
             default = DEFAULT_RESULTS_COLLECTION_PERIOD
 
-        warm_up, float, optional (default=0)
+        warm_up, float, optional (default=DEFAULT_WARM_UP)
 
             length of initial transient period to truncate
-            from results.
+            from results.  The model runs for warm_up +
+            results_collection_period and only patients arriving
+            at or after warm_up are included in the results.
 
         Returns:
         --------
@@ -2163,10 +4655,31 @@ class TreatmentCentreModelSimpleBranchedPathway:
 
         # store rc perio
         self.rc_period = results_collection_period
+        self.warm_up = warm_up
 
         # run
-        self.env.run(until=results_collection_period)
+        self.env.run(until=warm_up + results_collection_period)
+
+        if self.event_logging:
+            self.utilisation_audit = utilisation_audit_frame(
+                self.monitored_resources)
+
 
+    def resource_utilisation(self):
+        '''
+        Exact utilisation of each resource over the results collection
+        period (after any warm-up), from the busy time tracked by the
+        resource pools.
+
+        Call after run.
+
+        Returns:
+        -------
+        pd.Series
+        '''
+        return monitored_utilisation(self.monitored_resources,
+                                     self.rc_period,
+                                     warm_up=self.warm_up)
 
     def arrivals_generator(self):
         '''
@@ -2175,31 +4688,16 @@ class TreatmentCentreModelSimpleBranchedPathway:
         Patients follow the SimplePathway process.
 
         Non stationary arrivals implemented via Thinning acceptance-rejection
-        algorithm.
+        algorithm (see interarrival_times).
         '''
-        for patient_count in itertools.count():
-
-            # this give us the index of dataframe to use
-            t = int(self.env.now // 60) % self.args.arrivals.shape[0]
-            lambda_t = self.args.arrivals['arrival_rate'].iloc[t]
-
-            # set to a large number so that at least 1 sample taken!
-            u = np.Inf
-
-            interarrival_time = 0.0
-
-            if self.args.override_arrival_rate:
-                interarrival_time += self.args.arrival_dist.sample()
-            else:
-                # reject samples if u >= lambda_t / lambda_max
-                while u >= (lambda_t / self.args.lambda_max):
-                    interarrival_time += self.args.arrival_dist.sample()
-                    u = self.args.thinning_rng.sample()
-
+        for patient_count, interarrival_time in enumerate(
+                interarrival_times(self.env, self.args,
+                                   self.warm_up + self.rc_period)):
             # iat
             yield self.env.timeout(interarrival_time)
 
-            trace(f'patient {patient_count} arrives at: {self.env.now:.3f}')
+            if TRACE:
+                trace(f'patient {patient_count} arrives at: {self.env.now:.3f}')
             # self.full_event_log.append(
             #     {'patient': patient_count,
             #      'pathway': 'Simplest',
@@ -2209,7 +4707,8 @@ class TreatmentCentreModelSimpleBranchedPathway:
             # )
 
             # Generate the patient
-            new_patient = SimpleBranchedPathway(patient_count, self.env, self.args, self.full_event_log)
+            new_patient = SimpleBranchedPathway(patient_count, self.env, self.args, self.full_event_log,
+                                                self.args.patient_streams(patient_count))
             self.patients.append(new_patient)
             # start the pathway process for the patient
             self.env.process(new_patient.execute())
@@ -2228,7 +4727,11 @@ class SimpleBranchedPathway(object):
     Following treatment they are discharged.
     '''
 
-    def __init__(self, identifier, env, args, full_event_log):
+    __slots__ = ('identifier', 'env', 'args', 'full_event_log', 'dists',
+                 'arrival', 'wait_exam', 'wait_treat', 'total_time',
+                 'exam_duration', 'treat_duration', 'require_treat')
+
+    def __init__(self, identifier, env, args, full_event_log, dists=None):
         '''
         Constructor method
 
@@ -2237,17 +4740,25 @@ class SimpleBranchedPathway(object):
         identifier: int
             a numeric identifier for the patient.
 
-        env: simpy.Environment
+        env: simpy.Environment or HeapEnvironment
             the simulation environment
 
         args: Scenario
             Container class for the simulation parameters
 
+        full_event_log: EventLog
+            The event log of the run, shared by every patient
+
+        dists: Scenario or PatientStreams, optional (default=None)
+            The distributions to sample from. Defaults to those of args.
+            See Scenario.patient_streams.
+
         '''
         self.identifier = identifier
         self.env = env
         self.args = args
         self.full_event_log = full_event_log
+        self.dists = args if dists is None else dists
 
         # metrics
         self.arrival = -np.inf
@@ -2270,144 +4781,146 @@ class SimpleBranchedPathway(object):
         '''
         # record the time of arrival and entered the triage queue
         self.arrival = self.env.now
-        self.full_event_log.append(
-            {'patient': self.identifier,
-             'pathway': 'simple_with_branch',
-             'event_type': 'arrival_departure',
-             'event': 'arrival',
-             'time': self.env.now}
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='simple_with_branch',
+            event_type='arrival_departure',
+            event='arrival',
+            time=self.env.now
         )
 
         # request examination resource
         start_wait = self.env.now
-        self.full_event_log.append(
-            {'patient': self.identifier,
-             'pathway': 'simple_with_branch',
-             'event': 'examination_wait_begins',
-             'event_type': 'queue',
-             'time': self.env.now}
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='simple_with_branch',
+            event_type='queue',
+            event='examination_wait_begins',
+            time=self.env.now
         )
 
         #########################################################
         # All arrivals require examination
-        examination_resource = yield self.args.exam.get()
+        examination_id = yield self.args.exam.get()
 
         # record the waiting time for registration
         self.wait_exam = self.env.now - start_wait
-        trace(f'treatment of patient {self.identifier} begins '
-                f'{self.env.now:.3f}')
-        self.full_event_log.append(
-            {'patient': self.identifier,
-                'pathway': 'simple_with_branch',
-                'event': 'examination_begins',
-                'event_type': 'resource_use',
-                'time': self.env.now,
-                'resource_id': examination_resource.id_attribute
-                }
+        if TRACE:
+            trace(f'treatment of patient {self.identifier} begins '
+                    f'{self.env.now:.3f}')
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='simple_with_branch',
+            event_type='resource_use',
+            event='examination_begins',
+            time=self.env.now,
+            resource_id=examination_id
         )
 
         # sample examination duration.
-        self.exam_duration = self.args.exam_dist.sample()
+        self.exam_duration = self.dists.exam_dist.sample()
         yield self.env.timeout(self.exam_duration)
 
-        trace(f'patient {self.identifier} nurse exam/treatment complete '
-                f'at {self.env.now:.3f};'
-                f'waiting time was {self.wait_treat:.3f}')
-        self.full_event_log.append(
-            {'patient': self.identifier,
-                'pathway': 'simple_with_branch',
-                'event': 'examination_complete',
-                'event_type': 'resource_use_end',
-                'time': self.env.now,
-                'resource_id': examination_resource.id_attribute}
+        if TRACE:
+            trace(f'patient {self.identifier} nurse exam/treatment complete '
+                    f'at {self.env.now:.3f};'
+                    f'waiting time was {self.wait_treat:.3f}')
+        self.full_event_log.record(
+            patient=self.identifier,
+            pathway='simple_with_branch',
+            event_type='resource_use_end',
+            event='examination_complete',
+            time=self.env.now,
+            resource_id=examination_id
         )
 
         # Resource is no longer in use, so put it back in the store
-        self.args.exam.put(examination_resource) 
+        self.args.exam.put(examination_id) 
         #########################################################
 
         # sample if patient requires treatment?
-        self.require_treat = self.args.nt_p_treat_dist.sample()  #pylint: disable=attribute-defined-outside-init
+        self.require_treat = self.dists.nt_p_treat_dist.sample()  #pylint: disable=attribute-defined-outside-init
 
         if self.require_treat:
 
-            self.full_event_log.append(
-                {'patient': self.identifier,
-                 'pathway': 'simple_with_branch',
-                 'event': 'requires_treatment',
-                 'event_type': 'attribute_assigned',
-                 'time': self.env.now}
+            self.full_event_log.record(
+                patient=self.identifier,
+                pathway='simple_with_branch',
+                event_type='attribute_assigned',
+                event='requires_treatment',
+                time=self.env.now
             )
 
             # record the time that entered the treatment queue
             start_wait = self.env.now
-            self.full_event_log.append(
-                {'patient': self.identifier,
-                 'pathway': 'simple_with_branch',
-                 'event': 'treatment_wait_begins',
-                 'event_type': 'queue',
-                 'time': self.env.now}
+            self.full_event_log.record(
+                patient=self.identifier,
+                pathway='simple_with_branch',
+                event_type='queue',
+                event='treatment_wait_begins',
+                time=self.env.now
             )
             ###################################################
             # request treatment cubicle
 
-            non_trauma_treatment_resource = yield self.args.treatment.get()
+            non_trauma_treatment_id = yield self.args.treatment.get()
 
             # record the waiting time for treatment
             self.wait_treat = self.env.now - start_wait
-            trace(f'treatment of patient {self.identifier} begins '
-                    f'{self.env.now:.3f}')
-            self.full_event_log.append(
-                {'patient': self.identifier,
-                    'pathway': 'simple_with_branch',
-                    'event': 'treatment_begins',
-                    'event_type': 'resource_use',
-                    'time': self.env.now,
-                    'resource_id': non_trauma_treatment_resource.id_attribute
-                }
+            if TRACE:
+                trace(f'treatment of patient {self.identifier} begins '
+                        f'{self.env.now:.3f}')
+            self.full_event_log.record(
+                patient=self.identifier,
+                pathway='simple_with_branch',
+                event_type='resource_use',
+                event='treatment_begins',
+                time=self.env.now,
+                resource_id=non_trauma_treatment_id
             )
 
             # sample treatment duration.
-            self.treat_duration = self.args.nt_treat_dist.sample()
+            self.treat_duration = self.dists.nt_treat_dist.sample()
             yield self.env.timeout(self.treat_duration)
 
-            trace(f'patient {self.identifier} treatment complete '
-                    f'at {self.env.now:.3f};'
-                    f'waiting time was {self.wait_treat:.3f}')
-            self.full_event_log.append(
-                {'patient': self.identifier,
-                    'pathway': 'simple_with_branch',
-                    'event': 'treatment_ends',
-                    'event_type': 'resource_use_end',
-                    'time': self.env.now,
-                    'resource_id': non_trauma_treatment_resource.id_attribute}
+            if TRACE:
+                trace(f'patient {self.identifier} treatment complete '
+                        f'at {self.env.now:.3f};'
+                        f'waiting time was {self.wait_treat:.3f}')
+            self.full_event_log.record(
+                patient=self.identifier,
+                pathway='simple_with_branch',
+                event_type='resource_use_end',
+                event='treatment_ends',
+                time=self.env.now,
+                resource_id=non_trauma_treatment_id
             )
 
             # Resource is no longer in use, so put it back in the store
-            self.args.treatment.put(non_trauma_treatment_resource)
-
-            self.full_event_log.append(
-                {'patient': self.identifier,
-                'pathway': 'simple_with_branch',
-                'event': 'depart',
-                'event_type': 'arrival_departure',
-                'time': self.env.now}
+            self.args.treatment.put(non_trauma_treatment_id)
+
+            self.full_event_log.record(
+                patient=self.identifier,
+                pathway='simple_with_branch',
+                event_type='arrival_departure',
+                event='depart',
+                time=self.env.now
             )
         ##########################################################################
         else:
-            self.full_event_log.append(
-                {'patient': self.identifier,
-                 'pathway': 'simple_with_branch',
-                 'event': 'does_not_require_treatment',
-                 'event_type': 'attribute_assigned',
-                 'time': self.env.now}
+            self.full_event_log.record(
+                patient=self.identifier,
+                pathway='simple_with_branch',
+                event_type='attribute_assigned',
+                event='does_not_require_treatment',
+                time=self.env.now
             )
-            self.full_event_log.append(
-                {'patient': self.identifier,
-                'pathway': 'simple_with_branch',
-                'event': 'depart',
-                'event_type': 'arrival_departure',
-                'time': self.env.now}
+            self.full_event_log.record(
+                patient=self.identifier,
+                pathway='simple_with_branch',
+                event_type='arrival_departure',
+                event='depart',
+                time=self.env.now
             )
         # total time in system
         self.total_time = self.env.now - self.arrival
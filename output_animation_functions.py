@@ -1,116 +1,294 @@
+import base64
+import bisect
 import datetime as dt
 import gc
+import json
 import time
 import pandas as pd
 import numpy as np
-import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
+
+# The gaps between snapshots (in minutes) that animation_budget chooses from, so that
+# the clock on the animation moves on in round numbers
+ANIMATION_STEP_CHOICES = [1, 2, 5, 10, 15, 20, 30, 60, 120, 180, 240, 360, 720, 1440]
+
+def animation_budget(event_log,
+                     max_frames=1000,
+                     max_points=50000,
+                     limit_duration=None,
+                     min_every_x_time_units=1,
+                     max_every_x_time_units=60,
+                     min_step_snapshot_max=5,
+                     max_step_snapshot_max=50):
+    """
+    Choose the snapshot settings for an animation so that it stays within a
+    budget of frames and plotted points, however long the model was run for.
+
+    The number of frames is controlled by the gap between snapshots (and, if
+    even the largest gap would give too many, by only animating the start of
+    the run). The number of points is controlled by the number of patients
+    shown at each event: the number of patients at each event in each frame is
+    counted from the event log, and the largest cap that keeps the total
+    within max_points is chosen. If the smallest cap is still too many, the
+    animation is cut off once the budget is used up.
+
+    The result can be passed straight to reshape_for_animations, and the
+    step_snapshot_max should also be passed to generate_animation_df.
+
+    Args:
+        event_log (pd.DataFrame):
+            event log with (at least) patient, event and time columns, and an
+            arrival and depart event per patient
+
+        max_frames (int, optional): Defaults to 1000.
+            The largest number of snapshots to take
+
+        max_points (int, optional): Defaults to 50000.
+            The (approximate) largest number of patient rows across all
+            snapshots
+
+        limit_duration (int, optional): Defaults to None.
+            Never animate beyond this minute. If None, the whole run is used
+
+        min_every_x_time_units (int, optional): Defaults to 1.
+            The smallest gap in minutes between snapshots
+
+        max_every_x_time_units (int, optional): Defaults to 60.
+            The largest gap in minutes between snapshots
+
+        min_step_snapshot_max (int, optional): Defaults to 5.
+            The fewest patients to show at any one event before summarising
+            the rest
+
+        max_step_snapshot_max (int, optional): Defaults to 50.
+            The most patients to show at any one event (e.g. the most that fit
+            in the space given to each queue)
+
+    Returns:
+        dict with every_x_time_units, limit_duration and step_snapshot_max keys
+    """
+    times = event_log['time'].to_numpy(dtype=float)
+    duration = int(np.floor(np.nanmax(times))) + 1 if len(times) else 1
+    if limit_duration is not None:
+        duration = max(min(duration, int(limit_duration)), 1)
+
+    ################################################################################
+    # Use the smallest gap between snapshots that keeps to max_frames
+    ################################################################################
+    steps = sorted({min_every_x_time_units, max_every_x_time_units} |
+                   {step for step in ANIMATION_STEP_CHOICES
+                    if min_every_x_time_units < step < max_every_x_time_units})
+    every_x_time_units = next((step for step in steps
+                               if np.ceil(duration / step) <= max_frames),
+                              steps[-1])
+    duration = min(duration, every_x_time_units * max_frames)
+
+    minutes = np.arange(0, duration, every_x_time_units)
+    n_snapshots = len(minutes)
+
+    ################################################################################
+    # Count the patients at each event in each snapshot
+    ################################################################################
+    # A patient is at an event from the first snapshot at or after it happens until
+    # the snapshot before their next event is seen. After their last event they stay
+    # until the end of the run, unless it was their departure.
+    patient_codes, _ = pd.factorize(event_log['patient'])
+    event_codes, events = pd.factorize(event_log['event'])
+    order = np.lexsort((times, patient_codes))
+    patient_codes, times, event_codes = patient_codes[order], times[order], event_codes[order]
+
+    last_event = np.r_[patient_codes[1:] != patient_codes[:-1], True]
+    departed = event_log['event'].to_numpy()[order] == 'depart'
+    start = np.searchsorted(minutes, times, side='left')
+    end = np.where(last_event,
+                   np.where(departed,
+                            np.searchsorted(minutes, times, side='right'),
+                            n_snapshots),
+                   np.searchsorted(minutes, np.r_[times[1:], np.inf], side='left'))
+
+    keep = (event_codes >= 0) & (end > start)
+    width = n_snapshots + 1
+    changes = (np.bincount(event_codes[keep] * width + start[keep],
+                           minlength=len(events) * width)
+               - np.bincount(event_codes[keep] * width + end[keep],
+                             minlength=len(events) * width))
+    counts = np.cumsum(changes.reshape(len(events), width), axis=1)[:, :n_snapshots]
+
+    ################################################################################
+    # Show as many patients per event as the points budget allows
+    ################################################################################
+    # Each event shows at most step_snapshot_max patients plus one 'additional' row
+    count_frequency = np.bincount(counts.ravel()) if counts.size else np.zeros(1, dtype=int)
+    count_values = np.arange(len(count_frequency))
+
+    step_snapshot_max = min_step_snapshot_max
+    for cap in range(max_step_snapshot_max, min_step_snapshot_max - 1, -1):
+        if np.minimum(count_values, cap + 1) @ count_frequency <= max_points:
+            step_snapshot_max = cap
+            break
+    else:
+        # Even the smallest cap is over budget, so stop once the budget is used up
+        frame_points = np.minimum(counts, step_snapshot_max + 1).sum(axis=0)
+        n_frames = max(np.searchsorted(np.cumsum(frame_points), max_points, side='right'), 1)
+        duration = int(n_frames * every_x_time_units)
+
+    return {
+        'every_x_time_units': int(every_x_time_units),
+        'limit_duration': int(duration),
+        'step_snapshot_max': int(step_snapshot_max)
+        }
 
 def reshape_for_animations(event_log, 
                            every_x_time_units=10,
                            limit_duration=10*60*24,
                            step_snapshot_max=50,
                            debug_mode=False):
-    patient_dfs = []
+    """
+    Take a snapshot of where every patient is at every x minutes of the run.
+
+    Rather than filtering the whole event log again for every snapshot, the
+    log is sorted once and each patient's most recent event at each snapshot
+    minute is found with a single binary search (a sweep through time), so
+    the cost grows with the size of the output rather than with
+    snapshots x events.
+
+    Args:
+        event_log (pd.DataFrame):
+            event log with (at least) patient, event_type, pathway, event
+            and time columns, and an arrival and depart event per patient
+
+        every_x_time_units (int, optional): Defaults to 10.
+            The gap in minutes between snapshots
+
+        limit_duration (int, optional): Defaults to 10*60*24.
+            Snapshots are taken up to (but not including) this minute
 
+        step_snapshot_max (int, optional): Defaults to 50.
+            The maximum number of patients shown at any one event. Any more
+            are summarised in a single row with the number of 'additional'
+            patients
+
+        debug_mode (bool, optional): Defaults to False.
+            Print timings
+
+    Returns:
+        pd.DataFrame with one row per patient per snapshot minute, plus a
+        final 'exit' step for each patient
+    """
     pivoted_log = event_log.pivot_table(values="time",
                                         index=["patient","event_type","pathway"],
-                                        columns="event").reset_index()
+                                        columns="event",
+                                        observed=True).reset_index()
     
     #TODO: Add in behaviour for if limit_duration is None
 
+    minutes = np.arange(limit_duration)
+    minutes = minutes[minutes % every_x_time_units == 0]
+    n_snapshots = len(minutes)
+
+    patient_codes, patients = pd.factorize(event_log['patient'])
+
     ################################################################################
-    # Iterate through every matching minute
-    # and generate snapshot df of position of any patients present at that moment
+    # Work out which snapshots each patient is present in
     ################################################################################
-    for minute in range(limit_duration):
-        # print(minute)
-        # Get patients who arrived before the current minute and who left the system after the current minute
-        # (or arrived but didn't reach the point of being seen before the model run ended)
-        # When turning this into a function, think we will want user to pass
-        # 'first step' and 'last step' or something similar
-        # and will want to reshape the event log for this so that it has a clear start/end regardless
-        # of pathway (move all the pathway stuff into a separate column?)
-
-        # Think we maybe need a pathway order and pathway precedence column
-        # But what about shared elements of each pathway?
-        if minute % every_x_time_units == 0:
-            try:
-                # Work out which patients - if any - were present in the simulation at the current time
-                # They will have arrived at or before the minute in question, and they will depart at
-                # or after the minute in question, or never depart during our model run
-                # (which can happen if they arrive towards the end, or there is a bottleneck)
-                current_patients_in_moment = pivoted_log[(pivoted_log['arrival'] <= minute) & 
-                            (
-                                (pivoted_log['depart'] >= minute) |
-                                (pivoted_log['depart'].isnull() )
-                            )]['patient'].values
-            except KeyError:
-                current_patients_in_moment = None
-
-            # If we do have any patients, they will have been passed as a list
-            # so now just filter our event log down to the events these patients have been
-            # involved in
-            if current_patients_in_moment is not None:
-                # Grab just those clients from the filtered log (the unpivoted version)
-                # Filter out any events that have taken place after the minute we are interested in
-
-                patient_minute_df = event_log[
-                    (event_log['patient'].isin(current_patients_in_moment)) &
-                    (event_log['time'] <= minute)
-                    ]
-                # Each person can only be in a single place at once, and we have filtered out
-                # events that occurred later than the current minute, so filter out any events
-                # then just take the latest event that has taken place for each client
-                most_recent_events_minute_ungrouped = patient_minute_df \
-                    .reset_index(drop=False) \
-                    .sort_values(['time', 'index'], ascending=True) \
-                    .groupby(['patient']) \
-                    .tail(1) 
-
-                # Now rank patients within a given event by the order in which they turned up to that event
-                most_recent_events_minute_ungrouped['rank'] = most_recent_events_minute_ungrouped \
-                              .groupby(['event'])['index'] \
-                              .rank(method='first')
+    # Patients are present in the simulation from the minute they arrive until the
+    # minute they depart, or until the end of the model run if they never depart
+    # (which can happen if they arrive towards the end, or there is a bottleneck)
+    arrival = pivoted_log['arrival'].to_numpy(dtype=float)
+    depart = pivoted_log['depart'].to_numpy(dtype=float)
+
+    first_snapshot = np.searchsorted(minutes, arrival, side='left')
+    end_snapshot = np.where(np.isnan(depart),
+                            n_snapshots,
+                            np.searchsorted(minutes, depart, side='right'))
+    n_present = np.maximum(end_snapshot - first_snapshot, 0)
+
+    # one (patient, snapshot) pair for every snapshot each patient is present in
+    pivoted_patients = patients.get_indexer(pivoted_log['patient'])
+    present_patient = np.repeat(pivoted_patients, n_present)
+    present_snapshot = (np.repeat(first_snapshot - np.cumsum(n_present) + n_present, n_present)
+                        + np.arange(n_present.sum()))
+    pair_keys = present_patient.astype(np.int64) * (n_snapshots + 1) + present_snapshot
+
+    # a patient with more than one arrival row should still only appear once
+    if len(np.unique(pivoted_patients[n_present > 0])) < np.count_nonzero(n_present):
+        pair_keys = np.unique(pair_keys)
+        present_patient, present_snapshot = np.divmod(pair_keys, n_snapshots + 1)
 
-                
-                most_recent_events_minute_ungrouped['max'] = most_recent_events_minute_ungrouped.groupby('event')['rank'] \
-                                                             .transform('max')
-
-                most_recent_events_minute_ungrouped = most_recent_events_minute_ungrouped[
-                    most_recent_events_minute_ungrouped['rank'] <= (step_snapshot_max + 1)
-                    ].copy()
-
-                maximum_row_per_event_df = most_recent_events_minute_ungrouped[
-                    most_recent_events_minute_ungrouped['rank'] == float(step_snapshot_max + 1)
-                    ].copy()
-
-                maximum_row_per_event_df['additional'] = ''
-
-                if len(maximum_row_per_event_df) > 0:
-                    maximum_row_per_event_df['additional'] = maximum_row_per_event_df['max'] - maximum_row_per_event_df['rank']
-                    most_recent_events_minute_ungrouped = pd.concat(
-                        [most_recent_events_minute_ungrouped[most_recent_events_minute_ungrouped['rank'] != float(step_snapshot_max + 1)],
-                        maximum_row_per_event_df],
-                        ignore_index=True
-                    )
-
-                # Add this dataframe to our list of dataframes, and then return to the beginning
-                # of the loop and do this for the next minute of interest until we reach the end
-                # of the period of interest
-                patient_dfs.append(most_recent_events_minute_ungrouped
-                                   .drop(columns='max')
-                                   .assign(minute=minute))
-    if debug_mode:
-        print(f'Iteration through minute-by-minute logs complete {time.strftime("%H:%M:%S", time.localtime())}')
+    ################################################################################
+    # Find the most recent event for each patient at each of those snapshots
+    ################################################################################
+    # Sort the events once by patient and time (ties broken by the order in the log)
+    # An event is seen from the first snapshot at or after the time it happens
+    n_events = len(event_log)
+    event_positions = np.arange(n_events)
+    event_times = event_log['time'].to_numpy(dtype=float)
+    event_index = event_log.index.to_numpy()
+    event_order = np.lexsort((event_positions, event_index, event_times, patient_codes))
+    event_keys = (patient_codes[event_order].astype(np.int64) * (n_snapshots + 1)
+                  + np.searchsorted(minutes, event_times[event_order], side='left'))
+
+    # the last event for the patient that had happened by the snapshot minute
+    latest = np.searchsorted(event_keys, pair_keys, side='right') - 1
+    found = latest >= 0
+    found[found] = event_keys[latest[found]] // (n_snapshots + 1) == present_patient[found]
+
+    rows = event_order[latest[found]]
+    snapshots = present_snapshot[found]
+
+    event_codes, events = pd.factorize(event_log['event'])
+    has_event = event_codes[rows] >= 0
+    rows = rows[has_event]
+    snapshots = snapshots[has_event].astype(np.int64)
+
+    # The position of each event when the log is ordered by time and when it is ordered
+    # by index, so that the snapshot rows can be ordered with a single integer sort
+    time_rank = np.empty(n_events, dtype=np.int64)
+    time_rank[np.lexsort((event_positions, event_index, event_times))] = event_positions
+    index_rank = np.empty(n_events, dtype=np.int64)
+    index_rank[np.lexsort((event_positions, event_times, event_index))] = event_positions
 
-    full_patient_df = (pd.concat(patient_dfs, ignore_index=True)).reset_index(drop=True)
+    ################################################################################
+    # Rank patients within a given event by the order in which they turned up to that event
+    ################################################################################
+    group_keys = snapshots * max(len(events), 1) + event_codes[rows]
+    rank_order = np.argsort(group_keys * n_events + index_rank[rows])
+    group_keys = group_keys[rank_order]
+    new_group = np.r_[True, group_keys[1:] != group_keys[:-1]]
+    group_starts = np.flatnonzero(new_group)
+    group_sizes = np.diff(np.r_[group_starts, len(group_keys)])
+    group_ids = np.cumsum(new_group) - 1
+
+    rank = np.empty(len(rows))
+    rank[rank_order] = np.arange(len(rows)) - group_starts[group_ids] + 1
+    group_size = np.empty(len(rows))
+    group_size[rank_order] = group_sizes[group_ids]
+
+    # Only show the first step_snapshot_max patients at each event, and one extra row
+    # which records how many additional patients are there
+    shown = rank <= (step_snapshot_max + 1)
+    rows, snapshots, rank, group_size = rows[shown], snapshots[shown], rank[shown], group_size[shown]
+    overflow = rank == float(step_snapshot_max + 1)
+
+    # Within each snapshot patients are in the order of their most recent event, with
+    # the overflow rows last
+    output_order = np.argsort((snapshots * 2 + overflow) * n_events + time_rank[rows])
+
+    full_patient_df = event_log.iloc[rows[output_order]].reset_index(drop=False)
+    full_patient_df['rank'] = rank[output_order]
+
+    # The additional column only exists if an event has overflowed, and comes after the
+    # minute column unless the first snapshot has overflowed
+    additional = np.where(overflow, group_size - rank, np.nan)[output_order]
+    if overflow[snapshots == 0].any():
+        full_patient_df['additional'] = additional
+    full_patient_df['minute'] = minutes[snapshots[output_order]]
+    if overflow.any() and 'additional' not in full_patient_df.columns:
+        full_patient_df['additional'] = additional
 
     if debug_mode:
-        print(f'Snapshot df concatenation complete at {time.strftime("%H:%M:%S", time.localtime())}')
-
-    del patient_dfs
-    gc.collect()
+        print(f'Snapshot df creation complete at {time.strftime("%H:%M:%S", time.localtime())}')
 
     # Add a final exit step for each client
     # This is helpful as it ensures all patients are visually seen to exit rather than 
@@ -132,6 +310,215 @@ def reshape_for_animations(event_log,
 
     return full_patient_df.sort_values(["minute", "event"]).reset_index(drop=True)
 
+def iter_snapshots(event_log,
+                   every_x_time_units=10,
+                   limit_duration=10*60*24,
+                   step_snapshot_max=50):
+    """
+    Incrementally build the snapshots of reshape_for_animations, one at a time.
+
+    Consecutive snapshots only differ by the events of the last
+    every_x_time_units minutes, so rather than building each snapshot from
+    scratch the patients at each event are kept in order between snapshots
+    and only the patients with a new event, or who have arrived or departed,
+    are moved.  Snapshots are yielded as they are built, so memory is bounded
+    by the number of patients in the system rather than the length of the run.
+
+    The final 'exit' steps of the patients who have left the system for good
+    are yielded in a separate dataframe straight after each snapshot (and
+    after the last snapshot for those still present at the end).  An exit
+    step can have an earlier minute than the snapshot it follows if the
+    patient was hidden by step_snapshot_max before they left. Sorting the
+    concatenated snapshots by minute and event gives the same rows as
+    reshape_for_animations.
+
+    Args:
+        event_log (pd.DataFrame):
+            event log with (at least) patient, event_type, pathway, event
+            and time columns, and an arrival and depart event per patient
+
+        every_x_time_units (int, optional): Defaults to 10.
+            The gap in minutes between snapshots
+
+        limit_duration (int, optional): Defaults to 10*60*24.
+            Snapshots are taken up to (but not including) this minute
+
+        step_snapshot_max (int, optional): Defaults to 50.
+            The maximum number of patients shown at any one event. Any more
+            are summarised in a single row with the number of 'additional'
+            patients
+
+    Yields:
+        pd.DataFrame of the patients present at each snapshot minute, or of
+        exit steps, in the same format as reshape_for_animations
+    """
+    pivoted_log = event_log.pivot_table(values="time",
+                                        index=["patient","event_type","pathway"],
+                                        columns="event",
+                                        observed=True).reset_index()
+
+    minutes = np.arange(limit_duration)
+    minutes = minutes[minutes % every_x_time_units == 0]
+    n_snapshots = len(minutes)
+
+    patient_codes, patients = pd.factorize(event_log['patient'])
+    event_codes, _ = pd.factorize(event_log['event'])
+
+    # the columns of the snapshot dataframes, taken from the event log once
+    columns = {event_log.index.name or 'index': event_log.index.to_numpy()}
+    columns.update({column: event_log[column].array for column in event_log.columns})
+
+    # When each patient enters and leaves the snapshots (see reshape_for_animations)
+    arrival = pivoted_log['arrival'].to_numpy(dtype=float)
+    depart = pivoted_log['depart'].to_numpy(dtype=float)
+    first_snapshot = np.searchsorted(minutes, arrival, side='left')
+    end_snapshot = np.where(np.isnan(depart),
+                            n_snapshots,
+                            np.searchsorted(minutes, depart, side='right'))
+    present = end_snapshot > first_snapshot
+    pivoted_patients = patients.get_indexer(pivoted_log['patient'])[present]
+    first_snapshot, end_snapshot = first_snapshot[present], end_snapshot[present]
+
+    # the snapshot after which each patient will never be seen again
+    final_snapshot = np.full(len(patients), -1)
+    np.maximum.at(final_snapshot, pivoted_patients, end_snapshot)
+
+    # Events are applied in time order (ties broken by index, then order in the log)
+    # at the first snapshot at or after the time they happen
+    n_events = len(event_log)
+    event_positions = np.arange(n_events)
+    event_times = event_log['time'].to_numpy(dtype=float)
+    event_index = event_log.index.to_numpy()
+    time_rank = np.empty(n_events, dtype=np.int64)
+    time_rank[np.lexsort((event_positions, event_index, event_times))] = event_positions
+
+    # Patients at an event are ranked by the index of the event row
+    index_order = np.lexsort((event_positions, event_times, event_index))
+    index_rank = np.empty(n_events, dtype=np.int64)
+    index_rank[index_order] = event_positions
+
+    event_snapshot = np.searchsorted(minutes, event_times, side='left')
+    event_order = np.lexsort((time_rank, event_snapshot))
+    event_snapshot = event_snapshot[event_order]
+
+    starts_order = np.argsort(first_snapshot, kind='stable')
+    ends_order = np.argsort(end_snapshot, kind='stable')
+
+    next_event = next_start = next_end = 0
+    latest_event = np.full(len(patients), -1)
+    presence_count = np.zeros(len(patients), dtype=np.int64)
+
+    # per event, the sorted index ranks of the patients currently at it
+    members = {}
+    # the index rank each patient is currently listed under
+    member_key = {}
+    # the row, rank, additional count and snapshot each patient was last shown with
+    last_shown = {}
+
+    for snapshot, minute in enumerate(minutes):
+        touched = set()
+
+        # Apply the events that happened since the last snapshot
+        while next_event < n_events and event_snapshot[next_event] == snapshot:
+            row = event_order[next_event]
+            latest_event[patient_codes[row]] = row
+            touched.add(patient_codes[row])
+            next_event += 1
+
+        # Patients arriving and departing
+        while next_start < len(starts_order) and first_snapshot[starts_order[next_start]] == snapshot:
+            patient = pivoted_patients[starts_order[next_start]]
+            presence_count[patient] += 1
+            touched.add(patient)
+            next_start += 1
+
+        while next_end < len(ends_order) and end_snapshot[ends_order[next_end]] == snapshot:
+            patient = pivoted_patients[ends_order[next_end]]
+            presence_count[patient] -= 1
+            touched.add(patient)
+            next_end += 1
+
+        # Move the patients whose state has changed between events
+        for patient in touched:
+            row = latest_event[patient]
+            if presence_count[patient] > 0 and row >= 0 and event_codes[row] >= 0:
+                new_key = index_rank[row]
+            else:
+                new_key = None
+
+            old_key = member_key.pop(patient, None)
+            if old_key is not None:
+                old_members = members[event_codes[index_order[old_key]]]
+                del old_members[bisect.bisect_left(old_members, old_key)]
+            if new_key is not None:
+                member_key[patient] = new_key
+                bisect.insort(members.setdefault(event_codes[row], []), new_key)
+
+        # Read off the first step_snapshot_max + 1 patients at each event
+        shown_rows, shown_ranks, shown_additional, overflow = [], [], [], []
+        for keys in members.values():
+            n_shown = min(len(keys), step_snapshot_max + 1)
+            shown_rows.extend(index_order[keys[:n_shown]])
+            shown_ranks.extend(range(1, n_shown + 1))
+            shown_additional.extend([np.nan] * min(n_shown, step_snapshot_max))
+            overflow.extend([False] * min(n_shown, step_snapshot_max))
+            if n_shown > step_snapshot_max:
+                shown_additional.append(len(keys) - n_shown)
+                overflow.append(True)
+
+        shown_rows = np.array(shown_rows, dtype=np.int64)
+        shown_ranks = np.array(shown_ranks, dtype=float)
+        shown_additional = np.array(shown_additional, dtype=float)
+        overflow = np.array(overflow, dtype=bool)
+
+        # Within each snapshot patients are in the order of their most recent event,
+        # with the overflow rows last
+        order = np.lexsort((time_rank[shown_rows], overflow))
+        yield _snapshot_rows(columns, shown_rows[order], shown_ranks[order],
+                             shown_additional[order], minute)
+
+        for row, rank, additional in zip(shown_rows, shown_ranks, shown_additional):
+            last_shown[patient_codes[row]] = (row, rank, additional, snapshot)
+
+        # Patients who have left for good take their exit step
+        leaving = sorted(patient for patient in touched
+                         if final_snapshot[patient] == snapshot and patient in last_shown)
+        if leaving:
+            yield _exit_rows(columns, [last_shown.pop(patient) for patient in leaving],
+                             minutes, every_x_time_units)
+
+    # Patients still in the system at the end of the snapshots
+    if last_shown:
+        yield _exit_rows(columns, [last_shown[patient] for patient in sorted(last_shown)],
+                         minutes, every_x_time_units)
+
+
+def _snapshot_rows(columns, rows, ranks, additional, minute):
+    """
+    Build the rows of a snapshot from the positions of the most recent event
+    of each patient in the event log.
+    """
+    snapshot = {column: values.take(rows) for column, values in columns.items()}
+    snapshot['rank'] = ranks
+    if not np.isnan(additional).all():
+        snapshot['additional'] = additional
+    snapshot['minute'] = np.full(len(rows), minute)
+    return pd.DataFrame(snapshot)
+
+
+def _exit_rows(columns, last_shown, minutes, every_x_time_units):
+    """
+    Build the final 'exit' step rows from the (row, rank, additional, snapshot)
+    each patient was last shown with.
+    """
+    last_shown = np.array(last_shown, dtype=float)
+    exit_df = _snapshot_rows(columns, last_shown[:, 0].astype(np.int64),
+                             last_shown[:, 1], last_shown[:, 2],
+                             minutes[last_shown[:, 3].astype(np.int64)] + every_x_time_units)
+    exit_df['event'] = "exit"
+    return exit_df
+
+
 def generate_animation_df(
         full_patient_df,
         event_position_df,
@@ -267,6 +654,213 @@ def generate_animation_df(
 
 
 
+def _axis_maxima(event_position_df, override_x_max=None, override_y_max=None):
+    """
+    The maximum of the x and y axes of an animation.
+    """
+    if override_x_max is not None:
+        x_max = override_x_max
+    else:
+        x_max = event_position_df['x'].max()*1.25
+
+    if override_y_max is not None:
+        y_max = override_x_max
+    else:
+        y_max = event_position_df['y'].max()*1.1
+
+    return x_max, y_max
+
+
+def _display_minutes(minutes, time_display_units=None, start_date=None):
+    """
+    Convert an array of minutes into the values used to sort the frames of an
+    animation and the values displayed for each frame.
+
+    If we're displaying time as a clock instead of as units of whatever time our model
+    is working in, the displayed values are psuedo datetimes.
+
+    For now, they start a few months after the current date, just to give the
+    idea of simulating some hypothetical future time. It might be nice to allow
+    the start point to be changed, particular if we're simulating something on
+    a larger timescale that includes a level of weekly or monthly seasonality.
+
+    Returns:
+        tuple of np.ndarray (minutes, minutes_display)
+    """
+    if time_display_units == "dhm":
+        minute_dates = dt.date.today() + pd.DateOffset(days=165) +  pd.TimedeltaIndex(minutes, unit='m')
+        # https://strftime.org/
+        minutes_display = minute_dates.strftime('%d %B %Y\n%H:%M').to_numpy()
+        minutes = minute_dates.strftime('%Y-%m-%d %H:%M').to_numpy()
+    if time_display_units == "d":
+        if start_date is None:
+            minute_dates = dt.date.today() + pd.DateOffset(days=165) +  pd.TimedeltaIndex(minutes, unit='d')
+        else:
+            minute_dates = dt.datetime.strptime(start_date, "%Y-%m-%d") +  pd.TimedeltaIndex(minutes, unit='d')
+
+        minutes_display = minute_dates.strftime('%A %d %B %Y').to_numpy()
+        minutes = minute_dates.strftime('%Y-%m-%d').to_numpy()
+    else:
+        minutes_display = minutes
+
+    return minutes, minutes_display
+
+
+def _resource_positions(event_position_df, scenario, gap_between_resources=10):
+    """
+    One row per resource, with the position of the resource in x_final,
+    starting from the position of the event that uses the resource.
+    """
+    events_with_resources = event_position_df[event_position_df['resource'].notnull()].copy()
+    events_with_resources['resource_count'] = events_with_resources['resource'].apply(lambda x: getattr(scenario, x))
+
+    events_with_resources = events_with_resources.join(events_with_resources.apply(
+        lambda r: pd.Series({'x_final': [r['x']-(gap_between_resources*(i+1)) for i in range(r['resource_count'])]}), axis=1).explode('x_final'),
+        how='right')
+
+    return events_with_resources
+
+
+def build_animated_scatter(
+        df,
+        x,
+        y,
+        animation_frame,
+        animation_group,
+        text,
+        hover_name,
+        hover_data,
+        range_x,
+        range_y,
+        height=None,
+        width=None,
+        opacity=None
+):
+    """
+    Build the same animated scatter as px.scatter, straight from numpy arrays.
+
+    Plotly express splits the dataframe up and builds and validates a full
+    trace for every frame, which is slow for animations with hundreds of
+    frames. Here the dataframe is grouped by frame once, and each frame only
+    holds the data that changes between frames (positions, icons and hover
+    text). Everything else is set on the figure's trace and carried over from
+    frame to frame when the animation plays, so the figure looks the same.
+
+    Args:
+        df (pd.DataFrame):
+            one row per entity per frame
+
+        x, y, text, hover_name (str):
+            the columns to use for the position, icon and hover title of
+            each entity
+
+        animation_frame (str):
+            column giving the frame each row belongs to. Frames are in the
+            order they first appear in df
+
+        animation_group (str):
+            column identifying each entity, so it can be moved between frames
+
+        hover_data (list of str):
+            additional columns to show on hover
+
+        range_x, range_y (list):
+            the axis ranges
+
+        height, width (int, optional):
+            size of the figure in pixels
+
+        opacity (float, optional):
+            opacity of the markers
+
+    Returns:
+       Plotly fig object
+    """
+    frame_values, frame_codes = pd.factorize(df[animation_frame])[::-1]
+    frame_order = np.argsort(frame_codes, kind='stable')
+    frame_starts = np.r_[0, np.cumsum(np.bincount(frame_codes, minlength=len(frame_values)))]
+
+    # Take each column in frame order once, then each frame is a slice of these
+    columns = {
+        'x': df[x].to_numpy()[frame_order],
+        'y': df[y].to_numpy()[frame_order],
+        'ids': df[animation_group].to_numpy()[frame_order],
+        'text': df[text].to_numpy()[frame_order],
+        'hovertext': df[hover_name].to_numpy()[frame_order],
+        'customdata': df[hover_data].to_numpy()[frame_order]
+    }
+
+    hover_lines = ([f'{x}=%{{x}}', f'{y}=%{{y}}', f'{text}=%{{text}}'] +
+                   [f'{column}=%{{customdata[{i}]}}' for i, column in enumerate(hover_data)])
+
+    def frame_trace(frame):
+        trace = {key: values[frame_starts[frame]:frame_starts[frame + 1]]
+                 for key, values in columns.items()}
+        trace['hovertemplate'] = (f'<b>%{{hovertext}}</b><br><br>{animation_frame}={frame_values[frame]}<br>'
+                                  + '<br>'.join(hover_lines) + '<extra></extra>')
+        return trace
+
+    # The same animation settings as plotly express
+    def animation_args(frame_names, duration):
+        return [frame_names, dict(frame=dict(duration=duration, redraw=False),
+                                  mode="immediate",
+                                  fromcurrent=True,
+                                  transition=dict(duration=duration, easing="linear"))]
+
+    frame_names = [str(value) for value in frame_values]
+
+    fig = go.Figure(
+        data=[go.Scatter(
+            frame_trace(0),
+            legendgroup="",
+            marker=dict(color=pio.templates[pio.templates.default].layout.colorway[0],
+                        opacity=opacity,
+                        symbol="circle"),
+            mode="markers+text",
+            name="",
+            orientation="v",
+            showlegend=False,
+            xaxis="x",
+            yaxis="y"
+        )],
+        layout=dict(
+            xaxis=dict(anchor="y", domain=[0.0, 1.0], title=dict(text=x), range=range_x),
+            yaxis=dict(anchor="x", domain=[0.0, 1.0], title=dict(text=y), range=range_y),
+            legend=dict(tracegroupgap=0),
+            margin=dict(t=60),
+            height=height,
+            width=width,
+            updatemenus=[dict(
+                buttons=[dict(args=animation_args(None, 500), label="&#9654;", method="animate"),
+                         dict(args=animation_args([None], 0), label="&#9724;", method="animate")],
+                direction="left",
+                pad=dict(r=10, t=70),
+                showactive=False,
+                type="buttons",
+                x=0.1,
+                xanchor="right",
+                y=0,
+                yanchor="top"
+            )],
+            sliders=[dict(
+                active=0,
+                currentvalue=dict(prefix=f"{animation_frame}="),
+                len=0.9,
+                pad=dict(b=10, t=60),
+                steps=[dict(args=animation_args([name], 0), label=name, method="animate")
+                       for name in frame_names],
+                x=0.1,
+                xanchor="left",
+                y=0,
+                yanchor="top"
+            )]
+        ),
+        frames=[dict(data=[frame_trace(frame)], name=name)
+                for frame, name in enumerate(frame_names)]
+    )
+
+    return fig
+
 def generate_animation(
         full_patient_df_plus_pos,
         event_position_df,
@@ -296,48 +890,19 @@ def generate_animation(
             generate_animation_df()
     """
 
-    if override_x_max is not None:
-        x_max = override_x_max
-    else:
-        x_max = event_position_df['x'].max()*1.25
-
-    if override_y_max is not None:
-        y_max = override_x_max
-    else:
-        y_max = event_position_df['y'].max()*1.1
+    x_max, y_max = _axis_maxima(event_position_df, override_x_max, override_y_max)
 
     # If we're displaying time as a clock instead of as units of whatever time our model
     # is working in, create a minute_display column that will display as a psuedo datetime
-    
-    # For now, it starts a few months after the current date, just to give the
-    # idea of simulating some hypothetical future time. It might be nice to allow
-    # the start point to be changed, particular if we're simulating something on
-    # a larger timescale that includes a level of weekly or monthly seasonality.
+    # (see _display_minutes)
 
     # We need to keep the original minute column in existance because it's important for sorting
-    if time_display_units == "dhm":
-        full_patient_df_plus_pos['minute'] = dt.date.today() + pd.DateOffset(days=165) +  pd.TimedeltaIndex(full_patient_df_plus_pos['minute'], unit='m')
-        # https://strftime.org/
-        full_patient_df_plus_pos['minute_display'] = full_patient_df_plus_pos['minute'].apply(
-            lambda x: dt.datetime.strftime(x, '%d %B %Y\n%H:%M')
-            )
-        full_patient_df_plus_pos['minute'] = full_patient_df_plus_pos['minute'].apply(
-            lambda x: dt.datetime.strftime(x, '%Y-%m-%d %H:%M')
-            )
-    if time_display_units == "d":
-        if start_date is None:
-            full_patient_df_plus_pos['minute'] = dt.date.today() + pd.DateOffset(days=165) +  pd.TimedeltaIndex(full_patient_df_plus_pos['minute'], unit='d')
-        else:
-            full_patient_df_plus_pos['minute'] = dt.datetime.strptime(start_date, "%Y-%m-%d") +  pd.TimedeltaIndex(full_patient_df_plus_pos['minute'], unit='d')
+    # Each distinct minute is only converted to a date and formatted once
+    unique_minutes, minute_positions = np.unique(full_patient_df_plus_pos['minute'], return_inverse=True)
+    minutes, minutes_display = _display_minutes(unique_minutes, time_display_units, start_date)
 
-        full_patient_df_plus_pos['minute_display'] = full_patient_df_plus_pos['minute'].apply(
-            lambda x: dt.datetime.strftime(x, '%A %d %B %Y')
-            )
-        full_patient_df_plus_pos['minute'] = full_patient_df_plus_pos['minute'].apply(
-            lambda x: dt.datetime.strftime(x, '%Y-%m-%d')
-            )
-    else:
-        full_patient_df_plus_pos['minute_display'] = full_patient_df_plus_pos['minute']
+    full_patient_df_plus_pos['minute'] = minutes[minute_positions]
+    full_patient_df_plus_pos['minute_display'] = minutes_display[minute_positions]
 
     # We are effectively making use of an animated plotly express scatterploy
     # to do all of the heavy lifting
@@ -350,7 +915,7 @@ def generate_animation(
         hovers = ["patient", "pathway", "time", "minute"]
 
 
-    fig = px.scatter(
+    fig = build_animated_scatter(
             full_patient_df_plus_pos.sort_values('minute'),
             x="x_final",
             y="y_final",
@@ -397,12 +962,7 @@ def generate_animation(
     # Then, starting from the initial position, make that many large circles
     # make them semi-transparent or you won't see the people using them! 
     if scenario is not None:
-        events_with_resources = event_position_df[event_position_df['resource'].notnull()].copy()
-        events_with_resources['resource_count'] = events_with_resources['resource'].apply(lambda x: getattr(scenario, x))
-
-        events_with_resources = events_with_resources.join(events_with_resources.apply(
-            lambda r: pd.Series({'x_final': [r['x']-(gap_between_resources*(i+1)) for i in range(r['resource_count'])]}), axis=1).explode('x_final'),
-            how='right')
+        events_with_resources = _resource_positions(event_position_df, scenario, gap_between_resources)
 
         # This just adds an additional scatter trace that creates large dots
         # that represent the individual resources
@@ -496,6 +1056,393 @@ def generate_animation(
 
     return fig
 
+def encode_animation_frames(full_patient_df_plus_pos,
+                            time_display_units=None,
+                            start_date=None):
+    """
+    Encode the positions of each patient in each frame of an animation as a
+    compact payload of typed arrays.
+
+    Rather than repeating every patient's icon, hover text and position in
+    every frame (as the plotly figure does), each frame only records the
+    patients that have appeared or changed position, icon or event since the
+    previous frame, and the patients that have left. Icons and events are
+    stored once in a dictionary and referred to by their index.
+
+    Args:
+        full_patient_df_plus_pos (pd.DataFrame):
+            output of generate_animation_df()
+
+        time_display_units (str, optional): Defaults to None.
+            See generate_animation
+
+        start_date (str, optional): Defaults to None.
+            See generate_animation
+
+    Returns:
+        dict that can be serialised to JSON, with the typed arrays as
+        dicts of their dtype and base64 encoded little endian data
+    """
+    # Patients without a position (events not in the event_position_df) aren't shown
+    df = full_patient_df_plus_pos[full_patient_df_plus_pos['x_final'].notna() &
+                                  full_patient_df_plus_pos['y_final'].notna()]
+
+    frame_minutes, frames = np.unique(df['minute'], return_inverse=True)
+    _, frame_labels = _display_minutes(frame_minutes, time_display_units, start_date)
+    n_frames = len(frame_minutes)
+
+    patient_ids, patients = np.unique(df['patient'], return_inverse=True)
+    icon_codes, icons = pd.factorize(df['icon'])
+    event_codes, events = pd.factorize(df['event'])
+    x = df['x_final'].to_numpy(dtype=np.float32)
+    y = df['y_final'].to_numpy(dtype=np.float32)
+
+    # Go through each patient's rows in frame order (if a patient is in more
+    # than one place in a frame, the last one is used)
+    order = np.lexsort((frames, patients))
+    last_in_frame = np.r_[(patients[order][1:] != patients[order][:-1]) |
+                          (frames[order][1:] != frames[order][:-1]), True]
+    order = order[last_in_frame]
+    patients, frames, x, y, icon_codes, event_codes = (values[order] for values in
+                                                       (patients, frames, x, y, icon_codes, event_codes))
+
+    # Whether each row is the same patient as the previous row in the previous frame
+    continues = np.r_[False, (patients[1:] == patients[:-1]) & (frames[1:] == frames[:-1] + 1)]
+    unchanged = continues & np.r_[False, (x[1:] == x[:-1]) & (y[1:] == y[:-1]) &
+                                         (icon_codes[1:] == icon_codes[:-1]) &
+                                         (event_codes[1:] == event_codes[:-1])]
+
+    # Patients that are in a frame but not the next have left by the next frame
+    leaves = ~np.r_[continues[1:], False] & (frames < n_frames - 1)
+
+    changed = np.flatnonzero(~unchanged)
+    changed = changed[np.argsort(frames[changed], kind='stable')]
+    left = np.flatnonzero(leaves)
+    left = left[np.argsort(frames[left], kind='stable')]
+
+    def frame_offsets(frame_of_each):
+        return np.r_[0, np.cumsum(np.bincount(frame_of_each, minlength=n_frames))]
+
+    return {
+        'frame_labels': [str(label) for label in frame_labels],
+        'patients': _typed_array(patient_ids, np.int32),
+        'icons': [str(icon) for icon in icons],
+        'events': [str(event) for event in events],
+        'offsets': _typed_array(frame_offsets(frames[changed]), np.uint32),
+        'patient': _typed_array(patients[changed], _index_dtype(len(patient_ids))),
+        'x': _typed_array(x[changed], np.float32),
+        'y': _typed_array(y[changed], np.float32),
+        'icon': _typed_array(icon_codes[changed], _index_dtype(len(icons))),
+        'event': _typed_array(event_codes[changed], _index_dtype(len(events))),
+        'removed_offsets': _typed_array(frame_offsets(frames[left] + 1), np.uint32),
+        'removed': _typed_array(patients[left], _index_dtype(len(patient_ids)))
+    }
+
+
+def _index_dtype(n):
+    """
+    The smallest unsigned integer type that can index n items.
+    """
+    for dtype in (np.uint8, np.uint16):
+        if n <= np.iinfo(dtype).max + 1:
+            return dtype
+    return np.uint32
+
+
+def _typed_array(values, dtype):
+    """
+    Encode an array as a dict of its dtype and its base64 encoded little
+    endian data, for decoding into a javascript typed array.
+    """
+    values = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder('<'))
+    return {'dtype': values.dtype.name,
+            'data': base64.b64encode(values.tobytes()).decode('ascii')}
+
+
+def generate_animation_html(
+        full_patient_df_plus_pos,
+        event_position_df,
+        scenario=None,
+        height=900,
+        width=1000,
+        add_background_image=None,
+        display_stage_labels=True,
+        icon_and_text_size=24,
+        override_x_max=None,
+        override_y_max=None,
+        time_display_units=None,
+        start_date=None,
+        resource_opacity=0.8,
+        custom_resource_icon=None,
+        gap_between_resources=10,
+        frame_duration=400, #milliseconds
+        frame_transition_duration=600 #milliseconds
+):
+    """
+    Create a self-contained HTML page that plays the animation.
+
+    The frames are encoded with encode_animation_frames and played back by a
+    small javascript player drawing on a canvas, so the page does not need
+    plotly and is several times smaller than the plotly figure of the same
+    animation. Takes the same arguments as generate_animation.
+
+    Args:
+        full_patient_df_plus_pos (pd.Dataframe):
+            output of generate_animation_df(). Note that generate_animation
+            changes the minute column, so this must be called first if both
+            are used on the same dataframe.
+
+        event_position_df (pd.Dataframe):
+            dataframe with the event, x, y and label of each step, plus the
+            name of the scenario attribute with the number of resources
+
+        height, width (int, optional): Defaults to 900 and 1000.
+            The size of the animation in pixels
+
+    Returns:
+        str
+    """
+    x_max, y_max = _axis_maxima(event_position_df, override_x_max, override_y_max)
+
+    resources = []
+    if scenario is not None:
+        events_with_resources = _resource_positions(event_position_df, scenario, gap_between_resources)
+        # Placed slightly below the y position of each entity using the resource
+        resources = [[float(x), float(y) - 10] for x, y in
+                     zip(events_with_resources['x_final'], events_with_resources['y'])]
+
+    stage_labels = []
+    if display_stage_labels:
+        stage_labels = [[float(x) + 10, float(y), str(label)] for x, y, label in
+                        zip(event_position_df['x'], event_position_df['y'], event_position_df['label'])]
+
+    settings = {
+        'width': width,
+        'height': height,
+        'x_max': float(x_max),
+        'y_max': float(y_max),
+        'background': add_background_image,
+        'font_size': icon_and_text_size,
+        'frame_duration': frame_duration,
+        'transition_duration': min(frame_transition_duration, frame_duration),
+        'stage_labels': stage_labels,
+        'resources': resources,
+        'resource_opacity': resource_opacity,
+        'resource_icon': custom_resource_icon
+    }
+
+    payload = encode_animation_frames(full_patient_df_plus_pos, time_display_units, start_date)
+
+    # "</" is escaped so that no label can close the script tag
+    return _ANIMATION_PLAYER_HTML \
+        .replace('__SETTINGS__', json.dumps(settings).replace('</', '<\\/')) \
+        .replace('__PAYLOAD__', json.dumps(payload).replace('</', '<\\/'))
+
+
+_ANIMATION_PLAYER_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<style>
+  body { font-family: "Open Sans", verdana, arial, sans-serif; }
+  #animation { position: relative; display: inline-block; }
+  #tooltip { position: absolute; display: none; pointer-events: none; white-space: nowrap;
+             background: white; border: 1px solid #636efa; padding: 4px 6px; font-size: 13px; }
+  #controls { display: flex; align-items: center; gap: 12px; margin-top: 8px; }
+  #slider { flex-grow: 1; }
+  #clock { font-size: 24px; }
+</style>
+</head>
+<body>
+<div id="animation">
+  <canvas id="canvas"></canvas>
+  <div id="tooltip"></div>
+  <div id="controls">
+    <button id="play">&#9654;</button>
+    <input id="slider" type="range" min="0" value="0">
+    <span id="clock"></span>
+  </div>
+</div>
+<script>
+const settings = __SETTINGS__;
+const payload = __PAYLOAD__;
+
+const arrayTypes = {uint8: Uint8Array, uint16: Uint16Array, uint32: Uint32Array,
+                    int32: Int32Array, float32: Float32Array};
+function decode(array) {
+  const bytes = Uint8Array.from(atob(array.data), c => c.charCodeAt(0));
+  return new arrayTypes[array.dtype](bytes.buffer);
+}
+
+const offsets = decode(payload.offsets), patient = decode(payload.patient);
+const xs = decode(payload.x), ys = decode(payload.y);
+const icon = decode(payload.icon), event = decode(payload.event);
+const removedOffsets = decode(payload.removed_offsets), removed = decode(payload.removed);
+const patientIds = decode(payload.patients);
+const nFrames = payload.frame_labels.length;
+
+const canvas = document.getElementById('canvas');
+const ctx = canvas.getContext('2d');
+const tooltip = document.getElementById('tooltip');
+const slider = document.getElementById('slider');
+const playButton = document.getElementById('play');
+const clock = document.getElementById('clock');
+canvas.width = settings.width;
+canvas.height = settings.height;
+slider.max = Math.max(nFrames - 1, 0);
+
+let background = null;
+if (settings.background) {
+  background = new Image();
+  background.src = settings.background;
+}
+
+function toCanvasX(x) { return x / settings.x_max * canvas.width; }
+function toCanvasY(y) { return canvas.height - y / settings.y_max * canvas.height; }
+
+// The patients currently shown, by patient index. Each moves from (fromX, fromY)
+// to (x, y) over the transition that started at transitionStart
+let entities = new Map();
+let frame = -1;
+let transitionStart = 0;
+let playing = false;
+let lastStep = 0;
+
+function progress(now) {
+  if (settings.transition_duration <= 0) return 1;
+  return Math.min(1, (now - transitionStart) / settings.transition_duration);
+}
+
+function position(entity, p) {
+  return [entity.fromX + (entity.x - entity.fromX) * p,
+          entity.fromY + (entity.y - entity.fromY) * p];
+}
+
+function applyFrame(f, now) {
+  const p = progress(now);
+  for (let i = removedOffsets[f]; i < removedOffsets[f + 1]; i++) entities.delete(removed[i]);
+  for (let i = offsets[f]; i < offsets[f + 1]; i++) {
+    const current = entities.get(patient[i]);
+    const [fromX, fromY] = current ? position(current, p) : [xs[i], ys[i]];
+    entities.set(patient[i], {x: xs[i], y: ys[i], fromX: fromX, fromY: fromY,
+                              icon: icon[i], event: event[i]});
+  }
+  frame = f;
+}
+
+function showFrame(f, animate) {
+  const now = performance.now();
+  if (f !== frame + 1) {
+    // Jumping to a frame: rebuild from the first frame
+    entities = new Map();
+    for (let g = 0; g < f; g++) applyFrame(g, now);
+  }
+  applyFrame(f, now);
+  if (!animate) {
+    entities.forEach(entity => { entity.fromX = entity.x; entity.fromY = entity.y; });
+  }
+  transitionStart = now;
+  slider.value = f;
+  clock.textContent = payload.frame_labels[f];
+}
+
+function draw(now) {
+  ctx.clearRect(0, 0, canvas.width, canvas.height);
+
+  if (background && background.complete) {
+    ctx.globalAlpha = 0.5;
+    ctx.drawImage(background, 0, 0, canvas.width, canvas.height);
+  }
+
+  ctx.globalAlpha = settings.resource_opacity;
+  ctx.textAlign = 'center';
+  ctx.textBaseline = 'middle';
+  ctx.font = settings.font_size + 'px sans-serif';
+  for (const [x, y] of settings.resources) {
+    if (settings.resource_icon) {
+      ctx.fillText(settings.resource_icon, toCanvasX(x), toCanvasY(y));
+    } else {
+      ctx.fillStyle = 'LightSkyBlue';
+      ctx.beginPath();
+      ctx.arc(toCanvasX(x), toCanvasY(y), 7.5, 0, 2 * Math.PI);
+      ctx.fill();
+    }
+  }
+
+  ctx.globalAlpha = 1;
+  ctx.fillStyle = '#444';
+  ctx.textAlign = 'left';
+  for (const [x, y, label] of settings.stage_labels) {
+    const lines = label.split('<br>');
+    lines.forEach((line, i) => ctx.fillText(
+      line, toCanvasX(x), toCanvasY(y) + (i - (lines.length - 1) / 2) * settings.font_size));
+  }
+
+  ctx.textAlign = 'center';
+  const p = progress(now);
+  entities.forEach(entity => {
+    const [x, y] = position(entity, p);
+    ctx.fillText(payload.icons[entity.icon], toCanvasX(x), toCanvasY(y));
+  });
+}
+
+function loop(now) {
+  if (playing && now - lastStep >= settings.frame_duration) {
+    if (frame + 1 < nFrames) {
+      showFrame(frame + 1, true);
+      lastStep = now;
+    } else {
+      setPlaying(false);
+    }
+  }
+  draw(now);
+  requestAnimationFrame(loop);
+}
+
+function setPlaying(play) {
+  playing = play;
+  playButton.innerHTML = play ? '&#9724;' : '&#9654;';
+}
+
+playButton.addEventListener('click', () => {
+  if (!playing && frame + 1 >= nFrames) showFrame(0, false);
+  setPlaying(!playing);
+});
+
+slider.addEventListener('input', () => {
+  setPlaying(false);
+  showFrame(Number(slider.value), false);
+});
+
+canvas.addEventListener('mousemove', e => {
+  const rect = canvas.getBoundingClientRect();
+  const mouseX = e.clientX - rect.left, mouseY = e.clientY - rect.top;
+  const p = progress(performance.now());
+  let nearest = null, nearestDistance = settings.font_size / 2;
+  entities.forEach((entity, index) => {
+    const [x, y] = position(entity, p);
+    const distance = Math.hypot(toCanvasX(x) - mouseX, toCanvasY(y) - mouseY);
+    if (distance < nearestDistance) { nearest = [index, entity]; nearestDistance = distance; }
+  });
+  if (nearest) {
+    tooltip.innerHTML = '<b>' + payload.events[nearest[1].event] + '</b><br>patient=' + patientIds[nearest[0]];
+    tooltip.style.left = (mouseX + 12) + 'px';
+    tooltip.style.top = (mouseY + 12) + 'px';
+    tooltip.style.display = 'block';
+  } else {
+    tooltip.style.display = 'none';
+  }
+});
+canvas.addEventListener('mouseleave', () => { tooltip.style.display = 'none'; });
+
+if (nFrames > 0) showFrame(0, false);
+requestAnimationFrame(loop);
+</script>
+</body>
+</html>
+"""
+
+
 def animate_activity_log(
         event_log,
         event_position_df,
@@ -521,6 +1468,8 @@ def animate_activity_log(
         setup_mode=False,
         frame_duration=400, #milliseconds
         frame_transition_duration=600, #milliseconds
+        max_frames=None,
+        max_points=None,
         debug_mode=False
         ):
     
@@ -528,6 +1477,24 @@ def animate_activity_log(
         start_time_function = time.perf_counter()
         print(f'Animation function called at {time.strftime("%H:%M:%S", time.localtime())}')
 
+    # If given a budget, every_x_time_units, limit_duration and step_snapshot_max become
+    # the most detail to use and are reduced as needed to keep within it
+    if max_frames is not None or max_points is not None:
+        budget = animation_budget(event_log,
+                                  max_frames=max_frames if max_frames is not None else 1000,
+                                  max_points=max_points if max_points is not None else 50000,
+                                  limit_duration=limit_duration,
+                                  min_every_x_time_units=every_x_time_units,
+                                  max_every_x_time_units=max(every_x_time_units, 60),
+                                  min_step_snapshot_max=min(step_snapshot_max, 5),
+                                  max_step_snapshot_max=step_snapshot_max)
+        every_x_time_units = budget['every_x_time_units']
+        limit_duration = budget['limit_duration']
+        step_snapshot_max = budget['step_snapshot_max']
+
+        if debug_mode:
+            print(f'Animation budget settings: {budget}')
+
     full_patient_df = reshape_for_animations(event_log, 
                                              every_x_time_units=every_x_time_units,
                                              limit_duration=limit_duration,
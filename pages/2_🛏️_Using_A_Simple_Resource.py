@@ -13,9 +13,9 @@ import plotly.graph_objects as go
 import streamlit as st
 
 from helper_functions import add_logo, mermaid, center_running
-from model_classes import Scenario, multiple_replications
+from model_classes import Scenario, multiple_replications, estimate_simplest_model
 from distribution_classes import Normal
-from output_animation_functions import reshape_for_animations, generate_animation_df, generate_animation
+from output_animation_functions import animation_budget, reshape_for_animations, generate_animation_df, generate_animation
 # Set page parameters
 st.set_page_config(
      page_title="Using a Simple Resource",
@@ -193,6 +193,26 @@ with tab1:
 
 
 
+    args = Scenario(
+        random_number_set=seed,
+        n_cubicles_1=nurses,
+        override_arrival_rate=True,
+        manual_arrival_rate=60/(mean_arrivals_per_day/24),
+        model="simplest",
+        trauma_treat_mean=consult_time,
+        trauma_treat_var=consult_time_sd
+        )
+
+    # Instant preview from queueing theory - updates as the sliders move
+    estimate = estimate_simplest_model(args, rc_period=run_time_days*60*24)
+    st.caption(
+        "**Quick estimate** (from queueing theory, without simulating): "
+        f"nurses busy {estimate['01b_treatment_util']:.0%} of the time, "
+        f"an average wait of {estimate['01a_treatment_wait']:.0f} minutes, "
+        f"and {estimate['01c_treatment_wait_target_met']:.0%} of patients "
+        "seen within 2 hours."
+    )
+
     # A user must press a streamlit button to run the model
     button_run_pressed = st.button("Run simulation")
 
@@ -201,15 +221,6 @@ with tab1:
 
         # add a spinner and then display success box
         with st.spinner('Simulating the minor injuries unit...'):
-            args = Scenario(
-                random_number_set=seed,
-                n_cubicles_1=nurses,
-                override_arrival_rate=True,
-                manual_arrival_rate=60/(mean_arrivals_per_day/24),
-                model="simplest",
-                trauma_treat_mean=consult_time,
-                trauma_treat_var=consult_time_sd
-                )
             await asyncio.sleep(0.1)
             # run multiple replications of experment
             detailed_outputs = multiple_replications(
@@ -228,18 +239,27 @@ with tab1:
             del detailed_outputs
             gc.collect()
 
-            animation_dfs_log = reshape_for_animations(
-                        event_log=full_event_log[
+            animation_event_log = full_event_log[
                             (full_event_log['rep']==1) &
                             ((full_event_log['event_type']=='queue') | (full_event_log['event_type']=='resource_use')  | (full_event_log['event_type']=='arrival_departure'))
-                            # Limit to first 5 days
-                        ],
-                        every_x_time_units=5,
-                        step_snapshot_max=45,
-                        limit_duration=60*24*5
+                        ]
+
+            # Choose the snapshot settings from how busy the run was, so that the
+            # animation stays a similar size however many days are simulated
+            animation_settings = animation_budget(
+                        animation_event_log,
+                        max_frames=1440,
+                        max_points=150000,
+                        min_every_x_time_units=5,
+                        max_step_snapshot_max=45
                 )
 
-            del full_event_log
+            animation_dfs_log = reshape_for_animations(
+                        event_log=animation_event_log,
+                        **animation_settings
+                )
+
+            del full_event_log, animation_event_log
             gc.collect()
 
     if button_run_pressed:
@@ -270,8 +290,8 @@ with tab1:
                         ])
 
                 st.markdown(
-    """
-    The plot below shows a snapshot every 5 minutes of the position of everyone in our emergency department model.
+    f"""
+    The plot below shows a snapshot every {animation_settings['every_x_time_units']} minutes of the position of everyone in our emergency department model.
 
     The buttons to the left of the slider below the plot can be used to start and stop the animation.
 
@@ -287,7 +307,7 @@ with tab1:
                     wrap_queues_at=15,
                     gap_between_entities=10,
                     gap_between_rows=20,
-                    step_snapshot_max=45
+                    step_snapshot_max=animation_settings['step_snapshot_max']
                     )
 
                 st.plotly_chart(generate_animation(
@@ -12,7 +12,7 @@ import plotly.express as px
 import plotly.graph_objects as go
 import streamlit as st
 
-from output_animation_functions import reshape_for_animations, generate_animation_df, generate_animation
+from output_animation_functions import animation_budget, reshape_for_animations, generate_animation_df, generate_animation
 from helper_functions import add_logo, mermaid, center_running
 from model_classes import Scenario, multiple_replications
 
@@ -243,19 +243,29 @@ with tab1:
             gc.collect()
 
             attribute_count_df = full_event_log[(full_event_log["event"]=="does_not_require_treatment")|
-                (full_event_log["event"]=="requires_treatment")][['patient','event','rep']].groupby(['rep','event']).count()
+                (full_event_log["event"]=="requires_treatment")][['patient','event','rep']].groupby(['rep','event'], observed=True).count()
 
-            animation_dfs_log = reshape_for_animations(
-                        event_log=full_event_log[
+            animation_event_log = full_event_log[
                             (full_event_log['rep']==1) &
                             ((full_event_log['event_type']=='queue') | (full_event_log['event_type']=='resource_use')  | (full_event_log['event_type']=='arrival_departure'))
-                        ],
-                        every_x_time_units=5,
-                        step_snapshot_max=45,
-                        limit_duration=60*24*5
-                    )
+                        ]
+
+            # Choose the snapshot settings from how busy the run was, so that the
+            # animation stays a similar size however many days are simulated
+            animation_settings = animation_budget(
+                        animation_event_log,
+                        max_frames=1440,
+                        max_points=150000,
+                        min_every_x_time_units=5,
+                        max_step_snapshot_max=45
+                )
 
-            del full_event_log
+            animation_dfs_log = reshape_for_animations(
+                        event_log=animation_event_log,
+                        **animation_settings
+                )
+
+            del full_event_log, animation_event_log
             gc.collect()
 
     if button_run_pressed:
@@ -270,8 +280,8 @@ with tab1:
             st.subheader("Animated Model Output")
 
             st.markdown(
-    """
-    The plot below shows a snapshot every 5 minutes of the position of everyone in our emergency department model.
+    f"""
+    The plot below shows a snapshot every {animation_settings['every_x_time_units']} minutes of the position of everyone in our emergency department model.
 
     The buttons to the left of the slider below the plot can be used to start and stop the animation.
 
@@ -309,7 +319,7 @@ with tab1:
                     wrap_queues_at=15,
                     gap_between_entities=10,
                     gap_between_rows=20,
-                    step_snapshot_max=45
+                    step_snapshot_max=animation_settings['step_snapshot_max']
                     )
 
                 st.plotly_chart(generate_animation(
@@ -14,7 +14,7 @@ import streamlit as st
 import numpy as np
 from helper_functions import add_logo, mermaid, center_running
 from model_classes import Scenario, multiple_replications
-from output_animation_functions import reshape_for_animations, generate_animation_df, generate_animation
+from output_animation_functions import animation_budget, reshape_for_animations, generate_animation_df, generate_animation, generate_animation_html
 
 st.set_page_config(
      page_title="The Full Model",
@@ -207,6 +207,10 @@ with tab1:
                         1, 60,
                         step=1, value=5)
 
+            common_random_numbers = st.checkbox(
+                "🎯 Give each patient the same random durations in every run (makes comparing runs with the same random number set fairer)",
+                value=False)
+
     args = Scenario(
         random_number_set=seed,
                  n_triage=n_triage,
@@ -216,7 +220,8 @@ with tab1:
                  n_cubicles_1=n_cubicles_1,
                  n_cubicles_2=n_cubicles_2,
                  non_trauma_treat_p=non_trauma_treat_p,
-                 prob_trauma=prob_trauma)
+                 prob_trauma=prob_trauma,
+                 common_random_numbers=common_random_numbers)
 
     # A user must press a streamlit button to run the model
     button_run_pressed = st.button("Run simulation")
@@ -303,17 +308,27 @@ with tab1:
 
             my_bar.progress(80, text="Creating Animations...")
 
-            animation_dfs_log = reshape_for_animations(
-                event_log=full_event_log[
+            animation_event_log = full_event_log[
                     (full_event_log['rep']==1) &
                     ((full_event_log['event_type']=='queue') | (full_event_log['event_type']=='resource_use')  | (full_event_log['event_type']=='arrival_departure'))
-                ],
-                step_snapshot_max=30,
-                every_x_time_units=5,
-                limit_duration=60*24*5
-            )
+                ]
+
+            # Choose the snapshot settings from how busy the run was, so that the
+            # animation stays a similar size however many days are simulated
+            animation_settings = animation_budget(
+                animation_event_log,
+                max_frames=1440,
+                max_points=150000,
+                min_every_x_time_units=5,
+                max_step_snapshot_max=30
+                )
+
+            animation_dfs_log = reshape_for_animations(
+                event_log=animation_event_log,
+                **animation_settings
+                )
 
-        del full_event_log
+        del full_event_log, animation_event_log
         gc.collect()
 
         my_bar.progress(100, text="Simulation Complete!")
@@ -384,8 +399,8 @@ with tab1:
             # st.dataframe(animation_dfs_log)
 
             st.markdown(
-    """
-    The plot below shows a snapshot every 5 minutes of the position of everyone in our emergency department model.
+    f"""
+    The plot below shows a snapshot every {animation_settings['every_x_time_units']} minutes of the position of everyone in our emergency department model.
 
     The buttons to the left of the slider below the plot can be used to start and stop the animation.
 
@@ -401,9 +416,25 @@ with tab1:
                 wrap_queues_at=10,
                 gap_between_entities=10,
                 gap_between_rows=25,
-                step_snapshot_max=30
+                step_snapshot_max=animation_settings['step_snapshot_max']
                 )
 
+            # A compact, self-contained version of the animation for downloading
+            # (made first, as generate_animation changes the minute column)
+            animation_html = generate_animation_html(
+                    full_patient_df_plus_pos=full_patient_df_plus_pos,
+                    event_position_df = event_position_df,
+                    scenario=args,
+                    height=900,
+                    width=1600,
+                    override_x_max=700,
+                    override_y_max=675,
+                    icon_and_text_size=19,
+                    display_stage_labels=False,
+                    time_display_units="dhm",
+                    add_background_image="https://raw.githubusercontent.com/hsma-programme/Teaching_DES_Concepts_Streamlit/main/resources/Full%20Model%20Background%20Image%20-%20Horizontal%20Layout.drawio.png",
+            )
+
             animated_plot = generate_animation(
                     full_patient_df_plus_pos=full_patient_df_plus_pos,
                     event_position_df = event_position_df,
@@ -435,7 +466,7 @@ with tab1:
 
             st.download_button(
                 label="Download Plot as HTML",
-                data=animated_plot.to_html(full_html=False, include_plotlyjs="cdn"),
+                data=animation_html,
                 file_name="plot.html",
                 mime="text/html"
             )
@@ -0,0 +1,53 @@
+'''
+Checks that common random numbers mode gives patients the same
+distribution of samples as the default sampling.
+
+Run from the repository root with: python -m pytest tests
+'''
+import numpy as np
+import pytest
+
+from model_classes import Scenario, TreatmentCentreModel
+
+RUN_LENGTH = 60 * 24 * 5
+RANDOM_NUMBER_SETS = range(4)
+
+
+def trauma_durations(common_random_numbers):
+    '''
+    The stabilisation and treatment durations of every trauma patient that
+    was treated, pooled over several random number sets.
+    '''
+    stabilisation, treatment = [], []
+    for random_number_set in RANDOM_NUMBER_SETS:
+        args = Scenario(random_number_set=random_number_set,
+                        common_random_numbers=common_random_numbers)
+        model = TreatmentCentreModel(args, event_logging=False)
+        model.run(results_collection_period=RUN_LENGTH)
+        for patient in model.trauma_patients:
+            if patient.treat_duration >= 0:
+                stabilisation.append(patient.trauma_duration)
+                treatment.append(patient.treat_duration)
+    return np.array(stabilisation), np.array(treatment)
+
+
+@pytest.fixture(scope='module')
+def durations():
+    return {crn: trauma_durations(crn) for crn in (False, True)}
+
+
+@pytest.mark.parametrize('common_random_numbers', [False, True])
+def test_repeat_draws_are_independent(durations, common_random_numbers):
+    stabilisation, treatment = durations[common_random_numbers]
+    assert len(stabilisation) > 100
+    assert not np.any(stabilisation == treatment)
+    assert abs(np.corrcoef(stabilisation, treatment)[0, 1]) < 0.1
+
+
+@pytest.mark.parametrize('draw', [0, 1])
+def test_marginals_match_default_sampling(durations, draw):
+    default = durations[False][draw]
+    crn = durations[True][draw]
+    standard_error = np.sqrt(default.var() / len(default) + crn.var() / len(crn))
+    assert abs(default.mean() - crn.mean()) < 3 * standard_error
+    assert abs(crn.mean() - Scenario().trauma_mean) < 3 * crn.std() / np.sqrt(len(crn))
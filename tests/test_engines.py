@@ -0,0 +1,30 @@
+'''
+Checks that the event-heap engine gives exactly the same results as SimPy.
+
+Run from the repository root with: python -m pytest tests
+'''
+import pandas as pd
+import pytest
+
+from model_classes import Scenario, single_run
+
+RUN_LENGTH = 60 * 24 * 3
+
+
+def run(engine, model, random_number_set):
+    return single_run(Scenario(model=model, engine=engine),
+                      rc_period=RUN_LENGTH,
+                      random_no_set=random_number_set,
+                      return_detailed_logs=True)
+
+
+@pytest.mark.parametrize('model', ['full', 'simplest', 'simple_with_branch'])
+@pytest.mark.parametrize('random_number_set', [0, 1, 42])
+def test_heap_engine_matches_simpy(model, random_number_set):
+    simpy_run = run('simpy', model, random_number_set)
+    heap_run = run('heap', model, random_number_set)
+
+    pd.testing.assert_frame_equal(heap_run['summary_df'],
+                                  simpy_run['summary_df'])
+    pd.testing.assert_frame_equal(heap_run['full_event_log'],
+                                  simpy_run['full_event_log'])
@@ -0,0 +1,35 @@
+'''
+Checks of the resource pools shared by the models.
+
+Run from the repository root with: python -m pytest tests
+'''
+import pytest
+
+from model_classes import (ENGINES, Scenario, create_environment,
+                           create_resource_pool)
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_simultaneous_releases_with_one_waiting_request(engine):
+    env = create_environment(Scenario(engine=engine))
+    pool = create_resource_pool(env, 2)
+    granted = {}
+
+    def use(name, start, duration):
+        yield env.timeout(start)
+        resource_id = yield pool.get()
+        granted[name] = (resource_id, env.now)
+        yield env.timeout(duration)
+        pool.put(resource_id)
+
+    # A and B both release at t=5 while only C is waiting
+    env.process(use('A', 0, 5))
+    env.process(use('B', 0, 5))
+    env.process(use('C', 1, 3))
+    env.run(until=20)
+
+    assert granted == {'A': (1, 0), 'B': (2, 0), 'C': (1, 5)}
+    assert pool.n_busy == 0
+    assert pool.free == 0b11
+    assert not pool.waiting
+    assert pool.busy_time() == pytest.approx(13.0)
@@ -0,0 +1,41 @@
+'''
+Checks that the utilisation KPIs are the busy time of the resources over
+the results collection period, whatever the warm-up.
+
+Run from the repository root with: python -m pytest tests
+'''
+import numpy as np
+import pytest
+
+from model_classes import (Scenario, SimulationSummary, batch_means,
+                           create_model)
+
+RUN_LENGTH = 60 * 24 * 3
+
+
+def summarise(model_name, warm_up):
+    model = create_model(Scenario(model=model_name), event_logging=False)
+    model.run(results_collection_period=RUN_LENGTH, warm_up=warm_up)
+    summary = SimulationSummary(model).summary_frame().iloc[0]
+    return summary.filter(like='_util'), model.resource_utilisation()
+
+
+@pytest.mark.parametrize('model_name', ['full', 'simplest', 'simple_with_branch'])
+@pytest.mark.parametrize('warm_up', [0.0, 1e-9, 60 * 24])
+def test_utilisation_is_resource_busy_time(model_name, warm_up):
+    kpis, busy = summarise(model_name, warm_up)
+    assert sorted(kpis.values) == pytest.approx(sorted(busy.values))
+
+
+@pytest.mark.parametrize('model_name', ['full', 'simplest', 'simple_with_branch'])
+def test_utilisation_is_continuous_in_warm_up(model_name):
+    without, _ = summarise(model_name, 0.0)
+    tiny, _ = summarise(model_name, 1e-9)
+    assert np.allclose(without.values, tiny.values, atol=1e-6)
+
+
+def test_batch_utilisation_is_at_most_one():
+    results, _ = batch_means(Scenario(model='simplest', n_cubicles_1=6),
+                             rc_period=60 * 24 * 10, n_batches=10,
+                             warm_up=60 * 24 * 2)
+    assert (results['01b_treatment_util'] <= 1.0 + 1e-9).all()